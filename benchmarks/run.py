@@ -0,0 +1,462 @@
+"""
+Benchmarks for Affectra.
+
+Usage:
+    python -m benchmarks.run [--quick] [--only ingest,stats,session,frames] [options]
+
+Suites:
+    ingest    /log and /log/bulk throughput and latency through the Flask test client
+    stats     /api/emotion_stats latency against the size of the session store
+    session   EmotionSession.add_emotion() and get_summary() cost
+    frames    CameraTracker.process_frame() rate with a deterministic stub analyzer
+
+Everything runs on synthetic data from a fixed seed against scratch
+session stores in a temporary directory, with no camera and no emotion
+model. Results are written as JSON; pass an earlier result file to
+--compare to list the metrics that got worse.
+"""
+
+import argparse
+import atexit
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import (SceneFaceDetector, SessionGenerator, StubEmotionAnalyzer,
+                                  SyntheticScene, fill_log)
+from client.emotion_utils import EMOTION_LABELS, EmotionSession
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+SUITES = ("ingest", "stats", "session", "frames")
+
+# Cameras the synthetic sessions are spread over
+BENCH_CAMERAS = ("lobby", "door")
+
+
+def summarize(latencies):
+    """
+    Reduce a list of latencies to summary statistics.
+
+    Args:
+        latencies: Durations in seconds
+
+    Returns:
+        Dictionary with count, mean, p50, p99 and max in milliseconds
+    """
+    values = np.asarray(latencies) * 1000.0
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 4),
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "max_ms": round(float(values.max()), 4)
+    }
+
+
+def time_requests(client, url, repeats):
+    """
+    Time repeated GET requests.
+
+    Returns:
+        summarize() of the request latencies
+    """
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+    return summarize(latencies)
+
+
+def load_app(storage_dir):
+    """
+    Import the server against a scratch storage directory.
+
+    Args:
+        storage_dir: Directory for the session store, snapshot and secret
+
+    Returns:
+        The server.app module
+    """
+    os.environ["AFFECTRA_STORAGE_DIR"] = storage_dir
+    # Per-session log lines would dominate the console and the timings
+    logging.getLogger("affectra").setLevel(logging.WARNING)
+    import server.app
+    return server.app
+
+
+def bench_ingest(app_module, requests, seed):
+    """
+    Measure session uploads through the Flask test client.
+
+    Args:
+        app_module: Module returned by load_app()
+        requests: Number of /log requests
+        seed: Random seed of the session generator
+
+    Returns:
+        Dictionary with /log and /log/bulk results
+    """
+    client = app_module.app.test_client()
+    generator = SessionGenerator(seed, cameras=BENCH_CAMERAS)
+
+    latencies = []
+    started = time.perf_counter()
+    for summary in generator.summaries(requests):
+        began = time.perf_counter()
+        response = client.post("/log", json=summary)
+        latencies.append(time.perf_counter() - began)
+        if response.status_code != 200:
+            raise RuntimeError(f"POST /log returned {response.status_code}: {response.get_data(as_text=True)}")
+    elapsed = time.perf_counter() - started
+    single = {"requests_per_sec": round(requests / elapsed, 2), **summarize(latencies)}
+
+    # The same number of sessions in bulk requests of 100
+    batch_size = 100
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(0, requests, batch_size):
+        body = "\n".join(json.dumps(summary) for summary in generator.summaries(batch_size))
+        began = time.perf_counter()
+        response = client.post("/log/bulk", data=body, content_type="application/x-ndjson")
+        latencies.append(time.perf_counter() - began)
+        if response.status_code != 200:
+            raise RuntimeError(f"POST /log/bulk returned {response.status_code}")
+    elapsed = time.perf_counter() - started
+    bulk = {"batch_size": batch_size, "sessions_per_sec": round(len(latencies) * batch_size / elapsed, 2),
+            **summarize(latencies)}
+
+    return {"log": single, "log_bulk": bulk}
+
+
+def bench_stats(app_module, sizes, repeats, seed, work_dir):
+    """
+    Measure statistics queries against session stores of several sizes.
+
+    Args:
+        app_module: Module returned by load_app()
+        sizes: Numbers of stored sessions to test
+        repeats: Requests per query
+        seed: Random seed of the session generator
+        work_dir: Directory for the scratch stores
+
+    Returns:
+        Dictionary keyed by store size
+    """
+    from server.stats import EmotionAggregates
+    from server.storage import SessionLog, from_epoch_us
+
+    client = app_module.app.test_client()
+    original = app_module.session_log, app_module.stats_cache
+    results = {}
+    try:
+        for size in sizes:
+            path = os.path.join(work_dir, f"stats-{size}")
+            # fsync per batch only slows the fill down; it isn't what is measured
+            session_log = SessionLog(os.path.join(path, "sessions"), durable=False)
+            session_log.ensure_exists()
+            started = time.perf_counter()
+            fill_log(session_log, size, seed, cameras=BENCH_CAMERAS)
+            fill_seconds = time.perf_counter() - started
+
+            stats_cache = EmotionAggregates(session_log, os.path.join(path, "stats.json"))
+            started = time.perf_counter()
+            stats_cache.refresh()
+            refresh_seconds = time.perf_counter() - started
+            app_module.session_log, app_module.stats_cache = session_log, stats_cache
+
+            # The middle tenth of the stored time span
+            timestamps = session_log.read_timestamps(0, size)
+            first, last = int(timestamps[0]), int(timestamps[-1])
+            start = from_epoch_us(first + (last - first) * 45 // 100).isoformat()
+            end = from_epoch_us(first + (last - first) * 55 // 100).isoformat()
+
+            results[str(size)] = {
+                "fill_rows_per_sec": round(size / fill_seconds, 2),
+                "cold_refresh_ms": round(refresh_seconds * 1000, 4),
+                "totals": time_requests(client, "/api/emotion_stats", repeats),
+                "camera": time_requests(client, f"/api/emotion_stats?camera={BENCH_CAMERAS[0]}", repeats),
+                "group_by_camera": time_requests(client, "/api/emotion_stats?group_by=camera", repeats),
+                "range": time_requests(client, f"/api/emotion_stats?from={start}&to={end}", repeats),
+                "range_buckets": time_requests(
+                    client, f"/api/emotion_stats?from={start}&to={end}&bucket=hour", repeats)
+            }
+            shutil.rmtree(path, ignore_errors=True)
+    finally:
+        app_module.session_log, app_module.stats_cache = original
+    return results
+
+
+def bench_session(samples, seed):
+    """
+    Measure the cost of recording emotions in a session and summarizing it.
+
+    Args:
+        samples: Number of add_emotion() calls
+        seed: Random seed
+
+    Returns:
+        Dictionary with per-call costs in microseconds
+    """
+    rng = np.random.default_rng(seed)
+    emotions = [EMOTION_LABELS[i] for i in rng.integers(0, len(EMOTION_LABELS), samples)]
+    scores = rng.dirichlet(np.ones(len(EMOTION_LABELS)), 1000) * 100
+    probabilities = [dict(zip(EMOTION_LABELS, row.tolist())) for row in scores]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        session = EmotionSession()
+        session.start(0.0)
+        started = time.perf_counter()
+        for emotion in emotions:
+            session.add_emotion(emotion)
+        add_seconds = time.perf_counter() - started
+
+        session_with_probabilities = EmotionSession(ewma_alpha=0.3)
+        session_with_probabilities.start(0.0)
+        started = time.perf_counter()
+        for i, emotion in enumerate(emotions):
+            session_with_probabilities.add_emotion(emotion, probabilities[i % len(probabilities)])
+        add_probabilities_seconds = time.perf_counter() - started
+
+        session_with_probabilities.end(60.0)
+        summaries = 1000
+        started = time.perf_counter()
+        for _ in range(summaries):
+            session_with_probabilities.get_summary()
+        summary_seconds = time.perf_counter() - started
+
+    return {
+        "samples": samples,
+        "add_emotion_us": round(add_seconds / samples * 1e6, 4),
+        "add_emotion_with_probabilities_us": round(add_probabilities_seconds / samples * 1e6, 4),
+        "get_summary_us": round(summary_seconds / summaries * 1e6, 4)
+    }
+
+
+def run_frames(tracker, scene, frames, fps, render_faces=True):
+    """
+    Feed synthetic frames through CameraTracker.process_frame().
+
+    Args:
+        tracker: CameraTracker to benchmark
+        scene: SyntheticScene rendering the frames
+        frames: Number of frames
+        fps: Frame rate; frames are timestamped in video time so the
+            tracker's scheduling doesn't depend on the machine's speed
+        render_faces: Whether to draw the face patches
+
+    Returns:
+        Dictionary with the frame rate and per-frame latencies
+    """
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index in range(frames):
+            frame = scene.render(index, fps) if render_faces else scene.background.copy()
+            started = time.perf_counter()
+            tracker.process_frame(frame, timestamp=index / fps)
+            latencies.append(time.perf_counter() - started)
+        tracker.end_all_sessions(frames / fps)
+    return {"fps": round(len(latencies) / sum(latencies), 2), **summarize(latencies)}
+
+
+def bench_frames(frames, width, height, faces, seed):
+    """
+    Measure frame processing with a stub analyzer and synthetic frames.
+
+    Two scenes are run: moving face patches (detection, tracking,
+    scheduling, batched analysis and drawing) and an empty scene, where
+    the Haar face detector runs on every frame.
+
+    Returns:
+        Dictionary with one result per scene
+    """
+    from client.batch import SummaryCollector
+    from client.camera_tracker import CameraTracker
+
+    def create_tracker():
+        # No latency target: the inference width must not depend on the machine
+        return CameraTracker(analyzer=StubEmotionAnalyzer(), uploader=SummaryCollector(),
+                             latency_target=0, camera_id="bench")
+
+    scene = SyntheticScene(width, height, faces, face_size=min(width, height) // 4, seed=seed)
+    tracker = create_tracker()
+    tracker.face_detector = SceneFaceDetector(scene)
+    with_faces = run_frames(tracker, scene, frames, 30.0)
+    with_faces["faces"] = faces
+    with_faces["sessions"] = len(tracker.uploader.summaries)
+
+    tracker = create_tracker()
+    empty = run_frames(tracker, scene, frames, 30.0, render_faces=False)
+
+    return {
+        "frame_size": f"{width}x{height}",
+        "inference_width": tracker.inference_width,
+        "faces": with_faces,
+        "empty_scene": empty
+    }
+
+
+def flatten(results, prefix=""):
+    """Flatten nested result dictionaries into {"a.b.c": number}."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with an earlier run.
+    Metrics ending in _ms or _us are better when lower, metrics ending in
+    _per_sec or fps better when higher; other numbers, and maximum
+    latencies (too noisy to compare), are ignored.
+
+    Args:
+        results: Results of this run
+        baseline: Results loaded from an earlier result file
+        tolerance: Relative change tolerated before a metric counts as worse
+
+    Returns:
+        List of (metric, baseline value, current value, relative change)
+        for the metrics that got worse
+    """
+    current = flatten(results)
+    previous = flatten(baseline)
+    regressions = []
+    for name, value in sorted(current.items()):
+        old = previous.get(name)
+        if not old or name.endswith("max_ms"):
+            continue
+        if name.endswith(("_ms", "_us")):
+            change = value / old - 1
+        elif name.endswith(("_per_sec", "fps")):
+            change = old / value - 1 if value else float("inf")
+        else:
+            continue
+        marker = "❌" if change > tolerance else "  "
+        print(f"{marker} {name:60s} {old:>12.4f} -> {value:>12.4f} ({change:+.1%})")
+        if change > tolerance:
+            regressions.append((name, old, value, change))
+    return regressions
+
+
+def environment():
+    """Describe the machine and code version the benchmarks ran on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=BENCHMARK_DIR, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def parse_sizes(text):
+    """Parse a comma separated list of sizes such as "1e3,1e4,100000"."""
+    return [int(float(size)) for size in text.split(",") if size.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Affectra's ingest, statistics and frame processing.")
+    parser.add_argument("--only", default=",".join(SUITES), help=f"suites to run (default: {','.join(SUITES)})")
+    parser.add_argument("--quick", action="store_true", help="small sizes and few iterations, for a smoke test")
+    parser.add_argument("--sizes", default=None,
+                        help="session store sizes for the stats suite (default: 1e3,1e4,1e5,1e6; up to 1e7 works)")
+    parser.add_argument("--requests", type=int, default=None, help="/log requests in the ingest suite (default: 1000)")
+    parser.add_argument("--repeats", type=int, default=None, help="requests per stats query (default: 100)")
+    parser.add_argument("--frames", type=int, default=None, help="frames per scene in the frames suite (default: 300)")
+    parser.add_argument("--frame-size", default="640x480", help="synthetic frame size (default: 640x480)")
+    parser.add_argument("--faces", type=int, default=2, help="moving faces in the synthetic scene (default: 2)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument("--output", default=None, help="result file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="relative slowdown reported as a regression (default: 0.15)")
+    args = parser.parse_args(argv)
+
+    suites = [suite.strip() for suite in args.only.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    sizes = parse_sizes(args.sizes or ("1e3,1e4" if args.quick else "1e3,1e4,1e5,1e6"))
+    requests = args.requests or (200 if args.quick else 1000)
+    repeats = args.repeats or (20 if args.quick else 100)
+    frames = args.frames or (60 if args.quick else 300)
+    width, height = (int(value) for value in args.frame_size.lower().split("x"))
+
+    work_dir = tempfile.mkdtemp(prefix="affectra-bench-")
+    app_module = None
+    results = {}
+    try:
+        app_module = load_app(os.path.join(work_dir, "server")) if {"ingest", "stats"} & set(suites) else None
+        if "ingest" in suites:
+            print(f"⏱ ingest: {requests} /log requests")
+            results["ingest"] = bench_ingest(app_module, requests, args.seed)
+        if "stats" in suites:
+            print(f"⏱ stats: store sizes {', '.join(str(size) for size in sizes)}")
+            results["stats"] = bench_stats(app_module, sizes, repeats, args.seed, work_dir)
+        if "session" in suites:
+            print("⏱ session: EmotionSession")
+            results["session"] = bench_session(100000 if not args.quick else 10000, args.seed)
+        if "frames" in suites:
+            print(f"⏱ frames: {frames} frames of {width}x{height}")
+            results["frames"] = bench_frames(frames, width, height, args.faces, args.seed)
+    finally:
+        if app_module is not None:
+            # The scratch store is gone before the exit handler could save to it
+            atexit.unregister(app_module.stats_cache.save_snapshot)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "environment": environment(),
+        "config": {"suites": suites, "sizes": sizes, "requests": requests, "repeats": repeats,
+                   "frames": frames, "frame_size": f"{width}x{height}", "faces": args.faces, "seed": args.seed},
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"📊 Compared with {args.compare} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline.get("results", {}), args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) got worse")
+            return 1
+        print("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Synthetic workloads for the Affectra benchmarks.
+Generates session summaries, fills session stores and renders video
+frames with moving face-like patches, all from a fixed seed so every run
+does the same work.
+"""
+
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+from client.analyzers import DeepFaceEmotionAnalyzer
+from client.emotion_utils import EMOTION_LABELS
+
+# Local time of the first synthetic session
+DEFAULT_START = datetime(2026, 1, 1, 8, 0, 0)
+
+
+class SessionGenerator:
+    """
+    Deterministic stream of plausible session summaries.
+    Sessions start interval_seconds apart on average, last a few seconds
+    to minutes, and each sees one to three emotions.
+    """
+
+    def __init__(self, seed=0, start=DEFAULT_START, interval_seconds=30.0, cameras=("default",)):
+        """
+        Initialize the generator.
+
+        Args:
+            seed: Random seed
+            start: Time of the first session
+            interval_seconds: Mean time between sessions
+            cameras: Camera ids the sessions are spread over
+        """
+        self.rng = np.random.default_rng(seed)
+        self.start = start
+        self.interval_seconds = interval_seconds
+        self.cameras = list(cameras)
+        self.offset = 0.0
+
+    def _draw(self, count):
+        """
+        Draw the random fields of count sessions.
+
+        Returns:
+            Tuple of (offsets in seconds from start, durations, camera
+            indices, label indices of shape (count, 3), percentages of
+            shape (count, 3) that are 0 for the labels a session didn't see)
+        """
+        rng = self.rng
+        offsets = self.offset + np.cumsum(rng.exponential(self.interval_seconds, count))
+        if count:
+            self.offset = float(offsets[-1])
+        durations = np.round(rng.gamma(2.0, 15.0, count), 2)
+        cameras = rng.integers(0, len(self.cameras), count)
+        # Up to three distinct emotions per session, largest share first
+        labels = np.argsort(rng.random((count, len(EMOTION_LABELS))), axis=1)[:, :3]
+        shares = rng.gamma(1.0, 1.0, (count, 3))
+        shares[np.arange(3) >= rng.integers(1, 4, count)[:, None]] = 0
+        shares = -np.sort(-shares, axis=1)
+        percentages = np.round(shares / shares.sum(axis=1, keepdims=True) * 100, 2)
+        return offsets, durations, cameras, labels, percentages
+
+    def _sessions(self, count):
+        """Yield (offset, duration, camera id, dominant emotion, percentages) per session."""
+        offsets, durations, cameras, labels, percentages = self._draw(count)
+        for i in range(count):
+            emotions = {
+                EMOTION_LABELS[label]: float(share)
+                for label, share in zip(labels[i], percentages[i]) if share > 0
+            }
+            yield (float(offsets[i]), float(durations[i]), self.cameras[cameras[i]],
+                   EMOTION_LABELS[labels[i, 0]], emotions)
+
+    def summaries(self, count):
+        """
+        Generate session summaries as a client would post them to /log.
+
+        Args:
+            count: Number of summaries
+
+        Returns:
+            List of summary dictionaries
+        """
+        return [
+            {
+                "timestamp": (self.start + timedelta(seconds=offset)).isoformat(),
+                "duration_seconds": duration,
+                "dominant_emotion": dominant,
+                "emotion_percentages": emotions,
+                "camera_id": camera
+            }
+            for offset, duration, camera, dominant, emotions in self._sessions(count)
+        ]
+
+    def records(self, count):
+        """
+        Generate sessions as store records, skipping the ISO round trip
+        of summaries() so large stores fill quickly.
+
+        Args:
+            count: Number of records
+
+        Returns:
+            List of records ready for SessionLog.append()
+        """
+        from server.storage import to_epoch_us
+
+        start_us = to_epoch_us(self.start)
+        return [
+            {
+                "timestamp": start_us + int(offset * 1000000),
+                "duration_seconds": duration,
+                "dominant_emotion": dominant,
+                "emotion_percentages": emotions,
+                "camera_id": camera
+            }
+            for offset, duration, camera, dominant, emotions in self._sessions(count)
+        ]
+
+
+def fill_log(session_log, rows, seed=0, batch_size=100000, cameras=("default",)):
+    """
+    Append synthetic sessions to a session store.
+
+    Args:
+        session_log: SessionLog to fill
+        rows: Number of sessions to append
+        seed: Random seed
+        batch_size: Sessions per append() call
+        cameras: Camera ids the sessions are spread over
+    """
+    generator = SessionGenerator(seed, cameras=cameras)
+    written = 0
+    while written < rows:
+        count = min(batch_size, rows - written)
+        session_log.append(generator.records(count))
+        written += count
+
+
+class SyntheticScene:
+    """
+    Video frames with textured patches standing in for faces.
+
+    The patches move along fixed Lissajous paths over a static noise
+    background, so trackers have texture to follow and the scene is
+    identical on every run.
+    """
+
+    def __init__(self, width=640, height=480, faces=2, face_size=120, seed=0):
+        """
+        Initialize the scene.
+
+        Args:
+            width: Frame width in pixels
+            height: Frame height in pixels
+            faces: Number of moving patches
+            face_size: Side length of each patch
+            seed: Random seed for the textures and paths
+        """
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        self.face_size = face_size
+        # Smooth textures are easier to track than pixel noise
+        background = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+        self.background = cv2.resize(background, (width, height), interpolation=cv2.INTER_LINEAR)
+        self.patches = [
+            cv2.resize(rng.integers(0, 256, (12, 12, 3), dtype=np.uint8), (face_size, face_size),
+                       interpolation=cv2.INTER_LINEAR)
+            for _ in range(faces)
+        ]
+        self.phases = rng.uniform(0, 2 * np.pi, (faces, 2))
+        self.regions = []
+
+    def render(self, index, fps=30.0):
+        """
+        Render one frame.
+
+        Args:
+            index: Frame number
+            fps: Frame rate used to turn the frame number into time
+
+        Returns:
+            BGR frame; the patch positions are left in self.regions
+        """
+        t = index / fps
+        frame = self.background.copy()
+        self.regions = []
+        span_x = self.width - self.face_size
+        span_y = self.height - self.face_size
+        for i, patch in enumerate(self.patches):
+            x = int(span_x * (0.5 + 0.5 * np.sin(0.4 * t + self.phases[i, 0])))
+            y = int(span_y * (0.5 + 0.5 * np.sin(0.3 * t + self.phases[i, 1])))
+            frame[y:y + self.face_size, x:x + self.face_size] = patch
+            self.regions.append({"x": x, "y": y, "w": self.face_size, "h": self.face_size})
+        return frame
+
+
+class SceneFaceDetector:
+    """
+    Face detector reporting the patch positions of a SyntheticScene.
+    Used instead of the Haar cascade, which finds no faces in synthetic
+    frames. Regions are rescaled to the size of the frame passed in, as
+    the tracker detects on downscaled frames.
+    """
+
+    def __init__(self, scene):
+        self.scene = scene
+
+    def detect(self, frame):
+        """Return the scene's current regions in the coordinates of frame."""
+        factor = frame.shape[1] / self.scene.width
+        return [{key: int(region[key] * factor) for key in ("x", "y", "w", "h")}
+                for region in self.scene.regions]
+
+
+class StubEmotionAnalyzer(DeepFaceEmotionAnalyzer):
+    """
+    Deterministic stand-in for the emotion model.
+    Runs the real preprocessing and result conversion, but derives the
+    class scores from the pixels instead of running the network, so frame
+    processing can be benchmarked on any CPU without DeepFace.
+    """
+
+    def predict(self, images):
+        """
+        Score prepared face images.
+
+        Args:
+            images: Uint8 array of shape (N, 48, 48)
+
+        Returns:
+            Array of shape (N, number of emotion classes)
+        """
+        images = np.asarray(images, dtype=np.float32)
+        # A different image region votes for each class
+        bands = np.array_split(images.reshape(len(images), -1), len(EMOTION_LABELS), axis=1)
+        scores = np.stack([band.mean(axis=1) for band in bands], axis=1) + 1.0
+        return scores / scores.sum(axis=1, keepdims=True)
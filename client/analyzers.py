@@ -0,0 +1,267 @@
+"""
+Emotion analyzers for Affectra.
+An analyzer turns a batch of face crops into emotion results in a single
+model call. Any object with an analyze(faces) method can be plugged into
+CameraTracker; create_analyzer() picks the shared inference server when
+one is configured and an in-process model otherwise.
+"""
+
+import json
+import socket
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from client.config import INFERENCE_SOCKET
+from client.emotion_utils import EMOTION_LABELS
+
+# Side length of the grayscale face images the emotion model expects
+INPUT_SIZE = (48, 48)
+
+
+def prediction_to_result(prediction):
+    """
+    Convert one row of model output into an emotion result.
+
+    Args:
+        prediction: Array of class scores in EMOTION_LABELS order
+
+    Returns:
+        Dictionary with "dominant_emotion" and "emotion" (percentages per label)
+    """
+    percentages = 100 * prediction / prediction.sum()
+    return {
+        "dominant_emotion": EMOTION_LABELS[int(np.argmax(percentages))],
+        "emotion": {label: float(value) for label, value in zip(EMOTION_LABELS, percentages)}
+    }
+
+
+def prepare_face(face):
+    """
+    Reduce a face crop to the grayscale 48x48 image the emotion model reads.
+
+    Args:
+        face: BGR face crop (numpy array)
+
+    Returns:
+        Uint8 array of shape (48, 48)
+    """
+    gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, INPUT_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def create_analyzer():
+    """
+    Create the default emotion analyzer.
+
+    Returns:
+        A RemoteAnalyzer if AFFECTRA_INFERENCE_SOCKET is set, otherwise a
+        DeepFaceEmotionAnalyzer with its own model
+    """
+    if INFERENCE_SOCKET:
+        return RemoteAnalyzer(INFERENCE_SOCKET)
+    return DeepFaceEmotionAnalyzer()
+
+
+class DeepFaceEmotionAnalyzer:
+    """
+    Runs DeepFace's emotion model on batches of face crops.
+
+    DeepFace.analyze() only accepts one image per call, so the emotion
+    model is used directly with the same preprocessing DeepFace applies
+    (grayscale, 48x48, scaled to [0, 1]) and all faces go through one
+    predict() call.
+    """
+
+    input_size = INPUT_SIZE
+
+    def __init__(self):
+        """Initialize the analyzer; the model is loaded on first use."""
+        self._model = None
+
+    @property
+    def model(self):
+        """The DeepFace emotion model, built on first access."""
+        if self._model is None:
+            started = time.time()
+            from deepface import DeepFace
+            self._model = DeepFace.build_model("Emotion")
+            print(f"🧠 Emotion model loaded in {time.time() - started:.1f}s")
+        return self._model
+
+    def predict(self, images):
+        """
+        Run the emotion model on prepared face images.
+
+        Args:
+            images: Uint8 array of shape (N, 48, 48) from prepare_face()
+
+        Returns:
+            Array of shape (N, number of emotion classes) with class scores
+        """
+        batch = (images.astype(np.float32) / 255.0)[..., np.newaxis]
+        return self.model.predict(batch, verbose=0)
+
+    def analyze(self, faces):
+        """
+        Classify the emotions of several faces in one model call.
+
+        Args:
+            faces: List of BGR face crops
+
+        Returns:
+            List of result dictionaries, one per face, in input order
+        """
+        if not faces:
+            return []
+        predictions = self.predict(np.stack([prepare_face(face) for face in faces]))
+        return [prediction_to_result(prediction) for prediction in predictions]
+
+
+class RemoteAnalyzer:
+    """
+    Sends face crops to a shared inference server (client.inference_server).
+
+    Faces are reduced to 48x48 grayscale locally, so each one costs about
+    2 KB on the wire, and the server batches them with other callers'
+    faces. The connection is kept open and re-established after errors.
+    """
+
+    def __init__(self, socket_path=INFERENCE_SOCKET, timeout=10):
+        """
+        Initialize the analyzer; connects on first use.
+
+        Args:
+            socket_path: Unix socket of the inference server
+            timeout: Seconds to wait for a reply
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def analyze(self, faces):
+        """
+        Classify the emotions of several faces with the shared model.
+
+        Args:
+            faces: List of BGR face crops
+
+        Returns:
+            List of result dictionaries, one per face, in input order
+
+        Raises:
+            OSError: If the inference server can't be reached
+            RuntimeError: If the server reports an error
+        """
+        if not faces:
+            return []
+        images = np.stack([prepare_face(face) for face in faces])
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                send_message(self._sock, {"shape": images.shape, "dtype": "uint8"}, images.tobytes())
+                header, payload = recv_message(self._sock)
+                if header is None:
+                    # ConnectionError is an OSError, so the socket is closed below
+                    raise ConnectionError("Inference server closed the connection")
+            except (OSError, ValueError):
+                self.close()
+                raise
+        if header.get("status") != "ok":
+            raise RuntimeError(header.get("message", "Inference failed"))
+        predictions = np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+        return [prediction_to_result(prediction) for prediction in predictions]
+
+    def close(self):
+        """Close the connection to the server."""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _connect(self):
+        """Open the connection to the server."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+
+# Wire format shared with client.inference_server: a 4-byte big-endian
+# header length, a JSON header, then the raw array bytes (length in the header)
+
+# Headers only carry a shape, a dtype and a status message
+MAX_HEADER_BYTES = 4096
+
+def send_message(sock, header, payload=b""):
+    """
+    Send one message.
+
+    Args:
+        sock: Connected socket
+        header: JSON-serializable dictionary
+        payload: Raw bytes following the header
+    """
+    header = dict(header, size=len(payload))
+    encoded = json.dumps(header).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(encoded)) + encoded + payload)
+
+
+def recv_message(sock, max_size=None):
+    """
+    Receive one message.
+
+    Sizes are checked before anything is allocated, so a peer can't make
+    the receiver reserve more memory than a legitimate message needs.
+
+    Args:
+        sock: Connected socket
+        max_size: Largest payload in bytes to accept, or None for no limit
+
+    Returns:
+        Tuple of (header dictionary, payload bytes), or (None, None) if the
+        peer closed the connection between messages
+
+    Raises:
+        ValueError: If the connection closes in the middle of a message, or
+            the header or payload is malformed or too large
+    """
+    prefix = _recv_exact(sock, 4)
+    if prefix is None:
+        return None, None
+    header_size = struct.unpack(">I", prefix)[0]
+    if header_size > MAX_HEADER_BYTES:
+        raise ValueError(f"Message header of {header_size} bytes exceeds {MAX_HEADER_BYTES}")
+    header = json.loads(_recv_exact(sock, header_size, required=True))
+    if not isinstance(header, dict):
+        raise ValueError("Message header must be a JSON object")
+    size = header.get("size", 0)
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        raise ValueError(f"Invalid payload size: {size!r}")
+    if max_size is not None and size > max_size:
+        raise ValueError(f"Payload of {size} bytes exceeds {max_size}")
+    payload = _recv_exact(sock, size, required=True)
+    return header, payload
+
+
+def _recv_exact(sock, size, required=False):
+    """Read exactly size bytes; None on a clean EOF unless required."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0 and not required:
+                return None
+            raise ValueError("Connection closed in the middle of a message")
+        received += count
+    return bytes(buffer)
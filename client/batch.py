@@ -0,0 +1,262 @@
+"""
+Offline emotion analysis of recorded video files.
+
+Usage:
+    python -m client.batch VIDEO_OR_DIR [VIDEO_OR_DIR ...] [options]
+
+Videos are cut into chunks that are analyzed in parallel by a pool of
+worker processes, each holding its own warm emotion model. Every chunk
+runs the same session logic as the live camera (CameraTracker) on video
+time, and the resulting session summaries are written straight to the
+server's session store.
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from client.config import get_storage_dir
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v", ".mpg", ".mpeg")
+
+# A range of frames of one video, analyzed by one worker
+VideoChunk = namedtuple("VideoChunk", ["path", "start_frame", "end_frame", "fps", "origin"])
+
+# Analyzer of the current worker process, loaded once by init_worker()
+_worker_analyzer = None
+_worker_quiet = True
+
+
+class SummaryCollector:
+    """
+    Stand-in for SessionUploader that keeps finished session summaries
+    in memory so the worker can return them to the parent process.
+    """
+
+    def __init__(self):
+        self.summaries = []
+
+    def submit(self, summary):
+        """
+        Keep a finished session summary.
+
+        Args:
+            summary: Session summary dictionary
+        """
+        self.summaries.append(summary)
+
+
+def find_videos(paths):
+    """
+    Expand files and directories into a sorted list of video files.
+
+    Args:
+        paths: Video files or directories to search recursively
+
+    Returns:
+        List of video file paths
+    """
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in names
+                              if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print(f"⚠️ Skipping missing path: {path}")
+    return sorted(videos)
+
+
+def plan_chunks(path, chunk_seconds, start_time=None):
+    """
+    Split a video into chunks of about chunk_seconds each.
+
+    Args:
+        path: Video file path
+        chunk_seconds: Target chunk length in seconds of video
+        start_time: Recording start in epoch seconds; defaults to the file's
+            modification time minus the video duration
+
+    Returns:
+        List of VideoChunk tuples (empty if the video can't be read)
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print(f"⚠️ Cannot open video: {path}")
+        return []
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if frame_count <= 0:
+        print(f"⚠️ Video has no frames: {path}")
+        return []
+
+    if start_time is None:
+        start_time = os.path.getmtime(path) - frame_count / fps
+    chunk_frames = max(1, int(chunk_seconds * fps))
+    return [
+        VideoChunk(path, start, min(start + chunk_frames, frame_count), fps, start_time)
+        for start in range(0, frame_count, chunk_frames)
+    ]
+
+
+def init_worker(quiet):
+    """
+    Prepare a worker process: one compute thread per library, since the
+    pool already uses every core, and a warm emotion model.
+
+    Args:
+        quiet: Whether to silence the per-frame tracker output
+    """
+    global _worker_analyzer, _worker_quiet
+    os.environ.setdefault("TF_NUM_INTRAOP_THREADS", "1")
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    cv2.setNumThreads(1)
+
+    from client.analyzers import DeepFaceEmotionAnalyzer
+    _worker_quiet = quiet
+    _worker_analyzer = DeepFaceEmotionAnalyzer()
+    # Load the weights and build the predict function before the first chunk
+    _worker_analyzer.analyze([np.zeros((48, 48, 3), dtype=np.uint8)])
+
+
+def analyze_chunk(chunk, sample_fps):
+    """
+    Run the camera session logic over one chunk of a video.
+    Sessions still open at the end of the chunk are ended there.
+
+    Args:
+        chunk: VideoChunk to analyze
+        sample_fps: Frames per second of video to analyze; the others are skipped
+
+    Returns:
+        Tuple of (chunk, list of session summaries, number of analyzed frames)
+    """
+    from client.camera_tracker import CameraTracker
+
+    collector = SummaryCollector()
+    # Wall-clock budgets and latency tuning would make the sessions depend
+    # on the machine's speed and load; video time and sample_fps pace the work
+    tracker = CameraTracker(analyzer=_worker_analyzer, uploader=collector, latency_target=0, cpu_budget=None)
+    step = max(1, int(round(chunk.fps / sample_fps)))
+    analyzed = 0
+
+    output = io.StringIO() if _worker_quiet else sys.stdout
+    with contextlib.redirect_stdout(output):
+        cap = cv2.VideoCapture(chunk.path)
+        try:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, chunk.start_frame)
+            frame_index = chunk.start_frame
+            while frame_index < chunk.end_frame:
+                if (frame_index - chunk.start_frame) % step == 0:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    tracker.analyze_frame(frame, timestamp=chunk.origin + frame_index / chunk.fps)
+                    analyzed += 1
+                elif not cap.grab():  # Skipped frames are never decoded to BGR
+                    break
+                frame_index += 1
+        finally:
+            cap.release()
+        tracker.end_all_sessions(chunk.origin + frame_index / chunk.fps)
+
+    return chunk, collector.summaries, analyzed
+
+
+def _analyze_chunk_task(args):
+    """Unpack arguments for Pool.imap_unordered()."""
+    return analyze_chunk(*args)
+
+
+def run_batch(videos, session_log, sample_fps=5.0, workers=None, chunk_seconds=300,
+              start_time=None, quiet=True):
+    """
+    Analyze videos in parallel and append their sessions to the store.
+
+    Args:
+        videos: List of video file paths
+        session_log: SessionLog receiving the session records
+        sample_fps: Frames per second of video to analyze
+        workers: Number of worker processes; defaults to the CPU count
+        chunk_seconds: Length of the video chunks handed to workers.
+            Sessions crossing a chunk boundary are split in two, so keep
+            this well above typical session lengths.
+        start_time: Recording start in epoch seconds for all videos;
+            defaults to each file's modification time minus its duration
+        quiet: Whether to silence the per-frame tracker output
+
+    Returns:
+        Tuple of (number of sessions stored, number of frames analyzed)
+    """
+    from server.storage import normalize_summary
+
+    chunks = [chunk for path in videos for chunk in plan_chunks(path, chunk_seconds, start_time)]
+    if not chunks:
+        return 0, 0
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks)))
+    print(f"🎞️ Analyzing {len(videos)} video(s) in {len(chunks)} chunk(s) with {workers} worker(s)...")
+
+    # TensorFlow must not be forked after initialization, so workers are spawned fresh
+    context = multiprocessing.get_context("spawn")
+    stored = frames = done = 0
+    with context.Pool(workers, initializer=init_worker, initargs=(quiet,)) as pool:
+        tasks = [(chunk, sample_fps) for chunk in chunks]
+        for chunk, summaries, analyzed in pool.imap_unordered(_analyze_chunk_task, tasks):
+            if summaries:
+                session_log.append([normalize_summary(summary) for summary in summaries])
+            stored += len(summaries)
+            frames += analyzed
+            done += 1
+            print(f"✅ [{done}/{len(chunks)}] {os.path.basename(chunk.path)} "
+                  f"frames {chunk.start_frame}-{chunk.end_frame}: {len(summaries)} session(s)")
+    return stored, frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze recorded videos and store their emotion sessions.")
+    parser.add_argument("paths", nargs="+", help="video files or directories")
+    parser.add_argument("--fps", type=float, default=5.0, help="frames per second of video to analyze (default: 5)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-seconds", type=float, default=300, help="seconds of video per work chunk (default: 300)")
+    parser.add_argument("--start", default=None, help="ISO recording start time (default: file time minus duration)")
+    parser.add_argument("--store", default=None,
+                        help="session store directory (default: the server's, under AFFECTRA_STORAGE_DIR)")
+    parser.add_argument("--verbose", action="store_true", help="print per-frame tracker output")
+    args = parser.parse_args(argv)
+
+    from datetime import datetime
+    from server.storage import SessionLog
+
+    videos = find_videos(args.paths)
+    if not videos:
+        print("❌ No video files found.")
+        return 1
+    start_time = datetime.fromisoformat(args.start).timestamp() if args.start else None
+
+    # Resolved now, so the store is the one the server reads
+    store = args.store or os.path.join(get_storage_dir(), "sessions")
+    session_log = SessionLog(store)
+    session_log.ensure_exists()
+    began = time.time()
+    stored, frames = run_batch(videos, session_log, args.fps, args.workers, args.chunk_seconds,
+                               start_time, quiet=not args.verbose)
+    elapsed = time.time() - began
+    print(f"📊 Stored {stored} session(s) from {frames} analyzed frames in {elapsed:.1f}s "
+          f"({frames / max(elapsed, 1e-9):.1f} frames/s) → {store}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
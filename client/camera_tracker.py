@@ -1,122 +1,375 @@
 import cv2
 import time
-from deepface import DeepFace
+from client.analyzers import create_analyzer
+from client.config import INFERENCE_WIDTH, LATENCY_TARGET_MS
 from client.emotion_utils import EmotionSession
-import requests
+from client.face_detector import FaceDetector
+from client.face_tracks import FaceTrack, match_regions
+from client.metrics import Counter, Histogram, Stopwatch, stage_series
+from client.resolution import ResolutionTuner, downscale_frame, scale_region
+from client.scheduler import InferenceBudget, MotionScheduler
+from client.uploader import SessionUploader
 import numpy as np
 
+# Stages of process_frame() timed by CameraTracker
+FRAME_STAGES = ("downscale", "track", "detect", "schedule", "analyze", "publish", "draw")
+FRAME_STAGE_SECONDS = Histogram("affectra_frame_stage_seconds",
+                                "Time spent in each stage of frame analysis and drawing", ("camera", "stage"))
+FACES_ANALYZED = Counter("affectra_faces_analyzed", "Faces classified by the emotion model", ("camera",))
+ANALYSIS_ERRORS = Counter("affectra_analysis_errors", "Failed emotion model calls", ("camera",))
+SESSIONS_ENDED = Counter("affectra_sessions_ended", "Face sessions ended by the tracker", ("camera",))
+
 class CameraTracker:
     """
     Main class for tracking faces, detecting emotions, and managing emotion sessions.
-    Uses computer vision and DeepFace for real-time emotion analysis.
+    Finds faces with a cheap OpenCV detector, gives each face a stable
+    track ID with its own session, follows the faces with ROI trackers
+    between samples, and classifies the faces whose scheduler asks for
+    it (new faces, motion, recent emotion changes) in one batched
+    emotion model call.
     """
-    def __init__(self):
-        # Session tracking variables
-        self.session = None
+    def __init__(self, analyzer=None, uploader=None, inference_width=INFERENCE_WIDTH,
+                 latency_target=LATENCY_TARGET_MS / 1000.0, camera_id=None, cpu_budget=0.5):
+        """
+        Initialize the tracker.
+        
+        Args:
+            analyzer: Emotion analyzer with an analyze(faces) method;
+                defaults to create_analyzer() (the shared inference server
+                if configured, else a DeepFaceEmotionAnalyzer)
+            uploader: SessionUploader delivering finished sessions;
+                defaults to one posting to the configured server
+            inference_width: Width frames are shrunk to before analysis
+                (0 or None for full resolution)
+            latency_target: Optional p95 analysis latency target in seconds;
+                when set, inference_width is tuned to stay under it
+            camera_id: Id of the camera the frames come from, stored with
+                every session summary
+            cpu_budget: Maximum share of wall-clock time spent in the
+                emotion model, or None to classify every face that is due
+                (offline analysis, where results must not depend on how
+                fast the machine is)
+        """
+        # Cheap first-stage face detector and batched emotion analyzer
+        self.face_detector = FaceDetector()
+        self.analyzer = analyzer or create_analyzer()
+        self.crop_margin = 0.2  # fraction of the face box added around the crop
+        
+        # Frames are analyzed at a reduced width; regions are kept in that
+        # coordinate space and scaled back up for drawing
+        self.inference_width = inference_width
+        self.resolution_tuner = ResolutionTuner(latency_target, initial_width=inference_width or 640) \
+            if latency_target else None
+        if self.resolution_tuner:
+            self.inference_width = self.resolution_tuner.width
+        self._scale = 1.0
+        
+        self.camera_id = camera_id
+        
+        # Metric series are looked up once; recording them is then cheap
+        camera_label = camera_id or "default"
+        self._stage_series = stage_series(FRAME_STAGE_SECONDS, FRAME_STAGES, camera=camera_label)
+        self._faces_analyzed = FACES_ANALYZED.labels(camera=camera_label)
+        self._analysis_errors = ANALYSIS_ERRORS.labels(camera=camera_label)
+        self._sessions_ended = SESSIONS_ENDED.labels(camera=camera_label)
+        
+        # Background delivery of finished sessions (never blocks the frame loop)
+        self.uploader = uploader or SessionUploader()
+        
+        # Session tracking variables (one track and session per face)
+        self.tracks = {}
         self.session_counter = 0
         
         # Timing configuration
-        self.detection_interval = 2  # seconds between emotion detections
+        self.detection_interval = 2  # seconds between face re-detections
         self.last_detection_time = 0
-        self.no_face_start_time = None
         self.no_face_threshold = 1.5  # seconds until session ends after face disappears
         
-        # State variables
+        # Adaptive emotion sampling per face, bounded by a share of CPU time
+        self.min_sample_interval = 0.25  # fastest sampling while the face changes
+        self.max_sample_interval = 5.0  # slowest sampling of a still face
+        self.motion_threshold = 0.04  # mean crop difference (0-1) treated as motion
+        self.inference_budget = InferenceBudget(cpu_budget) if cpu_budget else None
+        
+        # State variables (face_region/current_emotion describe the largest face)
         self.face_detected = False
         self.current_frame = None
+        self._small_frame = None  # Reused buffer for the downscaled frame
         self.current_emotion = None
         self.face_region = None
+        self.overlays = []
 
-    def process_frame(self, frame):
+    def process_frame(self, frame, timestamp=None):
         """
         Process a single video frame for emotion detection and tracking.
         
         Args:
             frame: Video frame from camera feed (numpy array)
+            timestamp: Capture time in epoch seconds; defaults to now
             
         Returns:
             Processed frame with visualization elements added
         """
-        # Store current frame for reference
-        self.current_frame = frame.copy()
-        current_time = time.time()
+        self.analyze_frame(frame, timestamp)
+        with self._stage_series["draw"].time():
+            return self.draw_overlay(frame)
 
-        try:
-            # Detect face and analyze emotions using DeepFace
-            result = DeepFace.analyze(frame, actions=["emotion"], enforce_detection=True)
-            dominant_emotion = result[0]['dominant_emotion']
-            self.current_emotion = dominant_emotion
-            region = result[0].get('region')
-            self.face_region = region
-            self.face_detected = True
-
-            # Start a new session if none exists
-            if self.session is None:
-                self.session_counter += 1
-                self.session = EmotionSession()
-                self.session.start()
-                print(f"📍 Session started.")
-                print(f"👤 New person detected → Session #{self.session_counter} started.")
-
-            # Draw face rectangle and emotion label on the frame
-            if region:
-                x, y, w, h = region['x'], region['y'], region['w'], region['h']
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(frame, dominant_emotion, (x, y - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-            # Add emotion to session at regular intervals
-            if current_time - self.last_detection_time >= self.detection_interval:
-                self.session.add_emotion(dominant_emotion)
-                print(f"🧠 Detected Emotion: {dominant_emotion}")
+    def analyze_frame(self, frame, timestamp=None):
+        """
+        Detect emotions in a frame and update the session state.
+        Does not modify the frame, so it can run on a different thread
+        than the one drawing and encoding frames.
+        
+        Args:
+            frame: Video frame from camera feed (numpy array)
+            timestamp: Capture time in epoch seconds; defaults to now.
+                Recorded videos pass the frame's position so sampling and
+                session timing follow video time.
+        """
+        # Store current frame for reference, reusing the previous buffer
+        if self.current_frame is None or self.current_frame.shape != frame.shape:
+            self.current_frame = frame.copy()
+        else:
+            np.copyto(self.current_frame, frame)
+        current_time = time.time() if timestamp is None else timestamp
+        started = time.perf_counter()
+        stopwatch = Stopwatch(self._stage_series)
+
+        frame, scale = downscale_frame(frame, self.inference_width, out=self._small_frame)
+        if scale != 1.0:
+            self._small_frame = frame
+        if scale != self._scale:
+            self._rescale_tracks(frame, self._scale / scale)
+            self._scale = scale
+        stopwatch.lap("downscale")
+
+        detecting = current_time - self.last_detection_time >= self.detection_interval
+
+        # Between detections, follow every visible face instead of re-detecting it
+        need_detection = detecting or not self.tracks
+        for track in self.tracks.values():
+            if detecting or not track.roi_tracker.active:
+                need_detection = True
+                continue
+            region = track.roi_tracker.update(frame)
+            if region is None:
+                need_detection = True
+            else:
+                track.region = region
+        stopwatch.lap("track")
+
+        # Cheap detection at regular intervals, when nothing is tracked, or
+        # after a track was lost; also catches trackers drifting onto background
+        if need_detection:
+            self._assign_detections(frame, self.face_detector.detect(frame), current_time)
+            if detecting:
                 self.last_detection_time = current_time
+            stopwatch.lap("detect")
+
+        # End sessions of faces that have been gone too long
+        for track in list(self.tracks.values()):
+            if track.roi_tracker.active:
+                track.no_face_start_time = None
+            elif track.no_face_start_time is None:
+                track.no_face_start_time = current_time
+            elif current_time - track.no_face_start_time > self.no_face_threshold:
+                self._end_session(track, current_time)
+
+        # Classify the faces that changed or are due in one batched call.
+        # Faces that just appeared are classified right away; everything
+        # else waits while the inference budget is used up.
+        visible = [track for track in self.tracks.values() if track.roi_tracker.active]
+        due = [track for track in visible if track.scheduler.observe(frame, track.region, current_time)]
+        stopwatch.lap("schedule")
+        if due and (self.inference_budget is None or self.inference_budget.allows(current_time) or
+                    any(track.scheduler.last_sample_time is None for track in due)):
+            self._sample_emotions(frame, due, current_time)
+            stopwatch.lap("analyze")
+
+        self._publish_state(visible)
+        stopwatch.lap("publish")
+
+        if self.resolution_tuner and self.resolution_tuner.record(time.perf_counter() - started):
+            self.inference_width = self.resolution_tuner.width
+            print(f"📐 Inference width set to {self.inference_width}px "
+                  f"(p95 {self.resolution_tuner.last_p95 * 1000:.0f} ms)")
+
+    def _rescale_tracks(self, frame, factor):
+        """
+        Move all tracks to a new analysis resolution.
+        
+        Args:
+            frame: Frame at the new resolution
+            factor: Ratio of new to old coordinates
+        """
+        for track in self.tracks.values():
+            track.region = scale_region(track.region, factor)
+            if track.roi_tracker.active:
+                track.roi_tracker.start(frame, track.region)
+
+    def _assign_detections(self, frame, faces, current_time):
+        """
+        Match detected faces to tracks, re-seeding matched tracks and
+        starting a new track and session for every unmatched face.
+        
+        Args:
+            frame: Frame the faces were detected in
+            faces: List of region dicts from the face detector
+            current_time: Frame time in epoch seconds
+        """
+        tracks = list(self.tracks.values())
+        matches, unmatched_tracks, unmatched_faces = match_regions(
+            [track.region for track in tracks], faces)
+
+        for track_index, face_index in matches:
+            track = tracks[track_index]
+            track.region = faces[face_index]
+            track.roi_tracker.start(frame, track.region)
+
+        for track_index in unmatched_tracks:
+            tracks[track_index].roi_tracker.reset()
 
-            # Reset no-face timer since face is detected
-            self.no_face_start_time = None  
-
-        except Exception:
-            # No face detected in this frame
-            self.face_detected = False
-            self.current_emotion = None
-            self.face_region = None
-
-            # Handle session end if face disappears for too long
-            if self.session:
-                # Start or continue tracking time without a face
-                if self.no_face_start_time is None:
-                    self.no_face_start_time = time.time()
-                # End session if face has been absent beyond threshold
-                elif time.time() - self.no_face_start_time > self.no_face_threshold:
-                    self.session.end()
-                    print(f"📍 Session ended.")
-                    summary = self.session.get_summary()
-                    if summary:
-                        # Send data to the Flask server
-                        try:
-                            response = requests.post("http://localhost:5000/log", json=summary)
-                            if response.status_code == 200:
-                                print("✅ Session data sent to server.")
-                            else:
-                                print(f"⚠️ Failed to send data. Status: {response.status_code}")
-                        except Exception as e:
-                            print(f"⚠️ Error sending data to server: {e}")
-
-                        # Print session summary to console
-                        print(f"\n📋 Session #{self.session_counter} Summary:")
-                        print(f"🧾 Timestamp: {summary['timestamp']}")
-                        print(f"⏱ Duration: {summary['duration_seconds']} sec")
-                        print(f"😶 Dominant Emotion: {summary['dominant_emotion']}")
-                        print("📊 Emotion Percentages:")
-                        for emotion, pct in summary['emotion_percentages'].items():
-                            print(f"   - {emotion}: {pct}%")
-                    else:
-                        print(f"\n📋 Session #{self.session_counter} Summary: ⚠️ No emotion data.")
-                    print("—" * 40)
-
-                    # Reset session after ending
-                    self.session = None
-                    self.no_face_start_time = None
+        for face_index in unmatched_faces:
+            self.session_counter += 1
+            session = EmotionSession()
+            session.start(current_time)
+            scheduler = MotionScheduler(self.min_sample_interval, self.max_sample_interval,
+                                        self.motion_threshold)
+            track = FaceTrack(self.session_counter, faces[face_index], session, scheduler)
+            track.roi_tracker.start(frame, track.region)
+            self.tracks[track.track_id] = track
+            print(f"📍 Session started.")
+            print(f"👤 New person detected → Session #{track.track_id} started.")
 
+    def _sample_emotions(self, frame, tracks, current_time):
+        """
+        Classify the emotions of the given tracks and add them to their sessions.
+        
+        Args:
+            frame: Current video frame
+            tracks: Visible FaceTrack objects
+            current_time: Frame time in epoch seconds
+        """
+        faces = [self._crop_face(frame, track.region) for track in tracks]
+        started = time.perf_counter()
+        try:
+            results = self.analyzer.analyze(faces)
+        except Exception as e:
+            self._analysis_errors.inc()
+            print(f"⚠️ Emotion analysis failed: {e}")
+            # Back off instead of retrying on every frame
+            for track in tracks:
+                track.scheduler.sampled(current_time, track.current_emotion)
+            return
+        finally:
+            if self.inference_budget is not None:
+                self.inference_budget.record(current_time, time.perf_counter() - started)
+        self._faces_analyzed.inc(len(faces))
+        for track, result in zip(tracks, results):
+            dominant_emotion = result['dominant_emotion']
+            track.scheduler.sampled(current_time, dominant_emotion)
+            track.current_emotion = dominant_emotion
+            track.session.add_emotion(dominant_emotion, result.get('emotion'))
+            print(f"🧠 Detected Emotion (#{track.track_id}): {dominant_emotion}")
+
+    def _publish_state(self, visible):
+        """
+        Expose the tracked faces for drawing and the largest face through
+        face_detected, face_region and current_emotion.
+        
+        Args:
+            visible: Visible FaceTrack objects
+        """
+        # Replace the list in one assignment so the drawing thread never sees it half-built;
+        # regions are mapped back to the coordinates of the original frame
+        self.overlays = [(scale_region(track.region, self._scale), track.current_emotion, track.track_id)
+                         for track in visible]
+        primary = max(visible, key=lambda t: t.region['w'] * t.region['h'], default=None)
+        self.face_detected = primary is not None
+        self.face_region = scale_region(primary.region, self._scale) if primary else None
+        self.current_emotion = primary.current_emotion if primary else None
+
+    def _crop_face(self, frame, region):
+        """
+        Cut the face region out of a frame with a margin around it.
+        
+        Args:
+            frame: Full video frame
+            region: Dict with x, y, w, h keys
+            
+        Returns:
+            Cropped image (numpy view into the frame)
+        """
+        height, width = frame.shape[:2]
+        margin_x = int(region['w'] * self.crop_margin)
+        margin_y = int(region['h'] * self.crop_margin)
+        x1 = max(region['x'] - margin_x, 0)
+        y1 = max(region['y'] - margin_y, 0)
+        x2 = min(region['x'] + region['w'] + margin_x, width)
+        y2 = min(region['y'] + region['h'] + margin_y, height)
+        return frame[y1:y2, x1:x2]
+
+    def end_all_sessions(self, timestamp=None):
+        """
+        End the sessions of all tracked faces, e.g. at the end of a video.
+        
+        Args:
+            timestamp: End time in epoch seconds; defaults to now
+        """
+        for track in list(self.tracks.values()):
+            self._end_session(track, timestamp)
+        self._publish_state([])
+
+    def _end_session(self, track, timestamp=None):
+        """
+        End a track's session, queue its summary for upload and drop the track.
+        
+        Args:
+            track: FaceTrack whose face has disappeared
+            timestamp: End time in epoch seconds; defaults to now
+        """
+        track.session.end(timestamp)
+        self._sessions_ended.inc()
+        print(f"📍 Session ended.")
+        summary = track.session.get_summary()
+        if summary:
+            if self.camera_id:
+                summary["camera_id"] = self.camera_id
+            # Hand the summary to the background uploader
+            self.uploader.submit(summary)
+            print("📤 Session data queued for upload.")
+
+            # Print session summary to console
+            print(f"\n📋 Session #{track.track_id} Summary:")
+            print(f"🧾 Timestamp: {summary['timestamp']}")
+            print(f"⏱ Duration: {summary['duration_seconds']} sec")
+            print(f"😶 Dominant Emotion: {summary['dominant_emotion']}")
+            print("📊 Emotion Percentages:")
+            for emotion, pct in summary['emotion_percentages'].items():
+                print(f"   - {emotion}: {pct}%")
+        else:
+            print(f"\n📋 Session #{track.track_id} Summary: ⚠️ No emotion data.")
+        print("—" * 40)
+
+        # Forget the track after ending its session
+        del self.tracks[track.track_id]
+
+    def draw_overlay(self, frame):
+        """
+        Draw the most recent face rectangles and emotion labels on a frame.
+        
+        Args:
+            frame: Video frame to draw on (modified in place)
+            
+        Returns:
+            The same frame with visualization elements added
+        """
+        for region, emotion, track_id in self.overlays:
+            x, y, w, h = region['x'], region['y'], region['w'], region['h']
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            label = f"#{track_id} {emotion}" if emotion else f"#{track_id}"
+            cv2.putText(frame, label, (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
         return frame
 
     def get_current_frame(self):
@@ -171,9 +424,10 @@ def start_camera():
             print("👋 Exiting...")
             break
 
-    # Clean up resources
+    # Clean up resources and deliver any queued sessions
     cap.release()
     cv2.destroyAllWindows()
+    tracker.uploader.stop()
 
 if __name__ == "__main__":
     start_camera()
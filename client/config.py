@@ -0,0 +1,73 @@
+"""
+Configuration for the Affectra client.
+Values can be overridden with environment variables.
+"""
+
+import os
+
+CLIENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Base URL of the Affectra server that receives session summaries
+SERVER_URL = os.environ.get("AFFECTRA_SERVER_URL", "http://localhost:5000")
+
+# Directory where summaries are kept while the server is unreachable
+SPOOL_DIR = os.environ.get("AFFECTRA_SPOOL_DIR", os.path.join(CLIENT_DIR, "spool"))
+
+# Unix socket of a shared inference server (python -m client.inference_server);
+# when unset every process loads its own emotion model
+INFERENCE_SOCKET = os.environ.get("AFFECTRA_INFERENCE_SOCKET", "")
+
+# Width frames are shrunk to before face detection, tracking and cropping
+# (0 analyzes full-resolution frames)
+INFERENCE_WIDTH = int(os.environ.get("AFFECTRA_INFERENCE_WIDTH", "640"))
+
+# Optional p95 frame analysis latency target in milliseconds; when set the
+# inference width is tuned automatically to stay under it
+LATENCY_TARGET_MS = float(os.environ.get("AFFECTRA_LATENCY_TARGET_MS", "0"))
+
+# Id of the camera when none are configured; matches server.storage
+DEFAULT_CAMERA_ID = "default"
+
+
+def get_storage_dir():
+    """
+    Return the server's storage directory (session store, snapshot, secret).
+    Read when called rather than on import, so AFFECTRA_STORAGE_DIR can be
+    set by a program (e.g. the benchmarks) after this module was loaded.
+
+    Returns:
+        AFFECTRA_STORAGE_DIR, or server/storage in the project
+    """
+    return os.environ.get("AFFECTRA_STORAGE_DIR") or os.path.join(os.path.dirname(CLIENT_DIR), "server", "storage")
+
+
+def parse_camera_map(spec):
+    """
+    Parse a comma separated list of camera entries.
+
+    Entries are "id=value", e.g. "lobby=0,door=rtsp://10.0.0.5/stream";
+    an entry without a valid id (letters, digits, "-" and "_") is named
+    after its position, "camera1", "camera2" and so on.
+
+    Args:
+        spec: The list as a string
+
+    Returns:
+        Dictionary of camera id -> value string, in the given order
+    """
+    cameras = {}
+    for position, entry in enumerate(filter(None, (e.strip() for e in spec.split(","))), start=1):
+        camera_id, sep, value = entry.partition("=")
+        if not sep or not camera_id or not camera_id.replace("-", "").replace("_", "").isalnum():
+            camera_id, value = f"camera{position}", entry
+        cameras[camera_id] = value.strip()
+    return cameras
+
+
+# Video sources, "id=source" separated by commas: device indices, RTSP/HTTP
+# stream URLs or video file paths. Each camera gets its own tracker, and in
+# production mode its own process.
+CAMERAS = {
+    camera_id: int(source) if source.isdigit() else source
+    for camera_id, source in parse_camera_map(os.environ.get("AFFECTRA_CAMERAS", "")).items()
+} or {DEFAULT_CAMERA_ID: 0}
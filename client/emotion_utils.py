@@ -1,85 +1,168 @@
-from collections import Counter
 import time
 from datetime import datetime
 
+import numpy as np
+
+# Output classes of the DeepFace emotion model, in model order
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
 class EmotionSession:
     """
     Tracks and analyzes emotion data for a single session.
     A session represents a continuous period where a face is visible.
-    Collects emotion observations and provides summary statistics.
+    Folds each emotion observation into fixed-size running counters, so
+    memory stays constant however long the session lasts and summaries
+    cost O(number of emotion classes).
     """
-    
-    def __init__(self):
-        """Initialize a new emotion tracking session."""
-        self.emotions = []  # List to store all detected emotions
+
+    __slots__ = (
+        "labels", "_index", "counts", "first_seen", "samples",
+        "probability_sum", "probability_samples", "ewma_alpha", "ewma",
+        "start_time", "end_time"
+    )
+
+    def __init__(self, labels=EMOTION_LABELS, ewma_alpha=None):
+        """
+        Initialize a new emotion tracking session.
+
+        Args:
+            labels: Emotion classes expected from the analyzer; unknown
+                emotions are added on first sight
+            ewma_alpha: Optional smoothing factor (0-1) for an exponentially
+                weighted moving average of the probability vectors
+        """
+        self.labels = list(labels)
+        self._index = {label: i for i, label in enumerate(self.labels)}
+        self.counts = np.zeros(len(self.labels), dtype=np.int64)  # Dominant-emotion counts
+        self.first_seen = np.full(len(self.labels), -1, dtype=np.int64)  # Sample index of first sighting
+        self.samples = 0
+        self.probability_sum = np.zeros(len(self.labels))  # Sum of probability vectors
+        self.probability_samples = 0
+        self.ewma_alpha = ewma_alpha
+        self.ewma = None
         self.start_time = None  # Session start timestamp
         self.end_time = None  # Session end timestamp
 
-    def start(self):
+    def start(self, timestamp=None):
         """
         Start the emotion tracking session.
         Records the current time as the start time.
+
+        Args:
+            timestamp: Start time in epoch seconds (e.g. the position in a
+                recorded video); defaults to now
         """
-        self.start_time = time.time()
+        self.start_time = time.time() if timestamp is None else timestamp
         print("📍 Session started.")
 
-    def add_emotion(self, emotion):
+    def add_emotion(self, emotion, probabilities=None):
         """
         Add a detected emotion to the session.
-        
+
         Args:
             emotion (str): The detected emotion (e.g., "happy", "sad", etc.)
-        
+            probabilities (dict): Optional scores for every emotion class
+                (e.g. DeepFace's "emotion" percentages)
+
         Notes:
             Automatically starts the session if not already started
         """
         if self.start_time is None:
             self.start()
-        self.emotions.append(emotion)
 
-    def end(self):
+        i = self._label_index(emotion)
+        if probabilities:
+            # Register every label before sizing the vector
+            indices = [self._label_index(label) for label in probabilities]
+            vector = np.zeros(len(self.labels))
+            vector[indices] = list(probabilities.values())
+
+        if self.first_seen[i] < 0:
+            self.first_seen[i] = self.samples
+        self.counts[i] += 1
+        self.samples += 1
+
+        if probabilities:
+            self.probability_sum += vector
+            self.probability_samples += 1
+            if self.ewma_alpha is not None:
+                if self.ewma is None:
+                    self.ewma = vector
+                else:
+                    self.ewma = self.ewma_alpha * vector + (1 - self.ewma_alpha) * self.ewma
+
+    def _label_index(self, label):
+        """Return the accumulator index of a label, growing the arrays for new labels."""
+        i = self._index.get(label)
+        if i is None:
+            i = len(self.labels)
+            self.labels.append(label)
+            self._index[label] = i
+            self.counts = np.append(self.counts, 0)
+            self.first_seen = np.append(self.first_seen, -1)
+            self.probability_sum = np.append(self.probability_sum, 0.0)
+            if self.ewma is not None:
+                self.ewma = np.append(self.ewma, 0.0)
+        return i
+
+    def end(self, timestamp=None):
         """
         End the emotion tracking session.
         Records the current time as the end time.
+
+        Args:
+            timestamp: End time in epoch seconds; defaults to now
         """
-        self.end_time = time.time()
+        self.end_time = time.time() if timestamp is None else timestamp
         print("📍 Session ended.")
 
     def get_summary(self):
         """
         Generate a summary of the emotion session.
-        
+
         Returns:
             dict: A dictionary containing:
-                - timestamp: ISO formatted time when the session ended
+                - timestamp: ISO formatted (local) time when the session ended
                 - duration_seconds: Length of session in seconds
                 - dominant_emotion: Most frequently detected emotion
                 - emotion_percentages: Distribution of emotions as percentages
-                
+                - mean_emotion_probabilities: Average probability (in percent)
+                  of every emotion class, if probabilities were supplied
+                - ewma_emotion_probabilities: Smoothed probabilities, if
+                  ewma_alpha was set
+
             Returns empty dict if no emotions were detected.
         """
-        if not self.emotions:
+        if self.samples == 0:
             return {}
 
         # Calculate total session duration
         total_duration = round(self.end_time - self.start_time, 2)
-        
-        # Count occurrences of each emotion
-        counter = Counter(self.emotions)
-        
-        # Determine the most common emotion
-        dominant_emotion = counter.most_common(1)[0][0]
-        
+
+        # Emotions in order of first sighting; ties go to the one seen first
+        seen = [i for i in np.argsort(self.first_seen, kind="stable") if self.first_seen[i] >= 0]
+        dominant_emotion = self.labels[max(seen, key=lambda i: self.counts[i])]
+
         # Calculate percentage for each detected emotion
         emotion_percentages = {
-            emotion: round((count / len(self.emotions)) * 100, 2)
-            for emotion, count in counter.items()
+            self.labels[i]: round((int(self.counts[i]) / self.samples) * 100, 2)
+            for i in seen
         }
 
         # Return structured summary data
-        return {
-            "timestamp": datetime.now().isoformat(),
+        summary = {
+            "timestamp": datetime.fromtimestamp(self.end_time).isoformat(),
             "duration_seconds": total_duration,
             "dominant_emotion": dominant_emotion,
             "emotion_percentages": emotion_percentages
-        }
\ No newline at end of file
+        }
+        if self.probability_samples:
+            mean = self.probability_sum / self.probability_samples
+            summary["mean_emotion_probabilities"] = {
+                label: round(float(value), 2) for label, value in zip(self.labels, mean)
+            }
+        if self.ewma is not None:
+            summary["ewma_emotion_probabilities"] = {
+                label: round(float(value), 2) for label, value in zip(self.labels, self.ewma)
+            }
+        return summary
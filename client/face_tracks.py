@@ -0,0 +1,142 @@
+"""
+Multi-face tracking for Affectra.
+Assigns stable IDs to faces across frames so every person in view gets
+their own emotion session.
+"""
+
+import numpy as np
+
+from client.roi_tracker import RoiTracker
+from client.scheduler import MotionScheduler
+
+
+def regions_to_boxes(regions):
+    """
+    Convert region dicts to an (N, 4) array of x, y, w, h.
+
+    Args:
+        regions: List of dicts with x, y, w, h keys
+
+    Returns:
+        Float array of shape (N, 4)
+    """
+    if not regions:
+        return np.zeros((0, 4))
+    return np.array([[r["x"], r["y"], r["w"], r["h"]] for r in regions], dtype=float)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Compute pairwise intersection-over-union of two sets of boxes.
+
+    Args:
+        boxes_a: Array of shape (N, 4) with x, y, w, h
+        boxes_b: Array of shape (M, 4) with x, y, w, h
+
+    Returns:
+        Array of shape (N, M)
+    """
+    ax1, ay1 = boxes_a[:, 0:1], boxes_a[:, 1:2]
+    ax2, ay2 = ax1 + boxes_a[:, 2:3], ay1 + boxes_a[:, 3:4]
+    bx1, by1 = boxes_b[:, 0], boxes_b[:, 1]
+    bx2, by2 = bx1 + boxes_b[:, 2], by1 + boxes_b[:, 3]
+
+    inter_w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    intersection = inter_w * inter_h
+    union = boxes_a[:, 2:3] * boxes_a[:, 3:4] + boxes_b[:, 2] * boxes_b[:, 3] - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+def center_distance_matrix(boxes_a, boxes_b):
+    """
+    Compute pairwise center distances, normalized by the size of boxes_a.
+
+    Args:
+        boxes_a: Array of shape (N, 4) with x, y, w, h
+        boxes_b: Array of shape (M, 4) with x, y, w, h
+
+    Returns:
+        Array of shape (N, M); 1.0 means one box width/height apart
+    """
+    centers_a = boxes_a[:, :2] + boxes_a[:, 2:] / 2
+    centers_b = boxes_b[:, :2] + boxes_b[:, 2:] / 2
+    distance = np.linalg.norm(centers_a[:, np.newaxis, :] - centers_b[np.newaxis, :, :], axis=2)
+    scale = np.maximum(boxes_a[:, 2:].max(axis=1, keepdims=True), 1e-9)
+    return distance / scale
+
+
+def _greedy_match(scores, valid, matches, free_rows, free_cols):
+    """
+    Greedily pair rows and columns by descending score where valid.
+    Equal scores go to the lower row, then the lower column, so ties
+    are resolved the same way on every frame.
+    """
+    order = np.argsort(-scores, axis=None, kind="stable")
+    for flat in order:
+        row, col = (int(i) for i in np.unravel_index(flat, scores.shape))
+        if not valid[row, col]:
+            break
+        if row in free_rows and col in free_cols:
+            matches.append((row, col))
+            free_rows.discard(row)
+            free_cols.discard(col)
+
+
+def match_regions(track_regions, detections, iou_threshold=0.3, max_center_distance=0.5):
+    """
+    Match detected faces to existing tracks.
+
+    Pairs are matched greedily by IoU first; boxes that don't overlap
+    enough are then matched by center distance, which handles fast
+    movement and detector jitter on small faces.
+
+    Args:
+        track_regions: Last known regions of the existing tracks
+        detections: Regions found in the current frame
+        iou_threshold: Minimum IoU for an overlap match
+        max_center_distance: Maximum normalized center distance for a
+            distance match
+
+    Returns:
+        Tuple of (list of (track index, detection index) pairs,
+        unmatched track indices, unmatched detection indices)
+    """
+    free_rows = set(range(len(track_regions)))
+    free_cols = set(range(len(detections)))
+    matches = []
+    if track_regions and detections:
+        tracks = regions_to_boxes(track_regions)
+        found = regions_to_boxes(detections)
+
+        ious = iou_matrix(tracks, found)
+        _greedy_match(ious, ious >= iou_threshold, matches, free_rows, free_cols)
+
+        distances = center_distance_matrix(tracks, found)
+        _greedy_match(-distances, distances <= max_center_distance, matches, free_rows, free_cols)
+
+    return matches, sorted(free_rows), sorted(free_cols)
+
+
+class FaceTrack:
+    """
+    A single tracked face and its emotion session.
+    """
+
+    def __init__(self, track_id, region, session, scheduler=None):
+        """
+        Initialize the track.
+
+        Args:
+            track_id: Stable numeric ID of the face
+            region: Dict with x, y, w, h keys where the face was first seen
+            session: EmotionSession collecting this face's emotions
+            scheduler: MotionScheduler deciding when to classify the face
+        """
+        self.track_id = track_id
+        self.region = region
+        self.session = session
+        self.roi_tracker = RoiTracker()
+        self.scheduler = scheduler or MotionScheduler()
+        self.current_emotion = None
+        self.no_face_start_time = None
@@ -0,0 +1,231 @@
+"""
+Shared emotion inference server for Affectra.
+
+Usage:
+    python -m client.inference_server [--socket PATH] [--max-batch N] [--max-wait-ms MS]
+
+Holds one warm emotion model and serves it over a Unix socket, so
+cameras, web workers and batch jobs don't each load their own copy.
+Faces from concurrent callers are collected into micro-batches and
+classified in one model call. Point clients at it with
+AFFECTRA_INFERENCE_SOCKET=PATH; CameraTracker then uses a RemoteAnalyzer.
+"""
+
+import argparse
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+
+import numpy as np
+
+from client.analyzers import INPUT_SIZE, DeepFaceEmotionAnalyzer, recv_message, send_message
+
+DEFAULT_SOCKET_PATH = "/tmp/affectra-inference.sock"
+
+
+class _InferenceRequest:
+    """Faces from one caller waiting for their predictions."""
+
+    __slots__ = ("images", "done", "predictions", "error")
+
+    def __init__(self, images):
+        self.images = images
+        self.done = threading.Event()
+        self.predictions = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Merges inference requests from many threads into batched model calls.
+
+    A single worker thread takes the first waiting request, then keeps
+    collecting requests until max_batch faces are queued or max_wait
+    seconds have passed, runs one predict() over all of them and hands
+    each caller its slice of the output.
+    """
+
+    def __init__(self, analyzer, max_batch=32, max_wait=0.005):
+        """
+        Initialize the batcher.
+
+        Args:
+            analyzer: DeepFaceEmotionAnalyzer (or anything with predict(images))
+            max_batch: Maximum number of faces per model call
+            max_wait: Seconds to wait for more requests before running a batch
+        """
+        self.analyzer = analyzer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="affectra-batcher", daemon=True)
+        self.batches = 0
+        self.faces = 0
+
+    def start(self):
+        """Start the batching thread."""
+        self._thread.start()
+
+    def predict(self, images):
+        """
+        Classify prepared faces, waiting for the batch they end up in.
+
+        Args:
+            images: Uint8 array of shape (N, 48, 48)
+
+        Returns:
+            Array of class scores with one row per face
+        """
+        request = _InferenceRequest(images)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.predictions
+
+    def stats(self):
+        """Return batching counters as a dictionary."""
+        return {
+            "batches": self.batches,
+            "faces": self.faces,
+            "avg_batch_size": self.faces / self.batches if self.batches else 0.0
+        }
+
+    def _run(self):
+        """Collect requests into batches and run them until the process exits."""
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].images)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.images)
+            self._predict(batch)
+
+    def _predict(self, batch):
+        """Run one model call for a batch of requests and wake their callers."""
+        try:
+            predictions = self.analyzer.predict(np.concatenate([request.images for request in batch]))
+            self.batches += 1
+            self.faces += len(predictions)
+            offset = 0
+            for request in batch:
+                request.predictions = predictions[offset:offset + len(request.images)]
+                offset += len(request.images)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        for request in batch:
+            request.done.set()
+
+
+class _InferenceHandler(socketserver.BaseRequestHandler):
+    """Serves requests from one client connection until it closes."""
+
+    def handle(self):
+        # A request never needs more than one full batch of faces
+        max_size = self.server.batcher.max_batch * INPUT_SIZE[0] * INPUT_SIZE[1]
+        while True:
+            try:
+                header, payload = recv_message(self.request, max_size)
+            except OSError:
+                return
+            except ValueError as e:
+                # The rest of the message is unread, so the connection can't be reused
+                try:
+                    send_message(self.request, {"status": "error", "message": str(e)})
+                except OSError:
+                    pass
+                return
+            if header is None:
+                return
+            try:
+                shape = tuple(header["shape"])
+                if header.get("dtype") != "uint8" or len(shape) != 3 or shape[1:] != INPUT_SIZE:
+                    raise ValueError(f"Expected uint8 faces of shape (N, {INPUT_SIZE[0]}, {INPUT_SIZE[1]})")
+                images = np.frombuffer(payload, dtype=np.uint8).reshape(shape)
+                predictions = np.ascontiguousarray(self.server.batcher.predict(images), dtype=np.float32)
+                reply = {"status": "ok", "shape": predictions.shape, "dtype": "float32"}
+                body = predictions.tobytes()
+            except Exception as e:
+                reply, body = {"status": "error", "message": str(e)}, b""
+            try:
+                send_message(self.request, reply, body)
+            except OSError:
+                return
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server handing every connection to its own thread; all
+    threads share one MicroBatcher and therefore one model.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, batcher):
+        """
+        Initialize the server and bind the socket.
+
+        Args:
+            socket_path: Path of the Unix socket (replaced if it exists)
+            batcher: Started MicroBatcher serving predictions
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.batcher = batcher
+        super().__init__(socket_path, _InferenceHandler)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def main(argv=None):
+    """
+    Load the emotion model and serve it until interrupted.
+
+    Args:
+        argv: Command line arguments (defaults to sys.argv[1:])
+
+    Returns:
+        Process exit status
+    """
+    parser = argparse.ArgumentParser(description="Serve one shared emotion model over a Unix socket.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help=f"socket path (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument("--max-batch", type=int, default=32, help="maximum faces per model call (default: 32)")
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="milliseconds to wait for a fuller batch (default: 5)")
+    args = parser.parse_args(argv)
+
+    analyzer = DeepFaceEmotionAnalyzer()
+    print("🧠 Loading emotion model...")
+    # Build the model and its predict function before accepting clients
+    analyzer.predict(np.zeros((1,) + INPUT_SIZE, dtype=np.uint8))
+
+    batcher = MicroBatcher(analyzer, args.max_batch, args.max_wait_ms / 1000.0)
+    batcher.start()
+    server = InferenceServer(args.socket, batcher)
+    print(f"🚀 Inference server listening on {args.socket}")
+    print(f"💡 Use it with: AFFECTRA_INFERENCE_SOCKET={args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"👋 Exiting... ({batcher.stats()['faces']} faces in {batcher.stats()['batches']} batches)")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""
+Low-overhead metrics for Affectra.
+Counters, gauges and latency histograms kept in process memory and
+rendered in the Prometheus text format by the server's /metrics endpoint.
+Recording a value costs a lock, an addition and, for histograms, a
+binary search over the bucket bounds.
+"""
+
+import bisect
+import math
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond stages to slow model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects."""
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value):
+    """Escape a label value for the text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    """Format a label dict as {a="1",b="2"}, or "" without labels."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class _CounterValue:
+    """One labelled series of a Counter."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """Add amount (must not be negative)."""
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield f"{name}_total", labels, self.value
+
+
+class _GaugeValue:
+    """One labelled series of a Gauge."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        """Set the gauge to value."""
+        self.value = value
+
+    def inc(self, amount=1):
+        """Add amount."""
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        """Subtract amount."""
+        with self._lock:
+            self.value -= amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class _HistogramValue:
+    """One labelled series of a Histogram."""
+
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Record one value (e.g. a duration in seconds)."""
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the duration of the enclosed block."""
+        return _Timer(self)
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            cumulative += count
+            yield f"{name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+        yield f"{name}_sum", labels, total
+        yield f"{name}_count", labels, cumulative
+
+
+class _Timer:
+    """Observes the time spent in a with block."""
+
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class _Metric:
+    """
+    A named metric with zero or more label dimensions.
+    Series for label values are created on first use; metrics without
+    labels forward inc()/set()/observe() to their only series.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        """
+        Initialize and register the metric.
+
+        Args:
+            name: Metric name, e.g. "affectra_frame_stage_seconds"
+            documentation: One line describing the metric
+            labelnames: Names of the label dimensions
+            registry: MetricsRegistry to register with; defaults to REGISTRY
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, **labels):
+        """
+        Return the series for the given label values.
+        Look series up once and keep them on hot paths.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._create())
+        return series
+
+    def _create(self):
+        raise NotImplementedError
+
+    def _only(self):
+        """The series of a metric without labels."""
+        return self.labels()
+
+    def samples(self):
+        """Yield (sample name, labels, value) for every series."""
+        with self._lock:
+            series_items = sorted(self._series.items(), key=lambda item: item[0])
+        for key, series in series_items:
+            yield from series.samples(self.name, dict(zip(self.labelnames, key)))
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, exposed as <name>_total."""
+
+    kind = "counter"
+
+    def _create(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self._only().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def _create(self):
+        return _GaugeValue()
+
+    def set(self, value):
+        self._only().set(value)
+
+    def inc(self, amount=1):
+        self._only().inc(amount)
+
+    def dec(self, amount=1):
+        self._only().dec(amount)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        """
+        Initialize and register the histogram.
+
+        Args:
+            buckets: Ascending upper bounds of the buckets; +Inf is implied
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _create(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._only().observe(value)
+
+    def time(self):
+        return self._only().time()
+
+
+class MetricsRegistry:
+    """The metrics of one process."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Add a metric.
+
+        Raises:
+            ValueError: If a metric of that name is already registered
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text format.
+        Metrics that have no series yet are left out.
+
+        Returns:
+            The exposition text
+        """
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            samples = list(metric.samples())
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+# Registry of this process
+REGISTRY = MetricsRegistry()
+
+
+def _add_labels(line, labels):
+    """Add labels to one sample line of the text format."""
+    extra = _format_labels(labels)[1:-1]
+    if "{" in line:
+        name, _, rest = line.partition("{")
+        return f"{name}{{{extra},{rest}"
+    name, _, rest = line.partition(" ")
+    return f"{name}{{{extra}}} {rest}"
+
+
+def merge_exposition(texts):
+    """
+    Merge Prometheus texts from several processes into one.
+    Samples of the same metric are grouped under a single HELP/TYPE
+    header, as the format requires.
+
+    Args:
+        texts: List of (exposition text, labels) pairs; the labels are
+            added to every sample of that text so series of different
+            processes stay apart
+
+    Returns:
+        The merged text
+    """
+    headers = {}
+    samples = {}
+    for text, labels in texts:
+        name = None
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                name = line.split(" ", 3)[2]
+                header = headers.setdefault(name, [])
+                if line not in header:
+                    header.append(line)
+                samples.setdefault(name, [])
+            elif line and not line.startswith("#") and name is not None:
+                samples[name].append(_add_labels(line, labels) if labels else line)
+    lines = []
+    for name, header in headers.items():
+        lines.extend(header)
+        lines.extend(samples[name])
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+class Stopwatch:
+    """
+    Times consecutive stages of one operation into histogram series.
+
+    Each lap() records the time since the previous lap (or since the
+    stopwatch was created) under the given stage, so instrumenting a
+    function costs one clock read per stage.
+    """
+
+    __slots__ = ("_series", "_last")
+
+    def __init__(self, series):
+        """
+        Start the stopwatch.
+
+        Args:
+            series: Dict of stage name -> histogram series (from labels())
+        """
+        self._series = series
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """Record the time since the last lap as one stage."""
+        now = time.perf_counter()
+        self._series[stage].observe(now - self._last)
+        self._last = now
+
+    def skip(self):
+        """Don't count the time since the last lap towards any stage."""
+        self._last = time.perf_counter()
+
+
+def stage_series(histogram, stages, **labels):
+    """
+    Look up the series of a stage histogram for a Stopwatch.
+
+    Args:
+        histogram: Histogram with a "stage" label
+        stages: Stage names
+        labels: Values of the histogram's other labels
+
+    Returns:
+        Dict of stage name -> series
+    """
+    return {stage: histogram.labels(stage=stage, **labels) for stage in stages}
@@ -0,0 +1,519 @@
+"""
+Threaded video pipeline for Affectra.
+Runs frame capture, emotion inference and JPEG encoding as separate
+stages so the video stream is not limited by model latency.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from client.metrics import Counter, Histogram, Stopwatch, stage_series
+
+PIPELINE_STAGE_SECONDS = Histogram("affectra_pipeline_stage_seconds",
+                                   "Time per frame in each video pipeline stage", ("camera", "stage"))
+ENCODE_STAGE_SECONDS = Histogram("affectra_encode_stage_seconds",
+                                 "Time per frame in each step of the encode stage", ("camera", "stage"))
+FRAMES_DROPPED = Counter("affectra_frames_dropped",
+                         "Frames skipped by a pipeline stage that was still busy", ("camera", "stage"))
+
+
+class LatestQueue:
+    """
+    Bounded queue where new items push out the oldest ones.
+    Used between pipeline stages so a slow consumer always gets the most
+    recent frame instead of a growing backlog.
+    """
+
+    def __init__(self, maxsize=1, on_drop=None):
+        """
+        Initialize the queue.
+
+        Args:
+            maxsize: Maximum number of items kept
+            on_drop: Optional callable receiving items pushed out of the queue
+        """
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self._items = []
+        self._cond = threading.Condition()
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Add an item, dropping the oldest one if the queue is full."""
+        dropped = None
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.pop(0)
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+
+    def get(self, timeout=None):
+        """
+        Remove and return the oldest item.
+
+        Args:
+            timeout: Seconds to wait for an item (None waits forever)
+
+        Returns:
+            The item, or None if the timeout expired
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.pop(0)
+
+    def depth(self):
+        """Return the number of queued items."""
+        with self._cond:
+            return len(self._items)
+
+    def stats(self):
+        """Return queue depth and counters as a dictionary."""
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "maxsize": self.maxsize,
+                "put": self.put_count,
+                "dropped": self.dropped
+            }
+
+
+class PooledFrame:
+    """
+    A frame buffer borrowed from a FramePool.
+    Reference counted: every stage holding the frame calls release()
+    when done, and the buffer goes back to the pool after the last one.
+    """
+
+    __slots__ = ("pool", "array", "_refs")
+
+    def __init__(self, pool, array):
+        self.pool = pool
+        self.array = array
+        self._refs = 0
+
+    def retain(self, count=1):
+        """Add references for stages the frame is handed to."""
+        with self.pool._lock:
+            self._refs += count
+
+    def release(self):
+        """Drop one reference, returning the buffer to the pool after the last."""
+        self.pool._release(self)
+
+
+class FramePool:
+    """
+    Preallocated ring of frame buffers shared by the pipeline stages.
+
+    The camera reads straight into a pooled buffer that is handed by
+    reference to the inference and encode stages, so in steady state no
+    frame-sized arrays are allocated at all. Buffers are only allocated
+    while the pool warms up, when the frame size changes, or when every
+    buffer is still in use.
+    """
+
+    def __init__(self, size=6):
+        """
+        Initialize the pool.
+
+        Args:
+            size: Maximum number of idle buffers kept for reuse
+        """
+        self.size = size
+        self.shape = None
+        self._free = []
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """
+        Borrow a buffer of the given shape.
+
+        Args:
+            shape: Frame shape, e.g. (480, 640, 3)
+            dtype: Element type
+
+        Returns:
+            PooledFrame holding one reference
+        """
+        with self._lock:
+            if shape != self.shape:
+                # Frame size changed; buffers of the old size are dropped
+                self.shape = shape
+                self._free = []
+            if self._free:
+                frame = self._free.pop()
+                self.reused += 1
+            else:
+                frame = PooledFrame(self, np.empty(shape, dtype=dtype))
+                self.allocated += 1
+            frame._refs = 1
+            return frame
+
+    def wrap(self, array):
+        """
+        Adopt an array allocated elsewhere (e.g. by the camera driver).
+
+        Returns:
+            PooledFrame holding one reference
+        """
+        with self._lock:
+            self.shape = array.shape
+            self.allocated += 1
+            frame = PooledFrame(self, array)
+            frame._refs = 1
+            return frame
+
+    def stats(self):
+        """Return pool counters as a dictionary."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "free": len(self._free),
+                "allocated": self.allocated,
+                "reused": self.reused
+            }
+
+    def _release(self, frame):
+        with self._lock:
+            frame._refs -= 1
+            if frame._refs == 0 and frame.array.shape == self.shape and len(self._free) < self.size:
+                self._free.append(frame)
+
+
+class FrameBroadcaster:
+    """
+    Fans encoded frames out to any number of viewers.
+
+    Only the latest frame is kept, tagged with a sequence number. Each
+    subscriber remembers the last sequence number it received, so a slow
+    viewer simply skips to the newest frame instead of holding up the
+    producer or the other viewers.
+    """
+
+    def __init__(self):
+        """Initialize an empty broadcaster."""
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._subscribers = set()
+        self.closed = False
+
+    def publish(self, frame):
+        """
+        Make a frame available to all subscribers.
+
+        Args:
+            frame: Encoded frame bytes
+        """
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify_all()
+
+    def subscribe(self):
+        """
+        Register a new viewer.
+
+        Returns:
+            A FrameSubscriber; call close() on it when the viewer leaves
+        """
+        subscriber = FrameSubscriber(self)
+        with self._cond:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def close(self):
+        """Wake up all subscribers and stop handing out frames."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def subscriber_count(self):
+        """Return the number of connected viewers."""
+        with self._cond:
+            return len(self._subscribers)
+
+    def stats(self):
+        """Return publishing and per-viewer skip counters as a dictionary."""
+        with self._cond:
+            return {
+                "published": self._seq,
+                "subscribers": len(self._subscribers),
+                "skipped": [subscriber.skipped for subscriber in self._subscribers]
+            }
+
+    def _unsubscribe(self, subscriber):
+        with self._cond:
+            self._subscribers.discard(subscriber)
+
+    def _wait_for(self, last_seq, timeout):
+        """Wait for a frame newer than last_seq; returns (seq, frame) or (last_seq, None)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > last_seq or self.closed, timeout):
+                return last_seq, None
+            if self._seq <= last_seq:
+                return last_seq, None
+            return self._seq, self._frame
+
+
+class FrameSubscriber:
+    """A single viewer of a FrameBroadcaster."""
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self.last_seq = broadcaster._seq
+        self.received = 0
+        self.skipped = 0
+
+    def get(self, timeout=1.0):
+        """
+        Return the newest frame this viewer hasn't seen yet.
+
+        Args:
+            timeout: Seconds to wait for a new frame
+
+        Returns:
+            Frame bytes, or None if no new frame arrived in time
+        """
+        seq, frame = self.broadcaster._wait_for(self.last_seq, timeout)
+        if frame is None:
+            return None
+        self.skipped += seq - self.last_seq - 1
+        self.received += 1
+        self.last_seq = seq
+        return frame
+
+    def close(self):
+        """Unregister this viewer."""
+        self.broadcaster._unsubscribe(self)
+
+
+class FramePipeline:
+    """
+    Three-stage capture / inference / encode pipeline.
+
+    - Capture reads the camera at its native rate and hands every frame
+      to both other stages.
+    - Inference analyzes the latest frame whenever it is free; frames
+      that arrive while the model is busy are dropped.
+    - Encode draws the most recent emotion overlay on each frame,
+      JPEG-encodes it once and publishes it to every viewer through a
+      FrameBroadcaster. Encoding is skipped while nobody is watching.
+
+    Stages run on their own threads (OpenCV and the model release the
+    GIL) and are connected by LatestQueue instances. Frames travel
+    between them by reference in buffers from a FramePool, and each
+    published frame is one ready-to-send bytes object shared by all
+    viewers, so the per-frame allocations are the JPEG and that object.
+    """
+
+    def __init__(self, camera, tracker, draw=None, jpeg_quality=95, framing=(b"", b""), pool_size=6,
+                 camera_id="default"):
+        """
+        Initialize the pipeline.
+
+        Args:
+            camera: OpenCV VideoCapture (or anything with read())
+            tracker: CameraTracker used for analysis and drawing
+            draw: Callable drawing the overlay on a frame; defaults to
+                tracker.draw_overlay
+            jpeg_quality: JPEG quality used by the encode stage
+            framing: Bytes placed before and after every JPEG when it is
+                published, e.g. multipart part headers
+            pool_size: Number of frame buffers kept for reuse
+            camera_id: Camera label of the pipeline's metrics
+        """
+        self.camera = camera
+        self.tracker = tracker
+        self.draw = draw or tracker.draw_overlay
+        # OpenCV is only needed once a pipeline exists; the broadcaster
+        # classes above are also used by processes that never touch video
+        import cv2
+        self._imencode = cv2.imencode
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+        self.framing = framing
+
+        self.pool = FramePool(pool_size)
+        self.inference_queue = LatestQueue(on_drop=self._dropper("inference", camera_id))
+        self.encode_queue = LatestQueue(on_drop=self._dropper("encode", camera_id))
+        self.broadcaster = FrameBroadcaster()
+        self._read_into = True  # Whether camera.read() accepts a target buffer
+        self._scratch = None  # Encode stage drawing buffer
+
+        self.running = False
+        self._threads = []
+        self._processed = {"capture": 0, "inference": 0, "encode": 0}
+        self._busy_time = {"capture": 0.0, "inference": 0.0, "encode": 0.0}
+        self._stage_series = stage_series(PIPELINE_STAGE_SECONDS, self._processed, camera=camera_id)
+        self._encode_series = stage_series(ENCODE_STAGE_SECONDS, ("copy", "draw", "jpeg", "publish"),
+                                           camera=camera_id)
+        self._start_time = None
+
+    def start(self):
+        """Start all stage threads."""
+        if self.running:
+            return
+        self.running = True
+        self._start_time = time.time()
+        for name, target in (("capture", self._capture_loop),
+                             ("inference", self._inference_loop),
+                             ("encode", self._encode_loop)):
+            thread = threading.Thread(target=target, name=f"affectra-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop all stage threads and wait for them to exit."""
+        self.running = False
+        self.broadcaster.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    def subscribe(self):
+        """
+        Register a viewer of the encoded stream.
+
+        Returns:
+            A FrameSubscriber yielding JPEG bytes
+        """
+        return self.broadcaster.subscribe()
+
+    def stats(self):
+        """
+        Return per-stage throughput and queue statistics.
+
+        Returns:
+            Dictionary keyed by stage name
+        """
+        elapsed = max(time.time() - self._start_time, 1e-6) if self._start_time else 0
+        queues = {
+            "capture": None,
+            "inference": self.inference_queue,
+            "encode": self.encode_queue
+        }
+        stages = {}
+        for name, queue in queues.items():
+            processed = self._processed[name]
+            stages[name] = {
+                "processed": processed,
+                "fps": round(processed / elapsed, 2) if elapsed else 0,
+                "avg_ms": round(1000 * self._busy_time[name] / processed, 2) if processed else 0,
+                "queue": queue.stats() if queue else None
+            }
+        return {
+            "running": self.running,
+            "stages": stages,
+            "broadcast": self.broadcaster.stats(),
+            "frame_pool": self.pool.stats()
+        }
+
+    def _record(self, stage, started):
+        """Count one processed item for a stage."""
+        elapsed = time.time() - started
+        self._processed[stage] += 1
+        self._busy_time[stage] += elapsed
+        self._stage_series[stage].observe(elapsed)
+
+    @staticmethod
+    def _dropper(stage, camera_id):
+        """Return a LatestQueue on_drop callback releasing and counting dropped frames."""
+        dropped = FRAMES_DROPPED.labels(camera=camera_id, stage=stage)
+
+        def drop(frame):
+            frame.release()
+            dropped.inc()
+        return drop
+
+    def _read_frame(self):
+        """Read the next camera frame into a pooled buffer."""
+        frame = self.pool.acquire(self.pool.shape) if self._read_into and self.pool.shape else None
+        if frame is None:
+            success, array = self.camera.read()
+            return success, self.pool.wrap(array) if success else None
+
+        try:
+            success, array = self.camera.read(frame.array)
+        except TypeError:
+            # Not an OpenCV capture; it can't fill our buffers
+            self._read_into = False
+            frame.release()
+            return self._read_frame()
+        if not success:
+            frame.release()
+            return False, None
+        if array is not frame.array:
+            # The frame size changed, so the driver allocated a new array
+            frame.release()
+            return True, self.pool.wrap(array)
+        return True, frame
+
+    def _capture_loop(self):
+        """Read frames at the camera rate and fan them out to the other stages."""
+        while self.running:
+            started = time.time()
+            success, frame = self._read_frame()
+            if not success:
+                print("❌ Failed to grab frame.")
+                self.running = False
+                self.broadcaster.close()
+                break
+            # One reference for each stage the frame is handed to
+            frame.retain()
+            self.inference_queue.put(frame)
+            self.encode_queue.put(frame)
+            self._record("capture", started)
+
+    def _inference_loop(self):
+        """Analyze the most recent frame whenever the model is free."""
+        while self.running:
+            frame = self.inference_queue.get(timeout=0.5)
+            if frame is None:
+                continue
+            started = time.time()
+            try:
+                self.tracker.analyze_frame(frame.array)
+            except Exception as e:
+                print(f"⚠️ Error analyzing frame: {e}")
+            finally:
+                frame.release()
+            self._record("inference", started)
+
+    def _encode_loop(self):
+        """Draw the latest overlay on each frame and JPEG-encode it."""
+        prefix, suffix = self.framing
+        while self.running:
+            frame = self.encode_queue.get(timeout=0.5)
+            if frame is None:
+                continue
+            if self.broadcaster.subscriber_count() == 0:
+                frame.release()
+                continue
+            started = time.time()
+            stopwatch = Stopwatch(self._encode_series)
+            # The inference stage may still be reading this frame, so draw
+            # on a reused scratch buffer instead of the frame itself
+            if self._scratch is None or self._scratch.shape != frame.array.shape:
+                self._scratch = np.empty_like(frame.array)
+            np.copyto(self._scratch, frame.array)
+            frame.release()
+            stopwatch.lap("copy")
+            annotated = self.draw(self._scratch)
+            stopwatch.lap("draw")
+            ret, buffer = self._imencode('.jpg', annotated, self.encode_params)
+            stopwatch.lap("jpeg")
+            if ret:
+                # Build the complete part once; every viewer sends this same object
+                self.broadcaster.publish(b"".join((prefix, buffer, suffix)))
+                stopwatch.lap("publish")
+            self._record("encode", started)
@@ -0,0 +1,141 @@
+"""
+Sampling profiler for Affectra.
+Periodically records the call stack of every thread of the process, so
+a running server can be profiled without restarting it or slowing down
+the hot paths while profiling is off. Stacks are kept in the "folded"
+format used by flame graph tools (flamegraph.pl, speedscope).
+"""
+
+import os
+import sys
+import threading
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for all threads of the process.
+
+    While running, a background thread wakes up every interval seconds
+    and counts the current stack of each other thread. Threads blocked
+    on I/O or locks are sampled too, which shows where time goes while
+    waiting as well as while computing.
+    """
+
+    def __init__(self, interval=0.01, max_depth=64):
+        """
+        Initialize the profiler (stopped).
+
+        Args:
+            interval: Seconds between samples
+            max_depth: Innermost frames kept per stack
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = 0
+
+    @property
+    def running(self):
+        """Whether the profiler is sampling."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        """
+        Start sampling; does nothing if already running.
+
+        Args:
+            interval: Optional new sampling interval in seconds
+        """
+        with self._lock:
+            if self.running:
+                return
+            if interval:
+                self.interval = interval
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="affectra-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop sampling, keeping the collected stacks."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=1.0)
+
+    def reset(self):
+        """Forget the collected stacks."""
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def stats(self):
+        """Return the profiler state as a dictionary."""
+        with self._lock:
+            return {
+                "running": self.running,
+                "interval_ms": round(self.interval * 1000, 3),
+                "samples": self.samples,
+                "stacks": len(self._stacks)
+            }
+
+    def folded(self):
+        """
+        Return the collected stacks in folded format.
+
+        Returns:
+            One "outer;...;inner count" line per distinct stack, most frequent first
+        """
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def top(self, limit=20):
+        """
+        Summarize the collected stacks per function.
+
+        Args:
+            limit: Number of functions to return
+
+        Returns:
+            List of dicts with the function, its own samples ("self", the
+            function was running) and its total samples (it was on the
+            stack), ordered by own samples
+        """
+        own = Counter()
+        total = Counter()
+        with self._lock:
+            stacks = list(self._stacks.items())
+        for stack, count in stacks:
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [{"function": function, "self": count, "total": total[function]}
+                for function, count in own.most_common(limit)]
+
+    def _run(self):
+        """Sample until stopped."""
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample(own_id)
+
+    def _sample(self, own_id):
+        """Record the current stack of every thread except the profiler's."""
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                name = getattr(code, "co_qualname", code.co_name)
+                names.append(f"{name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            stacks.append(";".join(reversed(names)))
+        with self._lock:
+            self._stacks.update(stacks)
+            self.samples += 1
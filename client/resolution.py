@@ -0,0 +1,147 @@
+"""
+Inference resolution control for Affectra.
+Frames are analyzed at a reduced width and face regions are mapped back
+to the original frame for drawing. ResolutionTuner optionally picks the
+largest width that keeps frame analysis within a latency target.
+"""
+
+import cv2
+import numpy as np
+
+
+def downscale_frame(frame, width, out=None):
+    """
+    Shrink a frame to a given width, keeping its aspect ratio.
+
+    Args:
+        frame: BGR video frame
+        width: Target width in pixels; None or a width not smaller than the
+            frame's keeps the frame as is
+        out: Optional array from a previous call to resize into; used
+            only if it has the right shape, so a new one is allocated when
+            the width changes
+
+    Returns:
+        Tuple of (frame to analyze, scale factor from it to the original)
+    """
+    height, frame_width = frame.shape[:2]
+    if not width or width >= frame_width:
+        return frame, 1.0
+    scale = frame_width / width
+    size = (width, int(round(height / scale)))
+    if out is not None and out.shape == (size[1], size[0]) + frame.shape[2:] and out.dtype == frame.dtype:
+        small = cv2.resize(frame, size, dst=out, interpolation=cv2.INTER_AREA)
+    else:
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return small, scale
+
+
+def scale_region(region, factor):
+    """
+    Multiply a region's coordinates by a factor.
+
+    Args:
+        region: Dict with x, y, w, h keys
+        factor: Scale factor
+
+    Returns:
+        New region dict with integer coordinates
+    """
+    if factor == 1.0:
+        return dict(region)
+    return {key: int(round(region[key] * factor)) for key in ("x", "y", "w", "h")}
+
+
+class ResolutionTuner:
+    """
+    Chooses the inference width from measured frame analysis latency.
+
+    Latencies are collected in windows; after each window the width
+    steps down if the 95th percentile exceeded the target, and steps up
+    if even the next larger width is likely to fit (p95 below
+    headroom x target), so it settles on the largest width that meets
+    the target.
+
+    A width that exceeded the target is not stepped up to again until
+    retry_windows windows have passed, and every failed retry doubles
+    that wait, so the tuner doesn't oscillate between two widths when
+    the smaller one leaves more headroom than the larger one needs.
+    """
+
+    def __init__(self, target_latency, widths=(320, 480, 640, 960, 1280, 1920),
+                 initial_width=640, window=60, headroom=0.6, retry_windows=10, max_retry_windows=640):
+        """
+        Initialize the tuner.
+
+        Args:
+            target_latency: p95 latency target in seconds
+            widths: Candidate inference widths, ascending
+            initial_width: Width to start with (the closest candidate is used)
+            window: Number of frames per measurement window
+            headroom: Fraction of the target p95 must stay below to step up
+            retry_windows: Windows to wait before stepping up to a width
+                that exceeded the target
+            max_retry_windows: Upper limit of that wait after failed retries
+        """
+        self.target_latency = target_latency
+        self.widths = sorted(widths)
+        self.index = int(np.argmin([abs(w - initial_width) for w in self.widths]))
+        self.window = window
+        self.headroom = headroom
+        self.retry_windows = retry_windows
+        self.max_retry_windows = max_retry_windows
+        self._latencies = []
+        self.last_p95 = None
+        # Index of the smallest width known to exceed the target
+        self.ceiling = len(self.widths)
+        self._wait = retry_windows
+        self._waited = 0
+        self._retrying = False
+
+    @property
+    def width(self):
+        """Currently selected inference width."""
+        return self.widths[self.index]
+
+    def record(self, latency):
+        """
+        Add one frame's analysis latency.
+
+        Args:
+            latency: Seconds spent analyzing the frame
+
+        Returns:
+            True if the selected width changed
+        """
+        self._latencies.append(latency)
+        if len(self._latencies) < self.window:
+            return False
+
+        self.last_p95 = float(np.percentile(self._latencies, 95))
+        self._latencies = []
+        retrying, self._retrying = self._retrying, False
+        if self.last_p95 > self.target_latency:
+            if retrying:
+                # The width still doesn't fit; wait longer before the next try
+                self._wait = min(self._wait * 2, self.max_retry_windows)
+            self.ceiling = self.index
+            self._waited = 0
+            if self.index > 0:
+                self.index -= 1
+                return True
+            return False
+        if retrying:
+            # The retried width fits now
+            self._wait = self.retry_windows
+        if self.last_p95 < self.target_latency * self.headroom and self.index < len(self.widths) - 1:
+            if self.index + 1 < self.ceiling:
+                self.index += 1
+                return True
+            self._waited += 1
+            if self._waited >= self._wait:
+                self.ceiling = len(self.widths)
+                self._waited = 0
+                self._retrying = True
+                self.index += 1
+                return True
+        return False
@@ -0,0 +1,134 @@
+"""
+Face region tracking for Affectra.
+Follows a face box across frames between emotion samples so the overlay
+stays smooth without running detection on every frame.
+"""
+
+import cv2
+import numpy as np
+
+
+def _create_opencv_tracker(name):
+    """
+    Create an OpenCV tracker by name if this OpenCV build provides it.
+
+    Args:
+        name: Tracker name such as "KCF" or "CSRT"
+
+    Returns:
+        Tracker instance, or None if unavailable
+    """
+    factory = getattr(cv2, f"Tracker{name}_create", None)
+    if factory is None and hasattr(cv2, "legacy"):
+        factory = getattr(cv2.legacy, f"Tracker{name}_create", None)
+    return factory() if factory else None
+
+
+class RoiTracker:
+    """
+    Tracks a single face region between detections.
+
+    Uses OpenCV's KCF or CSRT tracker when the installed OpenCV build has
+    them (opencv-contrib), and otherwise falls back to sparse Lucas-Kanade
+    optical flow, which is part of core OpenCV.
+    """
+
+    def __init__(self, method="auto", min_points=5):
+        """
+        Initialize the tracker.
+
+        Args:
+            method: "KCF", "CSRT", "flow", or "auto" (KCF if available, else flow)
+            min_points: Minimum optical-flow points before tracking counts as lost
+        """
+        if method == "auto":
+            method = "KCF" if _create_opencv_tracker("KCF") is not None else "flow"
+        self.method = method
+        self.min_points = min_points
+        self.reset()
+
+    @property
+    def active(self):
+        """Whether a region is currently being tracked."""
+        return self.region is not None
+
+    def reset(self):
+        """Stop tracking."""
+        self.region = None
+        self._tracker = None
+        self._prev_gray = None
+        self._points = None
+
+    def start(self, frame, region):
+        """
+        Start tracking a region.
+
+        Args:
+            frame: Frame the region was detected in
+            region: Dict with x, y, w, h keys
+        """
+        self.reset()
+        box = (region["x"], region["y"], region["w"], region["h"])
+        if self.method == "flow":
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            points = self._find_points(gray, box)
+            if points is None:
+                return
+            self._prev_gray = gray
+            self._points = points
+        else:
+            self._tracker = _create_opencv_tracker(self.method)
+            self._tracker.init(frame, box)
+        self.region = dict(region)
+
+    def update(self, frame):
+        """
+        Follow the tracked region into a new frame.
+
+        Args:
+            frame: Next video frame
+
+        Returns:
+            Updated region dict, or None if tracking was lost
+        """
+        if not self.active:
+            return None
+
+        if self.method == "flow":
+            box = self._update_flow(frame)
+        else:
+            ok, box = self._tracker.update(frame)
+            box = tuple(int(v) for v in box) if ok else None
+
+        if box is None:
+            self.reset()
+            return None
+        self.region = {"x": box[0], "y": box[1], "w": box[2], "h": box[3]}
+        return self.region
+
+    def _find_points(self, gray, box):
+        """Pick good features to track inside a box."""
+        x, y, w, h = box
+        mask = np.zeros_like(gray)
+        mask[max(y, 0):y + h, max(x, 0):x + w] = 255
+        points = cv2.goodFeaturesToTrack(gray, maxCorners=40, qualityLevel=0.01,
+                                         minDistance=5, mask=mask)
+        if points is None or len(points) < self.min_points:
+            return None
+        return points
+
+    def _update_flow(self, frame):
+        """Shift the box by the median optical flow of its feature points."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, self._points, None)
+        if points is None:
+            return None
+        good = status.ravel() == 1
+        if good.sum() < self.min_points:
+            return None
+
+        dx, dy = np.median(points[good] - self._points[good], axis=0).ravel()
+        self._prev_gray = gray
+        self._points = points[good].reshape(-1, 1, 2)
+        return (int(round(self.region["x"] + dx)), int(round(self.region["y"] + dy)),
+                self.region["w"], self.region["h"])
@@ -0,0 +1,150 @@
+"""
+Motion-adaptive scheduling of emotion inference for Affectra.
+Decides per face when running the emotion model is worth it, using a
+cheap difference of tiny downscaled face crops between frames.
+"""
+
+import cv2
+import numpy as np
+
+
+def roi_signature(frame, region, size=16):
+    """
+    Reduce a face region to a tiny grayscale image for change detection.
+
+    Args:
+        frame: Full BGR video frame
+        region: Dict with x, y, w, h keys
+        size: Side length of the signature in pixels
+
+    Returns:
+        Float32 array of shape (size, size), or None if the region is empty
+    """
+    height, width = frame.shape[:2]
+    x1, y1 = max(region['x'], 0), max(region['y'], 0)
+    x2, y2 = min(region['x'] + region['w'], width), min(region['y'] + region['h'], height)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    small = cv2.resize(frame[y1:y2, x1:x2], (size, size), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32)
+
+
+def motion_score(signature, reference):
+    """
+    Measure how much a face changed between two signatures.
+
+    Returns:
+        Mean absolute difference scaled to 0-1; 1.0 if either is missing
+    """
+    if signature is None or reference is None:
+        return 1.0
+    return float(np.mean(np.abs(signature - reference))) / 255.0
+
+
+class InferenceBudget:
+    """
+    Caps the share of time spent running the emotion model.
+    After a model call that took d seconds, the next call is allowed
+    d / cpu_budget seconds after the previous one started.
+    """
+
+    def __init__(self, cpu_budget=0.5):
+        """
+        Initialize the budget.
+
+        Args:
+            cpu_budget: Maximum fraction of time (0-1] spent on inference
+        """
+        self.cpu_budget = cpu_budget
+        self.next_allowed = 0.0
+
+    def allows(self, now):
+        """Return whether a model call may start at time now."""
+        return now >= self.next_allowed
+
+    def record(self, started, duration):
+        """
+        Account for a finished model call.
+
+        Args:
+            started: Time the call started (same clock as allows())
+            duration: Seconds the call took
+        """
+        self.next_allowed = started + duration / self.cpu_budget
+
+
+class MotionScheduler:
+    """
+    Decides when one tracked face should be classified again.
+
+    A face is sampled at most every min_interval seconds. It is sampled
+    as soon as its crop changes by more than motion_threshold since the
+    last sample; otherwise the interval doubles after every sample that
+    brought no new emotion, up to max_interval, and drops back to
+    min_interval when the emotion changes. A still face in a static
+    scene therefore costs one model call every max_interval seconds.
+    """
+
+    def __init__(self, min_interval=0.25, max_interval=5.0, motion_threshold=0.04, backoff=2.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            min_interval: Shortest time between samples (maximum rate)
+            max_interval: Longest time between samples (minimum rate)
+            motion_threshold: Signature difference (0-1) counted as motion
+            backoff: Factor the interval grows by while nothing changes
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion_threshold = motion_threshold
+        self.backoff = backoff
+
+        self.interval = min_interval
+        self.last_sample_time = None
+        self.last_emotion = None
+        self.reference = None
+        self.motion = 0.0
+        self._signature = None
+        self.samples = 0
+        self.skipped = 0
+
+    def observe(self, frame, region, now):
+        """
+        Look at the face in a new frame and decide whether to sample it.
+
+        Args:
+            frame: Current video frame
+            region: Current face region
+            now: Frame time in seconds
+
+        Returns:
+            True if the face should be classified in this frame
+        """
+        self._signature = roi_signature(frame, region)
+        if self.last_sample_time is None:
+            return True
+
+        self.motion = motion_score(self._signature, self.reference)
+        elapsed = now - self.last_sample_time
+        due = elapsed >= self.min_interval and (
+            self.motion >= self.motion_threshold or elapsed >= self.interval)
+        if not due:
+            self.skipped += 1
+        return due
+
+    def sampled(self, now, emotion):
+        """
+        Record that the face was classified.
+
+        Args:
+            now: Frame time in seconds
+            emotion: Dominant emotion found (None if analysis failed)
+        """
+        changed = emotion != self.last_emotion or self.motion >= self.motion_threshold
+        self.interval = self.min_interval if changed else \
+            min(self.interval * self.backoff, self.max_interval)
+        self.last_sample_time = now
+        self.last_emotion = emotion
+        self.reference = self._signature
+        self.samples += 1
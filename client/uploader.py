@@ -0,0 +1,216 @@
+"""
+Background upload of session summaries for Affectra.
+Keeps network I/O out of the frame loop and keeps summaries on disk
+while the server is unreachable.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+
+from client.config import SERVER_URL, SPOOL_DIR
+
+# Statuses meaning the batch itself is invalid, so sending it again can't
+# succeed; every other failure (404, 408, 413, 429, 5xx...) is retried later
+REJECTED_STATUSES = (400, 422)
+
+
+class SessionUploader:
+    """
+    Uploads session summaries from a background thread.
+
+    Summaries are queued in memory and sent in batches over a single
+    keep-alive HTTP connection. Batches that cannot be delivered, and
+    summaries that don't fit in the queue, are written to an on-disk
+    spool that is replayed once the server is reachable again.
+    """
+
+    def __init__(self, url=None, spool_dir=SPOOL_DIR, max_queue=1000, batch_size=50,
+                 batch_delay=0.5, timeout=5, retry_interval=10):
+        """
+        Initialize the uploader.
+
+        Args:
+            url: Bulk endpoint receiving summaries (defaults to SERVER_URL + "/log/bulk")
+            spool_dir: Directory for undelivered summaries
+            max_queue: Maximum number of summaries held in memory
+            batch_size: Maximum number of summaries sent per request
+            batch_delay: Seconds to wait for more summaries before sending
+            timeout: HTTP timeout in seconds
+            retry_interval: Seconds between spool replay attempts while
+                the server is down
+        """
+        self.url = url or f"{SERVER_URL}/log/bulk"
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+
+        self.http = requests.Session()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._stopping = threading.Event()
+        self._spool_lock = threading.Lock()
+        self._server_down_since = None
+        self._atexit_registered = False
+        self.sent = 0
+        self.spooled = 0
+
+    def start(self):
+        """Start the background upload thread if it isn't running."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="affectra-uploader", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                # Flush queued summaries to the server or spool on interpreter exit
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def stop(self, timeout=10):
+        """
+        Stop the upload thread, sending or spooling everything still queued.
+
+        Args:
+            timeout: Seconds to wait for the thread to finish
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, summary):
+        """
+        Queue a summary for upload without blocking.
+        Falls back to the disk spool if the in-memory queue is full.
+
+        Args:
+            summary: Session summary dictionary
+        """
+        self.start()
+        try:
+            self._queue.put_nowait(summary)
+        except queue.Full:
+            self._spool([summary])
+
+    def pending(self):
+        """Return the number of summaries waiting in memory."""
+        return self._queue.qsize()
+
+    def _run(self):
+        """Send queued batches and replay the spool until stopped."""
+        while True:
+            batch = self._next_batch()
+            if batch:
+                if not self._send(batch):
+                    self._spool(batch)
+            elif self._stopping.is_set():
+                break
+
+            # Replay spooled batches while the server is reachable
+            if self._server_down_since is None or \
+                    time.time() - self._server_down_since >= self.retry_interval:
+                self._replay_spool()
+
+    def _next_batch(self):
+        """Collect up to batch_size summaries, waiting briefly for stragglers."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.time() + self.batch_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0 or self._stopping.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch):
+        """
+        POST a batch of summaries.
+
+        Returns:
+            True if the batch was delivered or rejected as invalid (so it
+            must not be retried), False if it should be kept for later
+        """
+        try:
+            response = self.http.post(self.url, json=batch, timeout=self.timeout)
+        except requests.RequestException as e:
+            if self._server_down_since is None:
+                print(f"⚠️ Error sending data to server: {e}")
+            self._server_down_since = time.time()
+            return False
+
+        if response.status_code == 200:
+            try:
+                result = response.json()
+                accepted = result.get("accepted", len(batch))
+                rejected = [(item["index"], item.get("message"))
+                            for item in result.get("results", []) if item.get("status") != "ok"]
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                # Not our server's reply (e.g. a proxy page or a cut-off
+                # body); keep the batch rather than guess what was stored
+                print(f"⚠️ Unexpected response from server: {e}")
+                self._server_down_since = time.time()
+                return False
+            self._server_down_since = None
+            self.sent += accepted
+            print(f"✅ {accepted} session(s) sent to server.")
+            # Invalid items are reported per item and never retried
+            for index, message in rejected:
+                print(f"⚠️ Server rejected session {index}: {message}")
+            return True
+        if response.status_code in REJECTED_STATUSES:
+            print(f"⚠️ Server rejected {len(batch)} session(s). Status: {response.status_code}")
+            return True
+        print(f"⚠️ Failed to send data. Status: {response.status_code}")
+        self._server_down_since = time.time()
+        return False
+
+    def _spool(self, batch):
+        """Write a batch to a new spool file atomically."""
+        with self._spool_lock:
+            try:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                name = f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}.ndjson"
+                path = os.path.join(self.spool_dir, name)
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    for summary in batch:
+                        f.write(json.dumps(summary) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(path + ".tmp", path)
+                self.spooled += len(batch)
+                print(f"💾 {len(batch)} session(s) saved to spool for later upload.")
+            except OSError as e:
+                print(f"⚠️ Could not spool session data: {e}")
+
+    def _replay_spool(self):
+        """Send spooled batches oldest first, stopping at the first failure."""
+        with self._spool_lock:
+            try:
+                names = sorted(n for n in os.listdir(self.spool_dir) if n.endswith(".ndjson"))
+            except FileNotFoundError:
+                return
+        for name in names:
+            path = os.path.join(self.spool_dir, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    batch = [json.loads(line) for line in f if line.strip()]
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Skipping unreadable spool file {name}: {e}")
+                os.replace(path, path + ".bad")
+                continue
+            if not self._send(batch):
+                return
+            os.remove(path)
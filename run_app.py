@@ -2,9 +2,16 @@
 """
 Affectra Emotion Tracking Web UI
 Run this script to start the web interface for emotion tracking.
+
+    python run_app.py                  development server (single process, reloader)
+    python run_app.py --production     multi-worker server plus one camera service per camera
+
+Cameras are configured with AFFECTRA_CAMERAS, e.g. "lobby=0,door=rtsp://10.0.0.5/stream".
 """
 
+import argparse
 import os
+import subprocess
 import sys
 import traceback
 
@@ -25,20 +32,203 @@ def setup_directories():
             print(f"Creating directory: {directory}")
             os.makedirs(directory, exist_ok=True)
 
+def parse_args():
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description="Start the Affectra web interface.")
+    parser.add_argument("--production", action="store_true",
+                        help="serve with multiple gunicorn workers and a separate camera service")
+    parser.add_argument("--host", default="0.0.0.0", help="interface to listen on (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=5000, help="port to listen on (default: 5000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="production: number of worker processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=16,
+                        help="production: threads per worker; half of them at most serve live "
+                             "statistics streams (default: 16)")
+    parser.add_argument("--camera-port", type=int, default=5001,
+                        help="local port of the first camera service; the others use the "
+                             "following ports (default: 5001)")
+    parser.add_argument("--camera-service", action="store_true",
+                        help="run only the camera service (started automatically by --production)")
+    parser.add_argument("--warmup", action="store_true",
+                        help="load the emotion model before serving (also AFFECTRA_WARMUP=1)")
+    return parser.parse_args()
+
+def run_development(args):
+    """
+    Run the Flask development server with the reloader.
+    With several cameras configured, each gets its own camera service
+    process, as in production mode.
+    """
+    from client.config import CAMERAS
+    from server.app import app, finish_startup
+
+    # The reloader re-runs this script in a child process that inherits
+    # the environment, so only the watcher process starts the services
+    camera_services = []
+    if len(CAMERAS) > 1 and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        camera_services = start_camera_services(args)
+
+    # The reloader imports the app in a watcher process too; only the
+    # serving child should load the model
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        # Load the emotion model before serving if requested (or AFFECTRA_WARMUP=1)
+        finish_startup(warm=True if args.warmup else None)
+
+    print("🚀 Starting Affectra Web UI")
+    print(f"📊 Access the interface at http://localhost:{args.port}")
+    print("💡 Press Ctrl+C to stop the server")
+
+    # Start Flask app
+    try:
+        app.run(host=args.host, port=args.port, debug=True)
+    finally:
+        stop_camera_services(camera_services)
+
+def serve_gunicorn(bind, workers, threads, warm):
+    """
+    Serve server.app with gunicorn.
+
+    Args:
+        bind: Address to listen on, "host:port"
+        workers: Number of worker processes
+        threads: Threads per worker; every open video or SSE stream holds one
+        warm: Passed to finish_startup() in each worker
+
+    Returns:
+        False if gunicorn is not installed, True after the server stopped
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        return False
+
+    # Keep half the threads free of statistics streams for other requests
+    os.environ.setdefault("AFFECTRA_MAX_STREAMS", str(max(1, threads // 2)))
+
+    def post_worker_init(worker):
+        # Each worker imports the app itself and logs its own startup report
+        from server.app import finish_startup
+        finish_startup(warm=warm)
+
+    class AffectraApplication(BaseApplication):
+        """Embedded gunicorn application serving server.app."""
+
+        def load_config(self):
+            self.cfg.set("bind", bind)
+            self.cfg.set("workers", workers)
+            # Threaded workers, so open streams don't block a whole worker
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("threads", threads)
+            self.cfg.set("timeout", 60)
+            self.cfg.set("graceful_timeout", 10)
+            self.cfg.set("post_worker_init", post_worker_init)
+            # Newer gunicorn opens a control socket at a fixed path, which
+            # the web server and the camera service would fight over
+            if "control_socket_disable" in self.cfg.settings:
+                self.cfg.set("control_socket_disable", True)
+
+        def load(self):
+            from server.app import app
+            return app
+
+    AffectraApplication().run()
+    return True
+
+def run_camera_service(args):
+    """
+    Run the process that owns one camera and its emotion model.
+    Web workers proxy /video_feed/<camera_id> and /api/pipeline_stats to
+    it, so each camera is opened once however many workers there are.
+    """
+    warm = True if args.warmup else None
+    print(f"🎥 Camera service listening on http://127.0.0.1:{args.camera_port}")
+    # A single worker: the camera can only be opened once
+    if not serve_gunicorn(f"127.0.0.1:{args.camera_port}", 1, args.threads, warm):
+        from server.app import app, finish_startup
+        finish_startup(warm=warm)
+        app.run(host="127.0.0.1", port=args.camera_port, threaded=True, debug=False, use_reloader=False)
+
+def start_camera_services(args):
+    """
+    Start one camera service process per configured camera.
+    Each service is told about its own camera only and listens on its own
+    port, starting at --camera-port; the URLs are published to this
+    process (and the workers it starts) in AFFECTRA_CAMERA_SERVICES.
+    
+    Returns:
+        List of the started processes
+    """
+    from client.config import CAMERAS
+
+    processes = []
+    services = []
+    for i, (camera_id, source) in enumerate(CAMERAS.items()):
+        port = args.camera_port + i
+        # Sessions are logged back to this server on whatever port it uses
+        env = dict(os.environ, AFFECTRA_CAMERAS=f"{camera_id}={source}",
+                   AFFECTRA_SERVER_URL=f"http://127.0.0.1:{args.port}")
+        env.pop("AFFECTRA_CAMERA_SERVICES", None)
+        command = [sys.executable, os.path.abspath(__file__), "--camera-service",
+                   "--camera-port", str(port), "--threads", str(args.threads)]
+        if args.warmup:
+            command.append("--warmup")
+        processes.append(subprocess.Popen(command, env=env))
+        services.append(f"{camera_id}=http://127.0.0.1:{port}")
+
+    # Workers proxy the video routes to the camera services
+    os.environ["AFFECTRA_CAMERA_SERVICES"] = ",".join(services)
+    return processes
+
+def stop_camera_services(processes):
+    """Terminate camera service processes, killing any that don't exit."""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def run_production(args):
+    """
+    Run the app under gunicorn with several worker processes.
+
+    Workers handle /log, /api/* and the dashboard; the session store and
+    statistics are safe to share between them. Every camera, with its
+    tracker and emotion model, lives in a camera service process started
+    here, so analysis scales across cores up to the number of cameras.
+    """
+    try:
+        import gunicorn
+    except ImportError:
+        print("❌ Production mode needs gunicorn (Linux/macOS): pip install gunicorn")
+        return 1
+
+    camera_services = start_camera_services(args)
+
+    print(f"🚀 Starting Affectra Web UI with {args.workers} worker(s) and {len(camera_services)} camera(s)")
+    print(f"📊 Access the interface at http://localhost:{args.port}")
+    print("💡 Press Ctrl+C to stop the server")
+    try:
+        serve_gunicorn(f"{args.host}:{args.port}", args.workers, args.threads, warm=False)
+    finally:
+        stop_camera_services(camera_services)
+    return 0
+
 if __name__ == "__main__":
     try:
+        args = parse_args()
+        
         # Setup directories first
         setup_directories()
         
         # Import Flask app after directories are set up
-        from server.app import app
-        
-        print("🚀 Starting Affectra Web UI")
-        print("📊 Access the interface at http://localhost:5000")
-        print("💡 Press Ctrl+C to stop the server")
-        
-        # Start Flask app
-        app.run(host='0.0.0.0', port=5000, debug=True)
+        if args.camera_service:
+            run_camera_service(args)
+        elif args.production:
+            sys.exit(run_production(args))
+        else:
+            run_development(args)
         
     except Exception as e:
         print("❌ Error starting the application:")
@@ -46,4 +236,4 @@ if __name__ == "__main__":
         print("\nDetailed error information:")
         traceback.print_exc()
         print("\n💡 Tip: Make sure all dependencies are installed with: pip install -r requirements.txt")
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
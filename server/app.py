@@ -1,14 +1,15 @@
-from flask import Flask, request, jsonify, render_template, Response, session, abort
+import time
+_startup_began = time.perf_counter()
+
+from flask import Flask, request, jsonify, render_template, Response, session, abort, g
 import os
-import pandas as pd
-from datetime import datetime
+import io
+import atexit
 import json
-import cv2
-import numpy as np
 import sys
-import time
 import secrets
 import logging
+import threading
 
 # Get the absolute path for the logs directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -31,16 +32,63 @@ logger = logging.getLogger("affectra")
 
 # Add the project root to the path so we can import the client modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from client.camera_tracker import CameraTracker
-from client.security import get_api_key, verify_signature, DataEncryption
+from server.startup import StartupReport
+startup_report = StartupReport(_startup_began)
+startup_report.record("flask imports", time.perf_counter() - _startup_began)
+
+# OpenCV, the camera tracker and the emotion model are imported on first use,
+# so workers that only serve the API never load them
+with startup_report.phase("project imports"):
+    from client.security import get_api_key, verify_signature, DataEncryption
+    from client.config import CAMERAS, get_storage_dir, parse_camera_map
+    from client.pipeline import FrameBroadcaster
+    from client.metrics import REGISTRY, Counter, Gauge, Histogram, Stopwatch, stage_series, merge_exposition
+    from client.profiler import SamplingProfiler
+    from server.storage import RowsDeletedError, SessionLog, normalize_summary, to_epoch_us
+    from server.stats import EmotionAggregates, BUCKET_WIDTHS
+    from server.export import EXPORT_FORMATS, export_stream, gzip_stream, iter_records
 
 # Initialize Flask application with proper folder configuration
 app = Flask(__name__, 
             static_folder="static",
             template_folder="templates")
 
+# Columnar store for emotion session data (AFFECTRA_STORAGE_DIR moves it,
+# e.g. to run benchmarks against a scratch store)
+storage_dir = get_storage_dir()
+
+def load_secret_key():
+    """
+    Return the session secret shared by all server processes.
+    Taken from AFFECTRA_SECRET_KEY, or generated once and kept in the
+    storage directory, so a session cookie issued by one worker is valid
+    in every other worker.
+    
+    Returns:
+        Secret key string
+    """
+    key = os.environ.get("AFFECTRA_SECRET_KEY")
+    if key:
+        return key
+    path = os.path.join(storage_dir, ".secret_key")
+    if not os.path.exists(path):
+        os.makedirs(storage_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            # Link instead of rename so the first process to get there wins
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
 # Set a secret key for session management
-app.secret_key = secrets.token_hex(16)
+app.secret_key = load_secret_key()
 
 # Generate a CSRF token on first visit and store in session
 def get_csrf_token():
@@ -48,24 +96,150 @@ def get_csrf_token():
         session['csrf_token'] = secrets.token_hex(16)
     return session['csrf_token']
 
-# Path to the CSV file for storing emotion session data
-storage_dir = os.path.join(current_dir, "storage")
+STORE_PATH = os.path.join(storage_dir, "sessions")
+# Legacy CSV log, migrated into the store on first start
 LOG_PATH = os.path.join(storage_dir, "affectra_log.csv")
 
-# Create the CSV file with headers if it doesn't exist
-if not os.path.exists(LOG_PATH):
-    os.makedirs(storage_dir, exist_ok=True)
-    df = pd.DataFrame(columns=[
-        "timestamp",
-        "duration_seconds",
-        "dominant_emotion",
-        "emotion_percentages"
-    ])
-    df.to_csv(LOG_PATH, index=False)
+# Raw sessions are kept this many days (0 = forever); older segments live
+# on as per-day rollups, so all-time statistics are unaffected
+RETENTION_DAYS = float(os.environ.get("AFFECTRA_RETENTION_DAYS", "90"))
+# A new storage segment is started at this size or age
+SEGMENT_MB = float(os.environ.get("AFFECTRA_SEGMENT_MB", "64"))
+SEGMENT_HOURS = float(os.environ.get("AFFECTRA_SEGMENT_HOURS", "24"))
+
+# Append-only writer for the session store; creates an empty store if needed
+# and compacts or expires segments that became due while the server was down
+with startup_report.phase("session store"):
+    session_log = SessionLog(STORE_PATH,
+                             segment_bytes=int(SEGMENT_MB * 1024 * 1024),
+                             segment_seconds=SEGMENT_HOURS * 3600,
+                             retention_days=RETENTION_DAYS or None)
+    session_log.ensure_exists()
+
+def migrate_legacy_log():
+    """
+    Move rows from the legacy CSV log into the session store.
+    Only runs while the store is empty; the CSV is renamed afterwards.
+    """
+    if not os.path.exists(LOG_PATH) or session_log.row_count() > 0:
+        return
+    with open(LOG_PATH, encoding="utf-8") as f:
+        has_rows = sum(1 for _ in f) > 1
+    if not has_rows:
+        return
+
+    from server.migrate_csv import migrate_csv
+    migrated, skipped = migrate_csv(LOG_PATH, session_log)
+    os.replace(LOG_PATH, LOG_PATH + ".migrated")
+    logger.info(f"Migrated {migrated} sessions from legacy CSV log ({skipped} skipped)")
+
+with startup_report.phase("legacy migration"):
+    migrate_legacy_log()
+
+# Running statistics over the log, restored from a snapshot or rebuilt on startup
+STATS_SNAPSHOT_PATH = os.path.join(storage_dir, "affectra_stats.json")
+with startup_report.phase("statistics"):
+    stats_cache = EmotionAggregates(session_log, STATS_SNAPSHOT_PATH)
+    stats_cache.refresh()
+atexit.register(stats_cache.save_snapshot)
+
+# Live statistics for dashboards connected to /api/stream. Every change is
+# serialized once and fanned out with the same latest-wins broadcaster the
+# video feed uses, so an idle dashboard costs an open socket and nothing else.
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_POLL_SECONDS = 1.0
+# Every open stream holds a server thread, so streams beyond this many per
+# process are turned away and those dashboards poll /api/emotion_stats instead
+MAX_STATS_STREAMS = int(os.environ.get("AFFECTRA_MAX_STREAMS", "8"))
+stats_stream_slots = threading.BoundedSemaphore(MAX_STATS_STREAMS)
+stats_events = FrameBroadcaster()
+stats_events_lock = threading.Lock()
+stats_watcher = None
+last_published_stats = stats_cache.to_response()
+
+def format_stats_event(payload):
+    """Encode a statistics payload as a Server-Sent Event."""
+    return f"event: stats\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+
+def publish_stats():
+    """
+    Broadcast the current statistics to connected dashboards.
+    Nothing is sent if they haven't changed since the last broadcast.
+    """
+    global last_published_stats
+    with stats_events_lock:
+        payload = stats_cache.to_response()
+        if payload == last_published_stats:
+            return
+        previous = last_published_stats["visitor_count"]
+        last_published_stats = payload
+        # Let dashboards tell new sessions apart from a full reload
+        event = {**payload, "new_sessions": max(0, payload["visitor_count"] - previous)}
+        stats_events.publish(format_stats_event(event))
+
+def watch_stats():
+    """
+    Pick up sessions committed by other processes while dashboards are connected.
+    Sessions logged through this process are published as they are committed.
+    """
+    while True:
+        time.sleep(STREAM_POLL_SECONDS)
+        if not stats_events.subscriber_count():
+            continue
+        try:
+            stats_cache.refresh()
+            publish_stats()
+        except Exception as e:
+            logger.error(f"Error refreshing live statistics: {str(e)}")
+
+def ensure_stats_watcher():
+    """Start the background statistics watcher if it isn't running."""
+    global stats_watcher
+    with stats_events_lock:
+        if stats_watcher is None or not stats_watcher.is_alive():
+            stats_watcher = threading.Thread(target=watch_stats, name="affectra-stats-watcher", daemon=True)
+            stats_watcher.start()
 
 # Initialize encryption
 encryption = DataEncryption()
 
+# Request metrics served by /metrics
+HTTP_REQUEST_SECONDS = Histogram(
+    "affectra_http_request_seconds", "Time to build the response of each endpoint", ("endpoint",))
+HTTP_REQUESTS = Counter(
+    "affectra_http_requests", "Responses by endpoint and status code", ("endpoint", "status"))
+HANDLER_STAGE_SECONDS = Histogram(
+    "affectra_handler_stage_seconds", "Time spent in each stage of the logging and statistics endpoints",
+    ("endpoint", "stage"))
+SESSIONS_LOGGED = Counter("affectra_sessions_logged", "Sessions committed to the session store")
+STREAM_VIEWERS = Gauge("affectra_stream_viewers", "Open video feed connections", ("camera",))
+STREAM_FRAMES = Counter("affectra_stream_frames", "Frames sent to video feed viewers", ("camera",))
+EXPORTED_SESSIONS = Counter("affectra_exported_sessions", "Sessions streamed by /api/export", ("format",))
+
+LOG_STAGES = stage_series(HANDLER_STAGE_SECONDS, ("read", "parse", "commit", "aggregate"),
+                          endpoint="log_emotion")
+# NDJSON bodies are read while parsing, so reading counts as parsing here
+BULK_STAGES = stage_series(HANDLER_STAGE_SECONDS, ("parse", "commit", "aggregate"),
+                           endpoint="log_emotion_bulk")
+STATS_STAGES = stage_series(HANDLER_STAGE_SECONDS, ("refresh", "aggregate", "serialize"),
+                            endpoint="emotion_stats")
+
+@app.before_request
+def start_request_timer():
+    """Note when the request started, for the request duration metric."""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the duration and status of the request."""
+    started = g.get("request_started")
+    if started is not None:
+        # Unmatched URLs share one label so scanners can't create series
+        endpoint = request.endpoint or "unmatched"
+        HTTP_REQUEST_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(endpoint=endpoint, status=response.status_code).inc()
+    return response
+
 @app.after_request
 def add_security_headers(response):
     """Add security headers to all responses."""
@@ -79,11 +253,58 @@ def add_security_headers(response):
     response.headers['Content-Security-Policy'] = "default-src 'self'; img-src 'self' data:; style-src 'self' https://cdn.jsdelivr.net; script-src 'self' https://cdn.jsdelivr.net;"
     return response
 
+# Fields every session summary must contain
+REQUIRED_FIELDS = ["timestamp", "duration_seconds", "dominant_emotion", "emotion_percentages"]
+
+def validate_summary(item):
+    """
+    Check a session summary received from a client and convert it to a store record.
+    
+    Args:
+        item: Parsed JSON value for one session
+        
+    Returns:
+        Record ready for session_log.append()
+        
+    Raises:
+        ValueError: With a client-facing message if the summary is invalid
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Each session must be a JSON object")
+    for field in REQUIRED_FIELDS:
+        if field not in item:
+            raise ValueError(f"Missing required field: {field}")
+    return normalize_summary(item)
+
+def commit_records(records, stopwatch=None):
+    """
+    Append records to the session store in one write and update statistics.
+    
+    Args:
+        records: List of validated store records
+        stopwatch: Optional Stopwatch timing the "commit" and "aggregate" stages
+    """
+    # Waits until the rows are on disk
+    session_log.append(records)
+    if stopwatch is not None:
+        stopwatch.lap("commit")
+    stats_cache.refresh()
+    publish_stats()
+    if stopwatch is not None:
+        stopwatch.lap("aggregate")
+    SESSIONS_LOGGED.inc(len(records))
+    if len(records) == 1:
+        record = records[0]
+        logger.info(f"Logged emotion session: {record['dominant_emotion']}, duration: {record['duration_seconds']}s")
+    else:
+        logger.info(f"Logged {len(records)} emotion sessions")
+
 @app.route("/log", methods=["POST"])
 def log_emotion():
     """
     API endpoint for receiving and logging emotion data from the client.
-    Accepts JSON data containing emotion session information and saves it to CSV.
+    Accepts JSON data containing emotion session information and appends it to the session store.
+    A JSON array of sessions is accepted too and committed in one write.
     
     Expected JSON data:
         - timestamp: When the session occurred
@@ -95,41 +316,106 @@ def log_emotion():
         JSON response indicating success or failure
     """
     try:
+        stopwatch = Stopwatch(LOG_STAGES)
+        # Read the body first so reading and parsing are timed separately
+        request.get_data(cache=True)
+        stopwatch.lap("read")
         data = request.get_json()
         if not data:
             logger.warning("Received empty request data")
             return jsonify({"status": "error", "message": "No data received"}), 400
 
-        # Validate required fields
-        required_fields = ["timestamp", "duration_seconds", "dominant_emotion", "emotion_percentages"]
-        for field in required_fields:
-            if field not in data:
-                logger.warning(f"Missing required field: {field}")
-                return jsonify({"status": "error", "message": f"Missing required field: {field}"}), 400
-
-        # Convert emotion percentages dictionary to string format for CSV storage
-        percentages = data.get("emotion_percentages", {})
-        percentages_str = ", ".join([f"{k}: {v}%" for k, v in percentages.items()])
-
-        # Prepare row data for CSV
-        row = {
-            "timestamp": data.get("timestamp", datetime.now().isoformat()),
-            "duration_seconds": data.get("duration_seconds", 0),
-            "dominant_emotion": data.get("dominant_emotion", "unknown"),
-            "emotion_percentages": percentages_str
-        }
-
-        # Append the new data to the CSV file
-        df = pd.read_csv(LOG_PATH)
-        df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-        df.to_csv(LOG_PATH, index=False)
-
-        logger.info(f"Logged emotion session: {row['dominant_emotion']}, duration: {row['duration_seconds']}s")
-        return jsonify({"status": "ok", "message": "Session logged"})
+        # Validate every session before writing any of them
+        records = []
+        for item in (data if isinstance(data, list) else [data]):
+            try:
+                records.append(validate_summary(item))
+            except ValueError as e:
+                logger.warning(str(e))
+                return jsonify({"status": "error", "message": str(e)}), 400
+        stopwatch.lap("parse")
+
+        commit_records(records, stopwatch)
+        message = "Session logged" if len(records) == 1 else f"{len(records)} sessions logged"
+        return jsonify({"status": "ok", "message": message})
     except Exception as e:
         logger.error(f"Error logging emotion data: {str(e)}")
         return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
 
+def iter_bulk_items():
+    """
+    Parse the body of a bulk request.
+    NDJSON bodies are read line by line from the request stream; anything
+    else is parsed as a single JSON array.
+    
+    Yields:
+        Tuples of (parsed item, error message or None)
+    """
+    if request.mimetype in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        # Buffer the raw stream so lines aren't read a byte at a time
+        for line in io.BufferedReader(request.stream, 1 << 16):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, f"Invalid JSON: {e}"
+        return
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array or an NDJSON body")
+    for item in data:
+        yield item, None
+
+@app.route("/log/bulk", methods=["POST"])
+def log_emotion_bulk():
+    """
+    API endpoint for uploading many session summaries in one request.
+    Accepts a JSON array or an NDJSON stream (one summary per line).
+    Valid summaries are committed in a single storage write; invalid ones
+    are reported without rejecting the rest.
+    
+    Returns:
+        JSON with accepted/rejected counts and a status for every item
+    """
+    try:
+        stopwatch = Stopwatch(BULK_STAGES)
+        records = []
+        results = []
+        try:
+            for index, (item, error) in enumerate(iter_bulk_items()):
+                if error is None:
+                    try:
+                        records.append(validate_summary(item))
+                    except ValueError as e:
+                        error = str(e)
+                if error is None:
+                    results.append({"index": index, "status": "ok"})
+                else:
+                    results.append({"index": index, "status": "error", "message": error})
+        except ValueError as e:
+            logger.warning(str(e))
+            return jsonify({"status": "error", "message": str(e)}), 400
+        stopwatch.lap("parse")
+
+        if records:
+            commit_records(records, stopwatch)
+
+        rejected = len(results) - len(records)
+        if rejected:
+            logger.warning(f"Bulk upload rejected {rejected} of {len(results)} sessions")
+        return jsonify({
+            "status": "ok",
+            "accepted": len(records),
+            "rejected": rejected,
+            "results": results
+        })
+    except Exception as e:
+        logger.error(f"Error logging bulk emotion data: {str(e)}")
+        return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
+
 @app.route('/')
 def index():
     """
@@ -141,11 +427,39 @@ def index():
     # Include CSRF token in the template
     return render_template('index.html', csrf_token=get_csrf_token())
 
+def parse_time_arg(name):
+    """
+    Parse an optional ISO timestamp query parameter.
+
+    Args:
+        name: Query parameter name
+
+    Returns:
+        Local wall-clock microseconds, or None if the parameter is absent
+
+    Raises:
+        ValueError: If the parameter is not an ISO formatted timestamp
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return to_epoch_us(value)
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' timestamp: {value}")
+
 @app.route('/api/emotion_stats')
 def emotion_stats():
     """
     API endpoint to retrieve analyzed emotion statistics.
-    Reads from the CSV log file and calculates aggregate statistics.
+    Served from running aggregates that are updated as sessions are logged.
+
+    Optional query parameters:
+        from: ISO timestamp; only sessions logged at or after it
+        to: ISO timestamp; only sessions logged before it
+        bucket: minute, hour or day to get one entry per time bucket
+        camera: Only sessions recorded by this camera id
+        group_by: "camera" to get the statistics of every camera separately
     
     Returns:
         JSON containing:
@@ -154,54 +468,44 @@ def emotion_stats():
         - Average percentages for each emotion
         - Total visitor count
         - Empty state flag
+        With bucket, a "buckets" list with these fields per bucket instead.
+        With group_by, a "cameras" object with these fields per camera.
     """
     try:
-        df = pd.read_csv(LOG_PATH)
-        
-        if df.empty:
-            # Return default values for empty data instead of an error
-            return jsonify({
-                "status": "ok",
-                "avg_duration": 0,
-                "overall_dominant_emotion": "none",
-                "avg_emotion_percentages": {},
-                "visitor_count": 0,
-                "is_empty": True
-            })
-        
-        # Calculate average duration
-        avg_duration = df['duration_seconds'].mean()
-        
-        # Find overall dominant emotion
-        dominant_emotions = df['dominant_emotion'].value_counts()
-        overall_dominant = dominant_emotions.idxmax() if not dominant_emotions.empty else "unknown"
-        
-        # Parse and aggregate emotion percentages
-        emotion_totals = {}
-        for percentages_str in df['emotion_percentages']:
-            percentages = {}
-            for item in percentages_str.split(','):
-                emotion, value = item.strip().split(':')
-                emotion = emotion.strip()
-                value = float(value.strip(' %'))
-                if emotion not in emotion_totals:
-                    emotion_totals[emotion] = []
-                emotion_totals[emotion].append(value)
-        
-        # Calculate average percentage for each emotion
-        avg_percentages = {emotion: sum(values)/len(values) for emotion, values in emotion_totals.items()}
-        
-        # Count number of visitors (rows in CSV)
-        visitor_count = len(df)
-        
+        start_us = parse_time_arg("from")
+        end_us = parse_time_arg("to")
+        bucket = request.args.get("bucket")
+        if bucket is not None and bucket not in BUCKET_WIDTHS:
+            raise ValueError(f"Invalid bucket '{bucket}', expected one of: {', '.join(BUCKET_WIDTHS)}")
+        camera = request.args.get("camera") or None
+        group_by = request.args.get("group_by")
+        if group_by is not None and group_by != "camera":
+            raise ValueError(f"Invalid group_by '{group_by}', expected: camera")
+        if group_by and (bucket or camera):
+            raise ValueError("group_by can't be combined with bucket or camera")
+    except ValueError as e:
         return jsonify({
-            "status": "ok",
-            "avg_duration": round(avg_duration, 2),
-            "overall_dominant_emotion": overall_dominant,
-            "avg_emotion_percentages": avg_percentages,
-            "visitor_count": visitor_count,
-            "is_empty": False
-        })
+            "status": "error",
+            "message": str(e)
+        }), 400
+
+    try:
+        stopwatch = Stopwatch(STATS_STAGES)
+        # Fold in any rows appended since the last request (e.g. by other processes)
+        stats_cache.refresh()
+        stopwatch.lap("refresh")
+        if group_by:
+            payload = stats_cache.group_by_camera(start_us, end_us)
+        elif bucket:
+            payload = stats_cache.query_buckets(bucket, start_us, end_us, camera)
+        elif start_us is not None or end_us is not None:
+            payload = stats_cache.query_range(start_us, end_us, camera)
+        else:
+            payload = stats_cache.to_response(camera)
+        stopwatch.lap("aggregate")
+        response = jsonify(payload)
+        stopwatch.lap("serialize")
+        return response
     
     except Exception as e:
         logger.error(f"Error retrieving emotion stats: {str(e)}")
@@ -210,11 +514,152 @@ def emotion_stats():
             "message": str(e)
         }), 500
 
+@app.route('/api/stream')
+def stats_stream():
+    """
+    Server-Sent Events stream of emotion statistics.
+    Sends the current statistics on connect and again whenever a session
+    is committed, with a comment line every STREAM_HEARTBEAT_SECONDS so
+    proxies keep the connection open and dead clients are noticed.
+    
+    Returns:
+        text/event-stream response of "stats" events shaped like /api/emotion_stats,
+        or 503 when AFFECTRA_MAX_STREAMS streams are already open
+    """
+    if not stats_stream_slots.acquire(blocking=False):
+        logger.warning(f"Refusing statistics stream: {MAX_STATS_STREAMS} already open")
+        return jsonify({
+            "status": "error",
+            "message": "Too many open statistics streams; poll /api/emotion_stats instead"
+        }), 503, {"Retry-After": "60"}
+
+    try:
+        ensure_stats_watcher()
+        stats_cache.refresh()
+        # Subscribe before reading the initial state so no update can slip in between
+        subscriber = stats_events.subscribe()
+        initial = format_stats_event({**stats_cache.to_response(), "new_sessions": 0})
+    except Exception:
+        stats_stream_slots.release()
+        raise
+
+    def generate():
+        try:
+            yield b"retry: 3000\n\n"
+            yield initial
+            while not stats_events.closed:
+                event = subscriber.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                yield event if event is not None else b": heartbeat\n\n"
+        finally:
+            subscriber.close()
+
+    response = Response(generate(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Runs when the server closes the response, even if it was never iterated
+    response.call_on_close(stats_stream_slots.release)
+    return response
+
+def parse_int_arg(name, minimum):
+    """
+    Parse an optional integer query parameter.
+
+    Args:
+        name: Query parameter name
+        minimum: Smallest accepted value
+
+    Returns:
+        The integer, or None if the parameter is absent
+
+    Raises:
+        ValueError: If the parameter is not an integer of at least minimum
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or number < minimum:
+        raise ValueError(f"Invalid '{name}': expected an integer of at least {minimum}")
+    return number
+
+@app.route('/api/export')
+def export_sessions():
+    """
+    API endpoint streaming stored sessions as CSV or NDJSON.
+    Sessions are read and sent a chunk at a time, so exports of any size
+    use constant memory. The export covers the sessions stored when the
+    request arrived, in storage order. Each session carries its "id";
+    an interrupted export resumes with after=<last id received>, passing
+    the X-Export-Generation header of the first response as generation
+    so a cleared store is detected. Output is gzip-compressed when the
+    client sends Accept-Encoding: gzip.
+
+    Optional query parameters:
+        format: csv (default) or ndjson
+        from: ISO timestamp; only sessions logged at or after it
+        to: ISO timestamp; only sessions logged before it
+        camera: Only sessions recorded by this camera id
+        after: Only sessions with an id above this one
+        limit: Maximum number of sessions to send
+        generation: Fail with 409 if the store was cleared since this generation
+    
+    Returns:
+        Streaming text/csv or application/x-ndjson response
+    """
+    try:
+        export_format = request.args.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid format '{export_format}', expected one of: {', '.join(EXPORT_FORMATS)}")
+        start_us = parse_time_arg("from")
+        end_us = parse_time_arg("to")
+        after = parse_int_arg("after", 0)
+        limit = parse_int_arg("limit", 1)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    meta = session_log.read_meta()
+    generation = request.args.get("generation")
+    if generation and generation != meta["generation"]:
+        return jsonify({
+            "status": "error",
+            "message": "The session store was cleared since this export started"
+        }), 409
+
+    # Fix the end of the export now, so rows logged while it streams don't
+    # need labels or cameras the header and metadata don't know yet
+    records = iter_records(session_log, meta, start_us, end_us,
+                           camera=request.args.get("camera") or None,
+                           after=after, limit=limit, stop=session_log.row_count(meta))
+    exported = EXPORTED_SESSIONS.labels(format=export_format)
+
+    def generate():
+        try:
+            yield from export_stream(records, export_format, on_chunk=exported.inc)
+        except RowsDeletedError as e:
+            # Raising breaks off the transfer, so the client can't mistake
+            # the partial output for a complete export
+            logger.error(f"Export truncated: {str(e)}")
+            raise
+
+    body = generate()
+    headers = {
+        "Content-Disposition": f"attachment; filename=affectra_sessions.{export_format}",
+        "X-Export-Generation": meta["generation"],
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache"
+    }
+    if request.accept_encodings["gzip"] > 0:
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype=EXPORT_FORMATS[export_format], headers=headers)
+
 @app.route('/api/clear_data', methods=["POST"])
 def clear_data():
     """
     API endpoint to clear all stored emotion data.
-    Creates a new empty CSV file with only the headers.
+    Empties the session store and starts a new generation.
     
     Returns:
         JSON response indicating success or failure
@@ -226,15 +671,10 @@ def clear_data():
             logger.warning("CSRF verification failed")
             return jsonify({"status": "error", "message": "Invalid request"}), 403
         
-        # Create an empty DataFrame with the same columns
-        df = pd.DataFrame(columns=[
-            "timestamp",
-            "duration_seconds",
-            "dominant_emotion",
-            "emotion_percentages"
-        ])
-        # Write the empty DataFrame to the CSV file
-        df.to_csv(LOG_PATH, index=False)
+        # Truncate every column of the session store
+        session_log.clear()
+        stats_cache.refresh()
+        publish_stats()
         
         logger.info("Data cleared successfully")
         return jsonify({
@@ -248,93 +688,340 @@ def clear_data():
             "message": str(e)
         }), 500
 
-# Initialize camera tracker
-camera_tracker = None
+# In production mode every camera, with its tracker and model, lives in
+# its own camera service process; workers relay the video routes to it
+CAMERA_SERVICES = parse_camera_map(os.environ.get("AFFECTRA_CAMERA_SERVICES", ""))
 
-def init_camera_tracker():
+# Camera served by /video_feed and /api/pipeline_stats without an id
+DEFAULT_CAMERA = next(iter(CAMERAS))
+
+def proxy_camera_service(camera_id, path):
+    """
+    Relay a request to a camera service, streaming the response.
+    
+    Args:
+        camera_id: Camera whose service handles the request
+        path: Path on the camera service, e.g. "/video_feed/lobby"
+        
+    Returns:
+        Streaming response, or a 503 error if the service is unreachable
+    """
+    import requests
+    try:
+        upstream = requests.get(CAMERA_SERVICES[camera_id] + path, stream=True, timeout=(5, 30))
+    except requests.RequestException as e:
+        logger.error(f"Camera service for '{camera_id}' unavailable: {str(e)}")
+        return jsonify({"status": "error", "message": "Camera service unavailable"}), 503
+
+    def generate():
+        try:
+            for chunk in upstream.iter_content(chunk_size=None):
+                yield chunk
+        except requests.RequestException as e:
+            logger.warning(f"Camera stream interrupted: {str(e)}")
+        finally:
+            upstream.close()
+
+    return Response(generate(), status=upstream.status_code,
+                    content_type=upstream.headers.get("Content-Type"))
+
+def unknown_camera(camera_id):
+    """Return the error response for a camera id that isn't configured."""
+    return jsonify({"status": "error", "message": f"Unknown camera: {camera_id}"}), 404
+
+# Camera trackers by camera id
+camera_trackers = {}
+
+def init_camera_tracker(camera_id=None):
     """
-    Initialize or return the existing camera tracker instance.
-    Uses a global variable to maintain the same tracker across requests.
+    Initialize or return the existing camera tracker instance of a camera.
+    Uses a global dictionary to maintain the same tracker across requests.
+    
+    Args:
+        camera_id: Configured camera id; defaults to DEFAULT_CAMERA
     
     Returns:
         An instance of CameraTracker
     """
-    global camera_tracker
-    if camera_tracker is None:
-        camera_tracker = CameraTracker()
-    return camera_tracker
+    camera_id = camera_id or DEFAULT_CAMERA
+    if camera_id not in camera_trackers:
+        from client.camera_tracker import CameraTracker
+        camera_trackers[camera_id] = CameraTracker(camera_id=camera_id)
+    return camera_trackers[camera_id]
 
-# Initialize camera
-camera = None
+# Video captures by camera id
+cameras = {}
 
-def get_camera():
+def get_camera(camera_id=None):
     """
-    Initialize or return the existing camera instance.
-    Uses a global variable to maintain the same camera across requests.
+    Initialize or return the existing capture of a camera.
+    Uses a global dictionary to maintain the same capture across requests.
+    
+    Args:
+        camera_id: Configured camera id; defaults to DEFAULT_CAMERA
     
     Returns:
         An OpenCV VideoCapture object
     """
-    global camera
-    if camera is None:
-        camera = cv2.VideoCapture(0)
+    camera_id = camera_id or DEFAULT_CAMERA
+    if camera_id not in cameras:
+        import cv2
+        cameras[camera_id] = cv2.VideoCapture(CAMERAS[camera_id])
         # Wait for the camera to initialize
         time.sleep(1)
-    return camera
+    return cameras[camera_id]
+
+# Video pipelines by camera id
+frame_pipelines = {}
+frame_pipeline_lock = threading.Lock()
+
+def draw_frame(frame, camera_id=None):
+    """
+    Draw the tracker overlay and the current emotion text on a frame.
+    
+    Args:
+        frame: Video frame to draw on (modified in place)
+        camera_id: Camera the frame comes from
+        
+    Returns:
+        The annotated frame
+    """
+    import cv2
+    tracker = init_camera_tracker(camera_id)
+    processed_frame = tracker.draw_overlay(frame)
+    
+    # Add current emotion text if available
+    current_emotion = tracker.get_current_emotion()
+    if current_emotion:
+        cv2.putText(processed_frame, 
+                    f"Current: {current_emotion}", 
+                    (10, 30), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 
+                    1, 
+                    (0, 255, 0), 
+                    2)
+    return processed_frame
 
-def gen_frames():
+def get_pipeline(camera_id=None):
     """
-    Generator function to continuously yield video frames.
-    Processes each frame with emotion detection before yielding.
+    Initialize or return the running capture / inference / encode pipeline of a camera.
+    All viewers of a camera share one pipeline, so each frame is captured,
+    analyzed and encoded once. Restarts the pipeline if it stopped (e.g.
+    after a camera read failure).
+    
+    Args:
+        camera_id: Configured camera id; defaults to DEFAULT_CAMERA
+    
+    Returns:
+        A running FramePipeline
+    """
+    camera_id = camera_id or DEFAULT_CAMERA
+    with frame_pipeline_lock:
+        pipeline = frame_pipelines.get(camera_id)
+        if pipeline is None or not pipeline.running:
+            from functools import partial
+            from client.pipeline import FramePipeline
+            pipeline = FramePipeline(get_camera(camera_id), init_camera_tracker(camera_id),
+                                     draw=partial(draw_frame, camera_id=camera_id),
+                                     framing=MULTIPART_FRAMING, camera_id=camera_id)
+            pipeline.start()
+            frame_pipelines[camera_id] = pipeline
+        return pipeline
+
+# Part headers around each JPEG in the /video_feed multipart stream; the
+# pipeline builds every part once and all viewers send the same bytes
+MULTIPART_FRAMING = (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n', b'\r\n')
+
+def gen_frames(camera_id=None):
+    """
+    Generator function to continuously yield video frames of a camera.
+    Frames are captured, analyzed and encoded by the shared background
+    pipeline, so the stream runs at the camera rate with the latest emotion
+    overlay. A viewer that falls behind skips to the newest frame.
     Used by the video_feed route to implement streaming.
     
+    Args:
+        camera_id: Configured camera id; defaults to DEFAULT_CAMERA
+    
     Yields:
-        JPEG image data of each processed frame
+        Complete multipart parts, each holding one JPEG frame
     """
-    camera = get_camera()
-    tracker = init_camera_tracker()
+    camera_id = camera_id or DEFAULT_CAMERA
+    pipeline = get_pipeline(camera_id)
+    subscriber = pipeline.subscribe()
+    viewers = STREAM_VIEWERS.labels(camera=camera_id)
+    frames_sent = STREAM_FRAMES.labels(camera=camera_id)
+    viewers.inc()
     
-    while True:
-        success, frame = camera.read()
-        if not success:
-            break
-        else:
-            try:
-                # Process frame with emotion tracker
-                processed_frame = tracker.process_frame(frame)
-                
-                # Add current emotion text if available
-                current_emotion = tracker.get_current_emotion()
-                if current_emotion:
-                    cv2.putText(processed_frame, 
-                                f"Current: {current_emotion}", 
-                                (10, 30), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 
-                                1, 
-                                (0, 255, 0), 
-                                2)
-                
-                # Convert frame to jpg format
-                ret, buffer = cv2.imencode('.jpg', processed_frame)
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            except Exception as e:
-                logger.error(f"Error generating frame: {e}")
-                break
+    try:
+        while pipeline.running:
+            part = subscriber.get(timeout=1.0)
+            if part is None:
+                continue
+            yield part
+            frames_sent.inc()
+    finally:
+        viewers.dec()
+        subscriber.close()
 
 @app.route('/video_feed')
-def video_feed():
+@app.route('/video_feed/<camera_id>')
+def video_feed(camera_id=None):
     """
-    Endpoint to stream the processed video feed.
+    Endpoint to stream the processed video feed of a camera.
     Uses multipart response to continuously stream JPEG images.
     
+    Args:
+        camera_id: Configured camera id; defaults to the first camera
+    
     Returns:
         Streaming response with processed camera frames
     """
-    return Response(gen_frames(),
+    camera_id = camera_id or DEFAULT_CAMERA
+    if camera_id in CAMERA_SERVICES:
+        return proxy_camera_service(camera_id, f"/video_feed/{camera_id}")
+    if camera_id not in CAMERAS:
+        return unknown_camera(camera_id)
+    return Response(gen_frames(camera_id),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/api/cameras')
+def list_cameras():
+    """
+    API endpoint listing the configured cameras.
+    
+    Returns:
+        JSON with the camera ids, in configuration order
+    """
+    return jsonify({"status": "ok", "cameras": list(CAMERAS)})
+
+@app.route('/api/pipeline_stats')
+def pipeline_stats():
+    """
+    API endpoint exposing per-stage statistics of a camera's video pipeline.
+    Takes the camera id in the optional "camera" query parameter.
+    
+    Returns:
+        JSON with processed counts, rates, queue depths and drop counts
+    """
+    camera_id = request.args.get("camera") or DEFAULT_CAMERA
+    if camera_id in CAMERA_SERVICES:
+        return proxy_camera_service(camera_id, f"/api/pipeline_stats?camera={camera_id}")
+    if camera_id not in CAMERAS:
+        return unknown_camera(camera_id)
+    pipeline = frame_pipelines.get(camera_id)
+    if pipeline is None:
+        return jsonify({"status": "ok", "camera": camera_id, "running": False, "stages": {}})
+    return jsonify({"status": "ok", "camera": camera_id, **pipeline.stats()})
+
+def warm_up():
+    """
+    Load the camera tracker and emotion model ahead of the first request.
+    Runs one dummy face through the analyzer so the first /video_feed
+    frame doesn't pay for building the model.
+    """
+    import numpy as np
+    with startup_report.phase("model warm-up"):
+        tracker = init_camera_tracker()
+        tracker.analyzer.analyze([np.zeros((48, 48, 3), dtype=np.uint8)])
+
+def finish_startup(warm=None):
+    """
+    Optionally warm up the model, then log the startup report.
+    
+    Args:
+        warm: Whether to warm up; defaults to the AFFECTRA_WARMUP
+            environment variable
+    """
+    if warm is None:
+        warm = os.environ.get("AFFECTRA_WARMUP", "").lower() in ("1", "true", "yes")
+    if warm:
+        try:
+            warm_up()
+        except Exception as e:
+            logger.error(f"Model warm-up failed: {str(e)}")
+    startup_report.finish()
+    logger.info(startup_report.summary())
+
+@app.route('/api/startup_report')
+def startup_report_api():
+    """
+    API endpoint breaking down where server startup time went.
+    
+    Returns:
+        JSON with the total startup time and the duration of each phase
+    """
+    return jsonify({"status": "ok", **startup_report.as_dict()})
+
+@app.route('/metrics')
+def metrics():
+    """
+    Metrics endpoint in the Prometheus text format.
+    Includes the metrics of the camera services, labelled with their
+    camera, when cameras run in separate processes. Each server worker
+    keeps its own metrics, so every scrape reports the worker that served it.
+    
+    Returns:
+        text/plain exposition of request, handler stage, pipeline and
+        frame stage metrics
+    """
+    texts = [(REGISTRY.render(), None)]
+    if CAMERA_SERVICES:
+        import requests
+        for camera_id, url in CAMERA_SERVICES.items():
+            try:
+                upstream = requests.get(f"{url}/metrics", timeout=2)
+                upstream.raise_for_status()
+                texts.append((upstream.text, {"camera_service": camera_id}))
+            except requests.RequestException as e:
+                logger.warning(f"Could not read metrics of camera service {camera_id}: {str(e)}")
+    return Response(merge_exposition(texts), mimetype="text/plain; version=0.0.4")
+
+# Sampling profiler for /api/profiler; off unless AFFECTRA_PROFILING is set,
+# as profiles reveal code paths and slow the process while running
+profiler = SamplingProfiler()
+PROFILING_ENABLED = os.environ.get("AFFECTRA_PROFILING", "").lower() in ("1", "true", "yes")
+
+@app.route('/api/profiler', methods=["GET", "POST"])
+def profiler_api():
+    """
+    API endpoint controlling the sampling profiler of this process.
+    Only available when the AFFECTRA_PROFILING environment variable is set.
+    
+    GET returns the profiler state and the functions seen most often, or
+    the collected stacks in folded format (for flame graph tools) with
+    ?format=folded. POST takes {"action": "start" | "stop" | "reset"} and,
+    for start, an optional "interval_ms".
+    
+    Returns:
+        JSON with the profiler state, or text/plain folded stacks
+    """
+    if not PROFILING_ENABLED:
+        return jsonify({"status": "error", "message": "Profiling is disabled; set AFFECTRA_PROFILING=1"}), 403
+
+    if request.method == "GET":
+        if request.args.get("format") == "folded":
+            return Response(profiler.folded(), mimetype="text/plain")
+        return jsonify({"status": "ok", **profiler.stats(), "top": profiler.top(25)})
+
+    data = request.get_json(silent=True) or {}
+    action = data.get("action")
+    if action == "start":
+        interval_ms = data.get("interval_ms")
+        if interval_ms is not None and (not isinstance(interval_ms, (int, float)) or not 1 <= interval_ms <= 1000):
+            return jsonify({"status": "error", "message": "interval_ms must be a number from 1 to 1000"}), 400
+        profiler.start(interval_ms / 1000 if interval_ms else None)
+        logger.info("Sampling profiler started")
+    elif action == "stop":
+        profiler.stop()
+        logger.info("Sampling profiler stopped")
+    elif action == "reset":
+        profiler.reset()
+    else:
+        return jsonify({"status": "error", "message": "action must be start, stop or reset"}), 400
+    return jsonify({"status": "ok", **profiler.stats()})
+
 if __name__ == "__main__":
+    finish_startup()
     logger.info("Starting Affectra application server")
     app.run(port=5000, debug=True)
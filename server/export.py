@@ -0,0 +1,177 @@
+"""
+Streaming export of the session store.
+Rows are read a chunk at a time and written out as CSV or NDJSON, so
+memory use stays the same however much history is exported. Every row
+carries its row number ("id"), which an interrupted export can resume
+after; the output can be gzip-compressed as it is produced.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+import numpy as np
+
+from server.storage import LOG_COLUMNS, select_rows
+
+# Content type of every export format
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+# CSV header: the legacy log's columns (so exports can be fed back to
+# server.migrate_csv) plus the row number and the camera
+CSV_COLUMNS = ["id", *LOG_COLUMNS, "camera_id"]
+
+
+def iter_records(session_log, meta, start_us=None, end_us=None, camera=None, after=None, limit=None,
+                 stop=None, chunk_rows=4096):
+    """
+    Read sessions from the store as summary dictionaries, a chunk at a time.
+
+    Args:
+        session_log: SessionLog to read
+        meta: Metadata from session_log.read_meta(), fixing the labels,
+            cameras and segments of the export
+        start_us: Inclusive lower time bound, or None
+        end_us: Exclusive upper time bound, or None
+        camera: Only sessions recorded by this camera id, or None
+        after: Only rows with an id above this one, to resume an export
+        limit: Maximum number of sessions, or None for all
+        stop: Only rows below this row number; defaults to the committed row count
+        chunk_rows: Rows read from the store at a time
+
+    Yields:
+        Lists of dictionaries shaped like the summaries accepted by /log,
+        plus their "id"
+    """
+    labels = meta["labels"]
+    cameras = meta["cameras"]
+    camera_index = None
+    if camera is not None:
+        camera_index = cameras.index(camera) if camera in cameras else -1
+    remaining = limit
+
+    for rows, columns in session_log.iter_rows(meta, start_us, end_us, after, stop, chunk_rows):
+        if camera_index is not None:
+            mask = np.asarray(columns["camera"]) == camera_index
+            if not mask.any():
+                continue
+            rows, columns = rows[mask], select_rows(columns, mask)
+        if remaining is not None:
+            rows = rows[:remaining]
+            remaining -= len(rows)
+
+        n = len(rows)
+        # Convert whole columns at once; only building the dicts is per row
+        timestamps = np.datetime_as_string(np.asarray(columns["timestamp"][:n]).astype("datetime64[us]"))
+        durations = np.asarray(columns["duration_seconds"][:n]).tolist()
+        dominant = np.asarray(columns["dominant_emotion"][:n]).tolist()
+        recorded_by = np.asarray(columns["camera"][:n]).tolist()
+        if labels:
+            percentages = np.stack([values[:n] for values in columns["percentages"]], axis=1).tolist()
+        else:
+            percentages = [[]] * n
+
+        yield [
+            {
+                "id": int(rows[i]),
+                "timestamp": str(timestamps[i]),
+                "duration_seconds": durations[i],
+                "dominant_emotion": labels[dominant[i]],
+                # NaN (the only value not equal to itself) marks absent labels
+                "emotion_percentages": {
+                    label: value for label, value in zip(labels, percentages[i]) if value == value
+                },
+                "camera_id": cameras[recorded_by[i]]
+            }
+            for i in range(n)
+        ]
+        if remaining == 0:
+            return
+
+
+def format_csv(records, header=False):
+    """
+    Render sessions as CSV rows.
+
+    Args:
+        records: List of dictionaries from iter_records()
+        header: Whether to start with the header row
+
+    Returns:
+        UTF-8 encoded CSV text
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_COLUMNS)
+    writer.writerows(
+        (
+            record["id"],
+            record["timestamp"],
+            record["duration_seconds"],
+            record["dominant_emotion"],
+            # Same "emotion: value%" list as the legacy log
+            ", ".join(f"{label}: {value}%" for label, value in record["emotion_percentages"].items()),
+            record["camera_id"]
+        )
+        for record in records
+    )
+    return buffer.getvalue().encode("utf-8")
+
+
+def format_ndjson(records):
+    """
+    Render sessions as newline-delimited JSON, one object per line.
+
+    Args:
+        records: List of dictionaries from iter_records()
+
+    Returns:
+        UTF-8 encoded NDJSON text
+    """
+    return "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+
+
+def export_stream(chunks, export_format, on_chunk=None):
+    """
+    Render chunks of sessions in an export format.
+
+    Args:
+        chunks: Iterable of record lists from iter_records()
+        export_format: One of EXPORT_FORMATS
+        on_chunk: Optional callback receiving the number of sessions in
+            every rendered chunk
+
+    Yields:
+        Encoded output, starting with the CSV header for CSV exports
+    """
+    if export_format == "csv":
+        yield format_csv([], header=True)
+    for records in chunks:
+        yield format_csv(records) if export_format == "csv" else format_ndjson(records)
+        if on_chunk is not None:
+            on_chunk(len(records))
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Compress a byte stream into gzip format as it is produced.
+
+    Args:
+        chunks: Iterable of bytes
+        level: zlib compression level
+
+    Yields:
+        Compressed bytes; together a complete gzip file
+    """
+    # wbits=31 selects the gzip container
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,105 @@
+"""
+One-shot migration of a legacy CSV session log into the columnar store.
+
+Usage:
+    python -m server.migrate_csv [csv_path] [store_path]
+
+Both paths default to the locations used by the server. CSV exports of
+/api/export can be imported the same way; their camera_id column is kept.
+"""
+
+import logging
+import os
+import sys
+
+import pandas as pd
+
+from server.storage import LOG_COLUMNS, SessionLog, normalize_summary
+
+logger = logging.getLogger("affectra")
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV_PATH = os.path.join(SERVER_DIR, "storage", "affectra_log.csv")
+DEFAULT_STORE_PATH = os.path.join(SERVER_DIR, "storage", "sessions")
+
+
+def parse_percentages(percentages_str):
+    """
+    Parse an emotion distribution string written by the legacy CSV log.
+
+    Args:
+        percentages_str: String such as "happy: 40.0%, sad: 60.0%"
+
+    Returns:
+        Dictionary mapping emotions to percentages
+    """
+    percentages = {}
+    if not percentages_str:
+        return percentages
+    for item in percentages_str.split(','):
+        emotion, value = item.strip().split(':')
+        percentages[emotion.strip()] = float(value.strip(' %'))
+    return percentages
+
+
+def migrate_csv(csv_path, session_log, chunk_size=100000):
+    """
+    Append every row of a legacy CSV log to a session store.
+    Rows of a CSV with a camera_id column (as written by /api/export)
+    keep their camera; other rows are stored for the default camera.
+
+    Args:
+        csv_path: Path of the CSV log
+        session_log: SessionLog to append to
+        chunk_size: Number of CSV rows read and committed at a time
+
+    Returns:
+        Tuple of (migrated row count, skipped row count)
+    """
+    migrated = 0
+    skipped = 0
+    columns = LOG_COLUMNS
+    if "camera_id" in pd.read_csv(csv_path, nrows=0).columns:
+        columns = [*LOG_COLUMNS, "camera_id"]
+    chunks = pd.read_csv(csv_path, dtype=str, keep_default_na=False,
+                         usecols=columns, chunksize=chunk_size)
+    for chunk in chunks:
+        records = []
+        for row in chunk.itertuples(index=False):
+            try:
+                records.append(normalize_summary({
+                    "timestamp": row.timestamp,
+                    "duration_seconds": row.duration_seconds,
+                    "dominant_emotion": row.dominant_emotion,
+                    "emotion_percentages": parse_percentages(row.emotion_percentages),
+                    "camera_id": getattr(row, "camera_id", None)
+                }))
+            except ValueError as e:
+                logger.warning(f"Skipping malformed CSV row: {e}")
+                skipped += 1
+        session_log.append(records)
+        migrated += len(records)
+    return migrated, skipped
+
+
+def main(argv):
+    csv_path = argv[1] if len(argv) > 1 else DEFAULT_CSV_PATH
+    store_path = argv[2] if len(argv) > 2 else DEFAULT_STORE_PATH
+
+    if not os.path.exists(csv_path):
+        print(f"❌ CSV log not found: {csv_path}")
+        return 1
+
+    session_log = SessionLog(store_path)
+    session_log.ensure_exists()
+    migrated, skipped = migrate_csv(csv_path, session_log)
+
+    # Rename the CSV so the rows are never migrated twice
+    os.replace(csv_path, csv_path + ".migrated")
+    print(f"✅ Migrated {migrated} sessions to {store_path} ({skipped} skipped).")
+    print(f"📁 Original log kept as {csv_path}.migrated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
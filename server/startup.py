@@ -0,0 +1,71 @@
+"""
+Startup timing for Affectra application.
+Records how long each phase of server startup takes so slow starts can
+be traced to imports, storage recovery or model loading.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """
+    Named durations of the startup phases, in the order they ran.
+    """
+
+    def __init__(self, started=None):
+        """
+        Initialize the report.
+
+        Args:
+            started: time.perf_counter() value when startup began; defaults to now
+        """
+        self.started = time.perf_counter() if started is None else started
+        self.finished = None
+        self.phases = []
+
+    def record(self, name, seconds):
+        """
+        Add a phase that was timed elsewhere.
+
+        Args:
+            name: Phase name
+            seconds: Duration in seconds
+        """
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed block as one phase.
+
+        Args:
+            name: Phase name
+        """
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - began)
+
+    def finish(self):
+        """Mark startup as complete."""
+        self.finished = time.perf_counter()
+
+    def total(self):
+        """Return the seconds from the start until finish() (or until now)."""
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    def as_dict(self):
+        """Return the report as a JSON-serializable dictionary."""
+        return {
+            "total_seconds": round(self.total(), 4),
+            "ready": self.finished is not None,
+            "phases": [{"name": name, "seconds": round(seconds, 4)} for name, seconds in self.phases]
+        }
+
+    def summary(self):
+        """Return the report as a single log line."""
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases)
+        return f"Startup finished in {self.total():.2f}s ({phases})"
@@ -56,6 +56,21 @@ document.addEventListener('DOMContentLoaded', function() {
         return fetch(url, mergedOptions);
     }
     
+    // Show a statistics payload received from the server
+    function showStats(data) {
+        updateStats(data);
+        loadingStats.style.display = 'none';
+        errorMessage.style.display = 'none';
+        statsContent.style.display = 'block';
+        
+        // Show empty data message if needed
+        emptyDataMessage.style.display = data.is_empty ? 'block' : 'none';
+        
+        // Update last fetch time
+        const now = new Date();
+        lastUpdate.textContent = `Last updated: ${now.toLocaleTimeString()}`;
+    }
+    
     // Fetch emotion statistics from the server
     function fetchEmotionStats() {
         loadingStats.style.display = 'block';
@@ -72,16 +87,7 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(data => {
                 if (data.status === 'ok') {
-                    updateStats(data);
-                    loadingStats.style.display = 'none';
-                    statsContent.style.display = 'block';
-                    
-                    // Show empty data message if needed
-                    emptyDataMessage.style.display = data.is_empty ? 'block' : 'none';
-                    
-                    // Update last fetch time
-                    const now = new Date();
-                    lastUpdate.textContent = `Last updated: ${now.toLocaleTimeString()}`;
+                    showStats(data);
                 } else {
                     throw new Error(data.message || 'Unknown error');
                 }
@@ -94,6 +100,48 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
+    // Live updates: the server pushes statistics over Server-Sent Events
+    // and we only poll while the stream is unavailable
+    let pollTimer = null;
+    let statsStream = null;
+    
+    function startPolling() {
+        if (pollTimer === null) {
+            pollTimer = setInterval(fetchEmotionStats, 30000);
+        }
+    }
+    
+    function stopPolling() {
+        if (pollTimer !== null) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+    }
+    
+    function connectStatsStream() {
+        if (!window.EventSource) {
+            fetchEmotionStats();
+            startPolling();
+            return;
+        }
+        
+        statsStream = new EventSource('/api/stream');
+        statsStream.addEventListener('stats', event => {
+            stopPolling();
+            showStats(JSON.parse(event.data));
+        });
+        statsStream.addEventListener('error', () => {
+            // The browser reconnects on its own; poll in the meantime
+            startPolling();
+            if (statsStream.readyState === EventSource.CLOSED) {
+                // The server refused the stream (e.g. too many are open);
+                // show the current statistics now and try again later
+                fetchEmotionStats();
+                setTimeout(connectStatsStream, 60000);
+            }
+        });
+    }
+    
     // Update the UI with the fetched statistics
     function updateStats(data) {
         // Update visitor count
@@ -174,8 +222,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 clearStatus.innerHTML = '<div class="alert alert-success">All tracking data has been cleared. New statistics will appear when new sessions are recorded.</div>';
                 clearStatus.style.display = 'block';
                 
-                // Refresh statistics to show updated data
-                fetchEmotionStats();
+                // Refresh statistics unless the stream already pushed them
+                if (pollTimer !== null || !statsStream) {
+                    fetchEmotionStats();
+                }
                 
                 // Hide success message after 5 seconds
                 setTimeout(() => {
@@ -204,9 +254,6 @@ document.addEventListener('DOMContentLoaded', function() {
         clearData();
     });
     
-    // Initial fetch
-    fetchEmotionStats();
-    
-    // Refresh data every 30 seconds
-    setInterval(fetchEmotionStats, 30000);
+    // Initial data arrives with the first stream event
+    connectStatsStream();
 }); 
\ No newline at end of file
@@ -0,0 +1,693 @@
+"""
+Statistics utilities for Affectra application.
+Maintains running aggregates over the session log so that statistics
+requests don't have to re-read the whole history, plus per-minute/hour/day
+rollups for bucketed queries. Statistics can be restricted to, or grouped
+by, the recording camera.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from server.storage import from_epoch_us, merge_totals, select_rows, to_epoch_us
+
+logger = logging.getLogger("affectra")
+
+# Supported bucket granularities and their width in microseconds
+BUCKET_WIDTHS = {
+    "minute": 60 * 1000000,
+    "hour": 3600 * 1000000,
+    "day": 86400 * 1000000
+}
+
+# Granularities only kept for raw rows still in the store; day buckets
+# also cover segments deleted by retention, from the store's rollups
+FINE_BUCKETS = ("minute", "hour")
+
+
+def sequential_sum(start, values):
+    """
+    Sum values strictly left to right, starting from start.
+    Gives bit-for-bit the same result as a Python sum() over the rows,
+    unlike NumPy's pairwise summation.
+
+    Args:
+        start: Running total to continue from
+        values: 1-D array of values
+
+    Returns:
+        Float total
+    """
+    if len(values) == 0:
+        return start
+    return float(np.cumsum(np.concatenate(([start], values)))[-1])
+
+
+def build_stats(count, duration_sum, dominant_counts, percentage_sums, percentage_counts):
+    """
+    Build a statistics payload from aggregated totals.
+
+    Args:
+        count: Number of sessions
+        duration_sum: Sum of the session durations
+        dominant_counts: Dict of emotion -> sessions it dominated
+        percentage_sums: Dict of emotion -> sum of its percentages
+        percentage_counts: Dict of emotion -> sessions reporting it
+
+    Returns:
+        Dictionary with the fields served by /api/emotion_stats
+    """
+    if count == 0:
+        return {
+            "avg_duration": 0,
+            "overall_dominant_emotion": "none",
+            "avg_emotion_percentages": {},
+            "visitor_count": 0,
+            "is_empty": True
+        }
+
+    # The first emotion to reach the highest count wins ties
+    overall_dominant = max(dominant_counts, key=dominant_counts.get)
+    avg_percentages = {
+        emotion: total / percentage_counts[emotion]
+        for emotion, total in percentage_sums.items()
+    }
+
+    return {
+        "avg_duration": round(duration_sum / count, 2),
+        "overall_dominant_emotion": overall_dominant,
+        "avg_emotion_percentages": avg_percentages,
+        "visitor_count": count,
+        "is_empty": False
+    }
+
+
+class SessionTotals:
+    """
+    Exact totals over a set of session rows.
+    Sums are accumulated row by row so the averages match a plain
+    sequential pass over the same rows.
+    """
+
+    __slots__ = ("count", "duration_sum", "dominant_counts", "percentage_sums", "percentage_counts")
+
+    def __init__(self):
+        self.count = 0
+        self.duration_sum = 0.0
+        self.dominant_counts = {}
+        self.percentage_sums = {}
+        self.percentage_counts = {}
+
+    def fold(self, columns, labels):
+        """
+        Add a block of rows to the totals.
+
+        Args:
+            columns: Arrays returned by SessionLog.read_columns()
+            labels: Emotion labels indexed by the dominant/percentage columns
+        """
+        self.count += len(columns["duration_seconds"])
+        self.duration_sum = sequential_sum(self.duration_sum, columns["duration_seconds"])
+
+        dominant_counts = np.bincount(columns["dominant_emotion"], minlength=len(labels))
+        for i in np.flatnonzero(dominant_counts):
+            label = labels[i]
+            self.dominant_counts[label] = self.dominant_counts.get(label, 0) + int(dominant_counts[i])
+
+        for label, values in zip(labels, columns["percentages"]):
+            present = values[~np.isnan(values)]
+            if len(present):
+                self.percentage_sums[label] = sequential_sum(self.percentage_sums.get(label, 0), present)
+                self.percentage_counts[label] = self.percentage_counts.get(label, 0) + len(present)
+
+    def to_stats(self):
+        """Return the statistics payload for these totals."""
+        return build_stats(self.count, self.duration_sum, self.dominant_counts,
+                           self.percentage_sums, self.percentage_counts)
+
+    def as_dict(self):
+        """Return the totals as a JSON-serializable dictionary."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restore totals saved with as_dict()."""
+        totals = cls()
+        for name in cls.__slots__:
+            setattr(totals, name, data[name])
+        return totals
+
+    def merge(self, data):
+        """
+        Add totals saved with as_dict(), e.g. a day of SessionLog.read_rollups().
+
+        Args:
+            data: Dictionary with the fields of as_dict()
+        """
+        merged = self.as_dict()
+        merge_totals(merged, data)
+        for name in self.__slots__:
+            setattr(self, name, merged[name])
+
+
+class BucketRollup:
+    """
+    Per-bucket aggregates at one time granularity.
+
+    Buckets are kept sorted by start time in arrays with spare capacity,
+    so folding rows into the newest buckets is amortized O(new rows) and
+    selecting a time range is a binary search.
+    """
+
+    _FIELDS = ("keys", "count", "duration_sum", "dominant", "pct_sum", "pct_count")
+
+    def __init__(self, width_us):
+        """
+        Initialize an empty rollup.
+
+        Args:
+            width_us: Bucket width in microseconds
+        """
+        self.width_us = width_us
+        self.reset()
+
+    def reset(self, n_labels=0):
+        """Forget all buckets."""
+        self.size = 0
+        self.n_labels = n_labels
+        self._allocate(16, n_labels)
+
+    def _allocate(self, capacity, n_labels):
+        """Move the buckets into arrays with the given capacity and label count."""
+        size = self.size
+        arrays = {
+            "keys": np.zeros(capacity, dtype=np.int64),
+            "count": np.zeros(capacity, dtype=np.int64),
+            "duration_sum": np.zeros(capacity),
+            "dominant": np.zeros((capacity, n_labels), dtype=np.int64),
+            "pct_sum": np.zeros((capacity, n_labels)),
+            "pct_count": np.zeros((capacity, n_labels), dtype=np.int64)
+        }
+        if size and hasattr(self, "keys"):
+            for name, array in arrays.items():
+                old = getattr(self, name)
+                if old.ndim == 2:
+                    array[:size, :old.shape[1]] = old[:size]
+                else:
+                    array[:size] = old[:size]
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self.n_labels = n_labels
+
+    def fold(self, columns, n_labels):
+        """
+        Add a block of rows to their buckets.
+
+        Args:
+            columns: Arrays returned by SessionLog.read_columns()
+            n_labels: Number of labels in the log's label list
+        """
+        timestamps = np.asarray(columns["timestamp"])
+        if len(timestamps) == 0:
+            return
+
+        # Aggregate the block per bucket first
+        self.merge(self._aggregate(timestamps, columns, n_labels), n_labels)
+
+    def _aggregate(self, timestamps, columns, n_labels):
+        """Aggregate a block of rows per bucket, shaped like the arrays of select()."""
+        keys, inverse = np.unique(timestamps // self.width_us * self.width_us, return_inverse=True)
+        inverse = inverse.ravel()
+        nb = len(keys)
+        block = {
+            "keys": keys,
+            "count": np.bincount(inverse, minlength=nb),
+            "duration_sum": np.bincount(inverse, weights=columns["duration_seconds"], minlength=nb),
+            "dominant": np.bincount(
+                inverse * n_labels + np.asarray(columns["dominant_emotion"]),
+                minlength=nb * n_labels
+            ).reshape(nb, n_labels),
+            "pct_sum": np.zeros((nb, n_labels)),
+            "pct_count": np.zeros((nb, n_labels), dtype=np.int64)
+        }
+        for j, values in enumerate(columns["percentages"]):
+            values = np.asarray(values)
+            present = ~np.isnan(values)
+            block["pct_sum"][:, j] = np.bincount(inverse[present], weights=values[present], minlength=nb)
+            block["pct_count"][:, j] = np.bincount(inverse[present], minlength=nb)
+        return block
+
+    def merge(self, block, n_labels):
+        """
+        Add per-bucket totals to the rollup.
+
+        Args:
+            block: Dictionary of arrays shaped like the result of select(),
+                with sorted, distinct bucket keys
+            n_labels: Number of labels in the log's label list
+        """
+        keys = block["keys"]
+        if len(keys) == 0:
+            return
+        if n_labels > self.n_labels:
+            self._allocate(len(self.keys), n_labels)
+
+        # Add into buckets that already exist
+        current = self.keys[:self.size]
+        positions = np.searchsorted(current, keys)
+        exists = positions < self.size
+        exists[exists] = current[positions[exists]] == keys[exists]
+        if exists.any():
+            rows = positions[exists]
+            for name in self._FIELDS[1:]:
+                target = getattr(self, name)
+                values = block[name][exists]
+                if target.ndim == 2:
+                    target[rows, :n_labels] += values
+                else:
+                    target[rows] += values
+
+        new = ~exists
+        if not new.any():
+            return
+        added = {name: values[new] for name, values in block.items()}
+        count = len(added["keys"])
+        if self.size == 0 or added["keys"][0] > self.keys[self.size - 1]:
+            # Common case: rows arrive in time order and only open new buckets
+            if self.size + count > len(self.keys):
+                self._allocate(max(2 * len(self.keys), self.size + count), self.n_labels)
+            for name, values in added.items():
+                target = getattr(self, name)
+                if target.ndim == 2:
+                    target[self.size:self.size + count, :n_labels] = values
+                else:
+                    target[self.size:self.size + count] = values
+        else:
+            # Late rows opened buckets in the middle; rebuild the arrays
+            positions = positions[new]
+            for name, values in added.items():
+                target = getattr(self, name)[:self.size]
+                if target.ndim == 2 and values.shape[1] < target.shape[1]:
+                    values = np.pad(values, ((0, 0), (0, target.shape[1] - values.shape[1])))
+                setattr(self, name, np.insert(target, positions, values, axis=0))
+        self.size += count
+
+    def select(self, start_us=None, end_us=None):
+        """
+        Return the buckets overlapping start_us <= t < end_us.
+
+        Returns:
+            Dictionary of arrays, one entry per bucket in time order
+        """
+        keys = self.keys[:self.size]
+        lo = 0 if start_us is None else \
+            int(np.searchsorted(keys, start_us // self.width_us * self.width_us, side="left"))
+        hi = self.size if end_us is None else int(np.searchsorted(keys, end_us, side="left"))
+        return {name: getattr(self, name)[lo:max(lo, hi)] for name in self._FIELDS}
+
+    def drop_before(self, cutoff_us):
+        """
+        Forget the buckets that end before a time.
+
+        Args:
+            cutoff_us: Buckets starting before the one containing this time are dropped
+        """
+        drop = int(np.searchsorted(self.keys[:self.size], cutoff_us // self.width_us * self.width_us))
+        if drop == 0:
+            return
+        for name in self._FIELDS:
+            array = getattr(self, name)
+            array[:self.size - drop] = array[drop:self.size]
+        self.size -= drop
+
+    def to_arrays(self, prefix):
+        """Return the buckets as arrays named for np.savez()."""
+        return {f"{prefix}.{name}": getattr(self, name)[:self.size] for name in self._FIELDS}
+
+    def load_arrays(self, arrays, prefix):
+        """Restore buckets saved with to_arrays()."""
+        for name in self._FIELDS:
+            setattr(self, name, np.array(arrays[f"{prefix}.{name}"]))
+        self.size = len(self.keys)
+        self.n_labels = self.dominant.shape[1]
+
+
+class EmotionAggregates:
+    """
+    Running aggregates over the emotion session log.
+
+    The aggregates remember how many rows of the log they have folded in
+    and only read rows appended since then, so each refresh costs
+    O(new rows) and serving statistics costs O(1). Rows written by other
+    processes are picked up the same way. Totals are also kept per
+    camera, so per-camera statistics are O(1) as well; time-range and
+    bucketed queries for one camera read the rows in the range and filter
+    them. The state is persisted as a
+    small JSON snapshot (plus an .npz file with the time bucket rollups)
+    and rebuilt when the snapshot is missing or belongs to an older
+    generation of the log. A rebuild starts from the log's per-day
+    rollups of compacted segments and only reads the raw rows after them,
+    plus the retained raw rows for the minute and hour buckets.
+
+    Totals and day buckets cover every session ever logged; time-range
+    queries, minute/hour buckets and per-camera buckets only cover the
+    raw rows the log still retains.
+    """
+
+    def __init__(self, session_log, snapshot_path, snapshot_interval=5.0):
+        """
+        Initialize the aggregates.
+
+        Args:
+            session_log: SessionLog to aggregate
+            snapshot_path: Path of the JSON snapshot file
+            snapshot_interval: Minimum seconds between snapshot writes
+        """
+        self.session_log = session_log
+        self.snapshot_path = snapshot_path
+        self.rollup_path = os.path.splitext(snapshot_path)[0] + ".rollups.npz"
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.Lock()
+        self._last_snapshot_time = 0
+        self._dirty = False
+        self._retained_from = None
+        self.meta = None
+        self.rollups = {name: BucketRollup(width) for name, width in BUCKET_WIDTHS.items()}
+        self._reset(None)
+        self._load_snapshot()
+
+    @property
+    def count(self):
+        """Number of log rows folded into the aggregates."""
+        return self.totals.count
+
+    def _reset(self, generation):
+        """Forget all aggregated rows (lock must be held)."""
+        self.generation = generation
+        self.labels = []
+        self.cameras = []
+        self.totals = SessionTotals()
+        self.camera_totals = {}
+        for rollup in self.rollups.values():
+            rollup.reset()
+
+    def refresh(self):
+        """
+        Catch up with rows appended to the log since the last refresh.
+        Starts over if the log was cleared, or if retention deleted rows
+        that were never folded in.
+        """
+        with self._lock:
+            meta = self.session_log.read_meta()
+            rows = self.session_log.row_count(meta)
+            self.meta = meta
+            self.labels = meta["labels"]
+            self.cameras = meta["cameras"]
+
+            if meta["generation"] != self.generation or rows < self.count or \
+                    self.count < self.session_log.first_row(meta):
+                self._reset(meta["generation"])
+                self.labels = meta["labels"]
+                self.cameras = meta["cameras"]
+                self._load_rollups(meta)
+                self._dirty = True
+
+            # Retention deleted every row older than retained_from. Only drop
+            # buckets when that changes, and before folding new rows, so late
+            # rows with older timestamps aren't dropped with them.
+            retained_from = meta.get("retained_from")
+            if retained_from is not None and retained_from != self._retained_from:
+                for name in FINE_BUCKETS:
+                    self.rollups[name].drop_before(retained_from)
+                self._retained_from = retained_from
+                self._dirty = True
+
+            if rows > self.count:
+                columns = self.session_log.read_columns(self.count, rows, meta)
+                self._fold(columns, meta["labels"])
+
+            self._maybe_save_snapshot()
+
+    def _load_rollups(self, meta):
+        """
+        Start the aggregates from the log's per-day rollups (lock must be held).
+        The totals then cover the compacted rows, and the minute and hour
+        buckets are filled from the compacted rows that are still retained.
+
+        Args:
+            meta: Metadata from SessionLog.read_meta()
+        """
+        rollups = self.session_log.read_rollups(meta)
+        if not rollups["rows"]:
+            return
+        first_row = self.session_log.first_row(meta)
+        if rollups["rows"] > first_row:
+            columns = self.session_log.read_columns(first_row, rollups["rows"], meta)
+            for name in FINE_BUCKETS:
+                self.rollups[name].fold(columns, len(self.labels))
+
+        position = {label: i for i, label in enumerate(self.labels)}
+        days = sorted(rollups["days"])
+        n_labels = len(self.labels)
+        block = {
+            "keys": np.array([to_epoch_us(day) for day in days], dtype=np.int64),
+            "count": np.zeros(len(days), dtype=np.int64),
+            "duration_sum": np.zeros(len(days)),
+            "dominant": np.zeros((len(days), n_labels), dtype=np.int64),
+            "pct_sum": np.zeros((len(days), n_labels)),
+            "pct_count": np.zeros((len(days), n_labels), dtype=np.int64)
+        }
+        for i, day in enumerate(days):
+            for camera, totals in rollups["days"][day].items():
+                self.totals.merge(totals)
+                self.camera_totals.setdefault(camera, SessionTotals()).merge(totals)
+                block["count"][i] += totals["count"]
+                block["duration_sum"][i] += totals["duration_sum"]
+                for label, value in totals["dominant_counts"].items():
+                    block["dominant"][i, position[label]] += value
+                for label, value in totals["percentage_sums"].items():
+                    block["pct_sum"][i, position[label]] += value
+                    block["pct_count"][i, position[label]] += totals["percentage_counts"][label]
+        self.rollups["day"].merge(block, n_labels)
+
+    def _fold(self, columns, labels):
+        """
+        Fold a block of rows into the aggregates (lock must be held).
+
+        Args:
+            columns: Arrays returned by SessionLog.read_columns()
+            labels: Emotion labels indexed by the dominant/percentage columns
+        """
+        for rollup in self.rollups.values():
+            rollup.fold(columns, len(labels))
+        self.totals.fold(columns, labels)
+        for i in np.unique(columns["camera"]):
+            camera = self.cameras[i]
+            totals = self.camera_totals.setdefault(camera, SessionTotals())
+            totals.fold(select_rows(columns, columns["camera"] == i), labels)
+        self._dirty = True
+
+    def to_response(self, camera=None):
+        """
+        Build the statistics payload served by /api/emotion_stats.
+
+        Args:
+            camera: Only count sessions recorded by this camera id
+
+        Returns:
+            Dictionary with the same fields as the original endpoint
+        """
+        with self._lock:
+            totals = self.totals if camera is None else self.camera_totals.get(camera, SessionTotals())
+            return {"status": "ok", **totals.to_stats()}
+
+    def group_by_camera(self, start_us=None, end_us=None):
+        """
+        Compute statistics separately for every camera.
+
+        Args:
+            start_us: Optional inclusive lower time bound
+            end_us: Optional exclusive upper time bound
+
+        Returns:
+            Dictionary with a "cameras" object mapping each camera id to
+            the fields of to_response()
+        """
+        with self._lock:
+            if start_us is None and end_us is None:
+                groups = {camera: totals.to_stats() for camera, totals in self.camera_totals.items()}
+            else:
+                columns = self._range_columns(start_us, end_us)
+                groups = {}
+                for i in np.unique(columns["camera"]):
+                    totals = SessionTotals()
+                    totals.fold(select_rows(columns, columns["camera"] == i), self.labels)
+                    groups[self.cameras[i]] = totals.to_stats()
+            return {"status": "ok", "cameras": groups, "is_empty": not groups}
+
+    def query_range(self, start_us=None, end_us=None, camera=None):
+        """
+        Compute statistics over the sessions logged in a time range.
+        Only the rows inside the range are read.
+
+        Args:
+            start_us: Inclusive lower bound in local wall-clock microseconds
+            end_us: Exclusive upper bound in local wall-clock microseconds
+            camera: Only count sessions recorded by this camera id
+
+        Returns:
+            Dictionary with the same fields as to_response()
+        """
+        with self._lock:
+            columns = self._range_columns(start_us, end_us, camera)
+            totals = SessionTotals()
+            totals.fold(columns, self.labels)
+            return {"status": "ok", **totals.to_stats()}
+
+    def _range_columns(self, start_us, end_us, camera=None):
+        """
+        Read the rows in a time range, optionally of one camera only (lock must be held).
+
+        Returns:
+            Dictionary shaped like SessionLog.read_columns()
+        """
+        meta = self.meta if self.meta is not None else self.session_log.read_meta()
+        columns = self.session_log.read_range(meta, start_us, end_us, stop=self.count)
+        if camera is not None:
+            index = self.cameras.index(camera) if camera in self.cameras else -1
+            columns = select_rows(columns, np.asarray(columns["camera"]) == index)
+        return columns
+
+    def query_buckets(self, bucket, start_us=None, end_us=None, camera=None):
+        """
+        Compute statistics per time bucket.
+
+        Args:
+            bucket: Granularity, one of BUCKET_WIDTHS
+            start_us: Only include buckets ending after this time
+            end_us: Only include buckets starting before this time
+            camera: Only count sessions recorded by this camera id; the
+                buckets are then built from the rows in the range
+
+        Returns:
+            Dictionary with a "buckets" list holding, per non-empty bucket,
+            its start time and the same fields as to_response()
+        """
+        with self._lock:
+            if camera is None:
+                selected = self.rollups[bucket].select(start_us, end_us)
+            else:
+                width = BUCKET_WIDTHS[bucket]
+                # Widen the range to whole buckets, like the shared rollups do
+                lower = None if start_us is None else start_us // width * width
+                rollup = BucketRollup(width)
+                rollup.fold(self._range_columns(lower, end_us, camera), len(self.labels))
+                selected = rollup.select()
+            buckets = []
+            for i, key in enumerate(selected["keys"]):
+                dominant = {
+                    self.labels[j]: int(selected["dominant"][i, j])
+                    for j in np.flatnonzero(selected["dominant"][i])
+                }
+                present = np.flatnonzero(selected["pct_count"][i])
+                stats = build_stats(
+                    int(selected["count"][i]),
+                    float(selected["duration_sum"][i]),
+                    dominant,
+                    {self.labels[j]: float(selected["pct_sum"][i, j]) for j in present},
+                    {self.labels[j]: int(selected["pct_count"][i, j]) for j in present}
+                )
+                del stats["is_empty"]
+                buckets.append({"start": from_epoch_us(key).isoformat(), **stats})
+            return {
+                "status": "ok",
+                "bucket": bucket,
+                "buckets": buckets,
+                "is_empty": not buckets
+            }
+
+    def save_snapshot(self):
+        """Persist the aggregates to the snapshot file."""
+        with self._lock:
+            self._save_snapshot()
+
+    def _maybe_save_snapshot(self):
+        """Save the snapshot if it is stale and the interval has passed (lock must be held)."""
+        if self._dirty and time.time() - self._last_snapshot_time >= self.snapshot_interval:
+            self._save_snapshot()
+
+    def _save_snapshot(self):
+        """Write the snapshot files atomically (lock must be held)."""
+        snapshot = {
+            "generation": self.generation,
+            "count": self.totals.count,
+            "duration_sum": self.totals.duration_sum,
+            "dominant_counts": self.totals.dominant_counts,
+            "percentage_sums": self.totals.percentage_sums,
+            "percentage_counts": self.totals.percentage_counts,
+            "labels": self.labels,
+            "cameras": self.cameras,
+            "camera_totals": {camera: totals.as_dict() for camera, totals in self.camera_totals.items()}
+        }
+        arrays = {
+            "generation": np.array(self.generation or ""),
+            "count": np.array(self.totals.count)
+        }
+        for name, rollup in self.rollups.items():
+            arrays.update(rollup.to_arrays(name))
+
+        suffix = f".{os.getpid()}.tmp"
+        try:
+            # The rollups go first: the JSON snapshot is only trusted if they match it
+            with open(self.rollup_path + suffix, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(self.rollup_path + suffix, self.rollup_path)
+            with open(self.snapshot_path + suffix, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(self.snapshot_path + suffix, self.snapshot_path)
+            self._dirty = False
+            self._last_snapshot_time = time.time()
+        except OSError as e:
+            logger.warning(f"Could not save stats snapshot: {e}")
+
+    def _load_snapshot(self):
+        """Restore the aggregates from the snapshot files if they match the log."""
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            with np.load(self.rollup_path) as arrays:
+                rollups = dict(arrays)
+            meta = self.session_log.read_meta()
+        except (OSError, ValueError):
+            return
+
+        # A snapshot of a cleared or truncated log is useless; rebuild instead
+        if snapshot.get("generation") != meta["generation"] or "camera_totals" not in snapshot:
+            return
+        if snapshot.get("count", 0) > self.session_log.row_count(meta):
+            return
+        if str(rollups.get("generation")) != snapshot["generation"] or \
+                int(rollups.get("count", -1)) != snapshot["count"]:
+            return
+        if any(f"{name}.keys" not in rollups for name in self.rollups):
+            return
+
+        with self._lock:
+            self.generation = snapshot["generation"]
+            self.labels = snapshot["labels"]
+            self.cameras = snapshot["cameras"]
+            self.camera_totals = {
+                camera: SessionTotals.from_dict(totals) for camera, totals in snapshot["camera_totals"].items()
+            }
+            self.totals.count = snapshot["count"]
+            self.totals.duration_sum = snapshot["duration_sum"]
+            self.totals.dominant_counts = snapshot["dominant_counts"]
+            self.totals.percentage_sums = snapshot["percentage_sums"]
+            self.totals.percentage_counts = snapshot["percentage_counts"]
+            for name, rollup in self.rollups.items():
+                rollup.load_arrays(rollups, name)
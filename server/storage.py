@@ -0,0 +1,978 @@
+"""
+Storage utilities for Affectra application.
+Provides an append-only, lock-protected columnar store for emotion sessions.
+
+Each session is stored as one row spread over fixed-width binary column
+files that can be memory-mapped as NumPy arrays:
+
+    timestamp.i8          local wall-clock time in microseconds since 1970
+    duration_seconds.f8   session duration
+    dominant_emotion.i4   index of the dominant emotion in the label list
+    camera.i4             index of the recording camera in the camera list
+    pct_<index>.f8        one column per emotion label, NaN when absent
+
+Rows are split into segments, one directory of column files each under
+segments/. New rows go to the newest segment, which is sealed and
+replaced once it grows too large or too old. Sealed segments are
+compacted into per-day, per-camera totals in rollups.json, and segments
+past the retention period are deleted, so the totals outlive the raw rows.
+
+The label list, the camera list, the segment list and a generation id
+(changed whenever the store is cleared) live in meta.json.
+"""
+
+import json
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Column layout of the legacy CSV session log
+LOG_COLUMNS = [
+    "timestamp",
+    "duration_seconds",
+    "dominant_emotion",
+    "emotion_percentages"
+]
+
+# Fixed columns of the columnar store and their on-disk types
+TIMESTAMP_COLUMN = ("timestamp.i8", np.dtype("<i8"))
+DURATION_COLUMN = ("duration_seconds.f8", np.dtype("<f8"))
+DOMINANT_COLUMN = ("dominant_emotion.i4", np.dtype("<i4"))
+CAMERA_COLUMN = ("camera.i4", np.dtype("<i4"))
+PERCENT_DTYPE = np.dtype("<f8")
+
+# Segment rotation defaults: seal the newest segment at 64 MiB or after a day
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_SEGMENT_SECONDS = 86400
+
+DAY_US = 86400 * 1000000
+
+# Camera of summaries that don't name one (single-camera setups, older
+# clients and sessions stored before cameras were recorded)
+DEFAULT_CAMERA_ID = "default"
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_us(value):
+    """
+    Convert a timestamp to local wall-clock microseconds since 1970.
+
+    Args:
+        value: ISO formatted string or datetime; aware values are converted
+            to local time first
+
+    Returns:
+        Integer number of microseconds
+
+    Raises:
+        ValueError: If value is neither an ISO formatted string nor a datetime
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        raise ValueError(f"Expected an ISO formatted timestamp, got {type(value).__name__}")
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_epoch_us(us):
+    """
+    Convert local wall-clock microseconds back to a naive datetime.
+
+    Args:
+        us: Integer number of microseconds since 1970
+
+    Returns:
+        datetime object
+    """
+    return _EPOCH + timedelta(microseconds=int(us))
+
+
+def normalize_summary(data):
+    """
+    Convert a session summary received from a client into a store record.
+
+    Args:
+        data: Dictionary with timestamp, duration_seconds, dominant_emotion,
+            emotion_percentages and optionally camera_id
+
+    Returns:
+        Dictionary with typed values ready for SessionLog.append()
+
+    Raises:
+        ValueError: If a field has the wrong type or format
+    """
+    percentages = data.get("emotion_percentages") or {}
+    if not isinstance(percentages, dict):
+        raise ValueError("emotion_percentages must be an object")
+    try:
+        record = {
+            "timestamp": to_epoch_us(data.get("timestamp") or datetime.now()),
+            "duration_seconds": float(data.get("duration_seconds", 0)),
+            "dominant_emotion": str(data.get("dominant_emotion", "unknown")),
+            "emotion_percentages": {str(k): float(v) for k, v in percentages.items()},
+            "camera_id": str(data.get("camera_id") or DEFAULT_CAMERA_ID)
+        }
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid session summary: {e}")
+    # float() accepts "nan", "Infinity" and overflowing literals, which would
+    # poison every total they are added to
+    if not math.isfinite(record["duration_seconds"]):
+        raise ValueError("Invalid session summary: duration_seconds must be a finite number")
+    if not all(math.isfinite(value) for value in record["emotion_percentages"].values()):
+        raise ValueError("Invalid session summary: emotion_percentages must be finite numbers")
+    return record
+
+
+def summarize_days(columns, labels, cameras):
+    """
+    Total a block of rows per local day and camera.
+
+    Args:
+        columns: Arrays returned by SessionLog.read_columns()
+        labels: Emotion labels indexed by the dominant/percentage columns
+        cameras: Camera ids indexed by the camera column
+
+    Returns:
+        Dict of ISO date -> camera id -> totals, each a dict with count,
+        duration_sum, dominant_counts, percentage_sums and
+        percentage_counts (the fields of stats.SessionTotals)
+    """
+    timestamps = np.asarray(columns["timestamp"])
+    if len(timestamps) == 0:
+        return {}
+    n_cameras = max(len(cameras), 1)
+    n_labels = len(labels)
+    keys, inverse = np.unique(timestamps // DAY_US * n_cameras + np.asarray(columns["camera"]),
+                              return_inverse=True)
+    inverse = inverse.ravel()
+    groups = len(keys)
+    counts = np.bincount(inverse, minlength=groups)
+    durations = np.bincount(inverse, weights=columns["duration_seconds"], minlength=groups)
+    dominant = np.bincount(inverse * n_labels + np.asarray(columns["dominant_emotion"]),
+                           minlength=groups * n_labels).reshape(groups, n_labels)
+    pct_sums = np.zeros((groups, n_labels))
+    pct_counts = np.zeros((groups, n_labels), dtype=np.int64)
+    for j, values in enumerate(columns["percentages"]):
+        values = np.asarray(values)
+        present = ~np.isnan(values)
+        pct_sums[:, j] = np.bincount(inverse[present], weights=values[present], minlength=groups)
+        pct_counts[:, j] = np.bincount(inverse[present], minlength=groups)
+
+    days = {}
+    for g, key in enumerate(keys):
+        day, camera = divmod(int(key), n_cameras)
+        present = np.flatnonzero(pct_counts[g])
+        days.setdefault(from_epoch_us(day * DAY_US).date().isoformat(), {})[cameras[camera]] = {
+            "count": int(counts[g]),
+            "duration_sum": float(durations[g]),
+            "dominant_counts": {labels[j]: int(dominant[g, j]) for j in np.flatnonzero(dominant[g])},
+            "percentage_sums": {labels[j]: float(pct_sums[g, j]) for j in present},
+            "percentage_counts": {labels[j]: int(pct_counts[g, j]) for j in present}
+        }
+    return days
+
+
+def select_rows(columns, mask):
+    """
+    Keep the rows of a column block where mask is true.
+
+    Args:
+        columns: Arrays returned by SessionLog.read_columns()
+        mask: Boolean array with one entry per row
+
+    Returns:
+        Dictionary shaped like columns
+    """
+    return {
+        name: [values[mask] for values in arrays] if name == "percentages" else arrays[mask]
+        for name, arrays in columns.items()
+    }
+
+
+def merge_totals(target, totals):
+    """
+    Add one set of totals into another.
+
+    Args:
+        target: Totals dict (shaped like the values of summarize_days()) updated in place
+        totals: Totals dict to add
+    """
+    target["count"] += totals["count"]
+    target["duration_sum"] += totals["duration_sum"]
+    for field in ("dominant_counts", "percentage_sums", "percentage_counts"):
+        values = target[field]
+        for label, value in totals[field].items():
+            values[label] = values.get(label, 0) + value
+
+
+class RowsDeletedError(RuntimeError):
+    """Rows being read were deleted by clear() or retention in the meantime."""
+
+
+class FileLock:
+    """
+    Exclusive lock shared between threads and processes.
+    Backed by an OS-level lock on a sidecar lock file, so every process
+    writing to the same log serializes on it.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the lock.
+
+        Args:
+            path: Path of the lock file (created on first use)
+        """
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self):
+        """Block until the lock is held by the calling thread."""
+        self._thread_lock.acquire()
+        try:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        except Exception:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        """Release the lock."""
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class _CommitTicket:
+    """Rows of one append() call waiting to be committed."""
+
+    __slots__ = ("rows", "done", "error")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = False
+        self.error = None
+
+
+class SessionLog:
+    """
+    Append-only, segmented columnar log of emotion sessions.
+
+    Appends never read or rewrite existing rows, so their cost does not
+    depend on the size of the log. Concurrent appends are group-committed:
+    while one thread writes and fsyncs a batch, rows from other threads
+    queue up and are written together by the next committer. A
+    cross-process file lock keeps writers in other processes from
+    interleaving with ours.
+
+    Columns are appended one after another, so readers take the shortest
+    column as the committed row count and never see a half-written row.
+
+    Row numbers are global and never reused: segment i holds the rows
+    from its "start_row" on, and rows of deleted segments simply no
+    longer exist. Sealed segments record their row count and timestamp
+    range in meta.json, so time-range reads skip segments outside the range.
+    """
+
+    def __init__(self, path, durable=True, segment_bytes=DEFAULT_SEGMENT_BYTES,
+                 segment_seconds=DEFAULT_SEGMENT_SECONDS, retention_days=None):
+        """
+        Initialize the log.
+
+        Args:
+            path: Directory holding the store
+            durable: Whether to fsync after every committed batch
+            segment_bytes: Size at which the newest segment is sealed
+            segment_seconds: Age at which the newest segment is sealed
+            retention_days: Days raw rows are kept once compacted into
+                rollups; None keeps them forever
+        """
+        self.path = path
+        self.durable = durable
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.retention_days = retention_days
+        os.makedirs(path, exist_ok=True)
+        self.lock = FileLock(os.path.join(path, ".lock"))
+
+        # Group commit state
+        self._cond = threading.Condition()
+        self._pending = []
+        self._committing = False
+
+    def ensure_exists(self):
+        """
+        Create an empty store if it doesn't exist yet, or upgrade an old
+        one, then compact and expire segments that are due.
+        """
+        with self.lock:
+            if not os.path.exists(self._meta_path()):
+                self._write_meta(self._empty_meta())
+            self.maintain(self._upgrade(self.read_meta()))
+
+    def read_meta(self):
+        """
+        Read the store metadata.
+
+        Returns:
+            Dictionary with the generation id, the emotion label and
+            camera lists and the segment list
+        """
+        with open(self._meta_path(), encoding="utf-8") as f:
+            return json.load(f)
+
+    def read_rollups(self, meta=None):
+        """
+        Read the per-day totals of the compacted segments.
+
+        Args:
+            meta: Metadata from read_meta(); read from disk if omitted
+
+        Returns:
+            Dictionary with "rows", the number of leading rows the totals
+            cover, and "days", mapping ISO dates to camera ids to totals
+            (see summarize_days())
+        """
+        if meta is None:
+            meta = self.read_meta()
+        try:
+            with open(self._rollups_path(), encoding="utf-8") as f:
+                rollups = json.load(f)
+        except FileNotFoundError:
+            rollups = None
+        if rollups is None or rollups.get("generation") != meta["generation"]:
+            return {"generation": meta["generation"], "rows": 0, "days": {}}
+        return rollups
+
+    def first_row(self, meta):
+        """Return the first row not yet deleted by retention."""
+        return meta["segments"][0]["start_row"]
+
+    def row_count(self, meta=None):
+        """
+        Return the number of rows ever committed (including deleted ones).
+
+        Args:
+            meta: Metadata from read_meta(); read from disk if omitted
+        """
+        if meta is None:
+            meta = self.read_meta()
+        active = meta["segments"][-1]
+        return active["start_row"] + self._segment_length(self._segment_dir(active), meta)
+
+    def read_columns(self, start, stop, meta):
+        """
+        Read a range of rows as NumPy arrays.
+        Rows deleted by retention are left out.
+
+        Args:
+            start: First row to read
+            stop: Row after the last one to read
+            meta: Metadata from read_meta() used to compute the row count
+
+        Returns:
+            Dictionary with "timestamp", "duration_seconds",
+            "dominant_emotion" and "camera" arrays plus "percentages", a
+            list with one array per label in meta["labels"]
+        """
+        blocks = []
+        for segment, lo, hi in self._spans(start, stop, meta):
+            blocks.append(self._read_segment(segment, lo, hi, meta))
+        return self._concat(blocks, meta)
+
+    def read_timestamps(self, start, stop, meta=None):
+        """
+        Read a range of the timestamp column.
+
+        Args:
+            start: First row to read
+            stop: Row after the last one to read
+            meta: Metadata from read_meta(); read from disk if omitted
+
+        Returns:
+            Int64 array of local wall-clock microseconds
+        """
+        if meta is None:
+            meta = self.read_meta()
+        blocks = [self._read_column(self._segment_dir(segment), *TIMESTAMP_COLUMN, lo, hi)
+                  for segment, lo, hi in self._spans(start, stop, meta)]
+        if len(blocks) == 1:
+            return blocks[0]
+        return np.concatenate(blocks) if blocks else np.empty(0, dtype=TIMESTAMP_COLUMN[1])
+
+    def read_range(self, meta, start_us=None, end_us=None, stop=None):
+        """
+        Read the rows with start_us <= timestamp < end_us.
+        Sealed segments outside the range are skipped without being
+        opened; within a segment sorted by time the range is found by
+        binary search, otherwise by a scan of that segment.
+
+        Args:
+            meta: Metadata from read_meta()
+            start_us: Inclusive lower bound, or None for no bound
+            end_us: Exclusive upper bound, or None for no bound
+            stop: Only consider rows below this row number
+
+        Returns:
+            Dictionary shaped like read_columns(), rows in storage order
+        """
+        if stop is None:
+            stop = self.row_count(meta)
+        blocks = []
+        for segment, lo, hi in self._spans(0, stop, meta):
+            if "rows" in segment and ((start_us is not None and segment["max_ts"] < start_us) or
+                                      (end_us is not None and segment["min_ts"] >= end_us)):
+                continue
+            try:
+                timestamps = self._read_column(self._segment_dir(segment), *TIMESTAMP_COLUMN, lo, hi)
+            except FileNotFoundError:
+                # Deleted by retention in another process since meta was read
+                continue
+            if segment.get("sorted"):
+                first = lo if start_us is None else lo + int(np.searchsorted(timestamps, start_us, side="left"))
+                last = hi if end_us is None else lo + int(np.searchsorted(timestamps, end_us, side="left"))
+                if first < last:
+                    blocks.append(self._read_segment(segment, first, last, meta))
+                continue
+            mask = np.ones(len(timestamps), dtype=bool)
+            if start_us is not None:
+                mask &= timestamps >= start_us
+            if end_us is not None:
+                mask &= timestamps < end_us
+            if mask.any():
+                blocks.append(select_rows(self._read_segment(segment, lo, hi, meta), mask))
+        return self._concat(blocks, meta)
+
+    def iter_rows(self, meta, start_us=None, end_us=None, after=None, stop=None, chunk_rows=65536):
+        """
+        Read the rows with start_us <= timestamp < end_us in storage order,
+        one chunk at a time, so memory use doesn't depend on the size of
+        the log. Only the timestamp column of chunks without matching rows is read.
+
+        Args:
+            meta: Metadata from read_meta()
+            start_us: Inclusive lower bound, or None for no bound
+            end_us: Exclusive upper bound, or None for no bound
+            after: Only rows numbered above this one, to resume an earlier read
+            stop: Only rows below this row number; defaults to the committed row count
+            chunk_rows: Rows read at a time
+
+        Yields:
+            Tuples of (row numbers, columns shaped like read_columns()),
+            each with at least one row
+
+        Raises:
+            RowsDeletedError: If a segment still to be read was deleted
+                while iterating, so the rows can't all be returned
+        """
+        if stop is None:
+            stop = self.row_count(meta)
+        start = 0 if after is None else after + 1
+        filtered = start_us is not None or end_us is not None
+        for segment, lo, hi in self._spans(start, stop, meta):
+            if "rows" in segment and ((start_us is not None and segment["max_ts"] < start_us) or
+                                      (end_us is not None and segment["min_ts"] >= end_us)):
+                continue
+            directory = self._segment_dir(segment)
+            for chunk_start in range(lo, hi, chunk_rows):
+                chunk_stop = min(chunk_start + chunk_rows, hi)
+                try:
+                    mask = None
+                    if filtered:
+                        timestamps = self._read_column(directory, *TIMESTAMP_COLUMN, chunk_start, chunk_stop)
+                        mask = np.ones(len(timestamps), dtype=bool)
+                        if start_us is not None:
+                            mask &= timestamps >= start_us
+                        if end_us is not None:
+                            mask &= timestamps < end_us
+                        if not mask.any():
+                            continue
+                    columns = self._read_segment(segment, chunk_start, chunk_stop, meta)
+                except FileNotFoundError as e:
+                    # Deleted while we were reading; stopping quietly would
+                    # pass off the rows read so far as the complete result
+                    first = segment["start_row"] + chunk_start
+                    if self.read_meta()["generation"] != meta["generation"]:
+                        raise RowsDeletedError(f"The store was cleared while reading row {first}") from e
+                    raise RowsDeletedError(f"Rows from {first} on expired while being read") from e
+                rows = np.arange(chunk_start, chunk_stop) + segment["start_row"]
+                if mask is None or mask.all():
+                    yield rows, columns
+                else:
+                    yield rows[mask], select_rows(columns, mask)
+
+    def append(self, records):
+        """
+        Append records to the log and wait until they are committed.
+
+        Args:
+            records: List of dictionaries produced by normalize_summary()
+
+        Raises:
+            OSError: If the batch containing these records could not be written
+        """
+        ticket = _CommitTicket(records)
+        with self._cond:
+            self._pending.append(ticket)
+            while not ticket.done:
+                if self._committing:
+                    # Another thread is committing; our rows go in the next batch
+                    self._cond.wait()
+                    continue
+
+                # Become the committer for everything queued so far
+                batch, self._pending = self._pending, []
+                self._committing = True
+                self._cond.release()
+                try:
+                    error = None
+                    try:
+                        self._write_batch([row for pending in batch for row in pending.rows])
+                    except Exception as e:
+                        error = e
+                finally:
+                    self._cond.acquire()
+                    self._committing = False
+                for pending in batch:
+                    pending.error = error
+                    pending.done = True
+                self._cond.notify_all()
+
+        if ticket.error is not None:
+            raise ticket.error
+
+    def clear(self):
+        """Remove all rows and rollups from the log and start a new generation."""
+        with self.lock:
+            meta = self.read_meta()
+            # Publish the new, empty generation first; readers still holding
+            # the old metadata keep reading old segments until they're gone
+            self._write_meta(self._empty_meta(meta["segments"][-1]["id"] + 1))
+            if os.path.exists(self._rollups_path()):
+                os.remove(self._rollups_path())
+            for segment in meta["segments"]:
+                shutil.rmtree(self._segment_dir(segment), ignore_errors=True)
+
+    def maintain(self, meta=None):
+        """
+        Compact sealed segments into rollups and delete expired ones.
+        Runs on startup and whenever a segment is sealed.
+
+        Args:
+            meta: Metadata read with the lock held; the lock is taken and
+                the metadata read if omitted
+
+        Returns:
+            The up-to-date metadata
+        """
+        if meta is None:
+            with self.lock:
+                return self.maintain(self.read_meta())
+        rollups = self._compact(meta)
+        meta = self._expire(meta, rollups["rows"])
+        self._remove_orphans(meta)
+        return meta
+
+    def _write_batch(self, rows):
+        """
+        Write rows to the end of every column of the newest segment (takes
+        the file lock), sealing it first if it is full or too old.
+
+        Args:
+            rows: List of store records
+        """
+        if not rows:
+            return
+        with self.lock:
+            meta = self._upgrade(self.read_meta())
+            directory = self._segment_dir(meta["segments"][-1])
+            count = self._repair(directory, meta)
+            if count and self._segment_due(meta, count):
+                meta = self.maintain(self._seal(meta, count))
+                directory = self._segment_dir(meta["segments"][-1])
+                count = 0
+
+            # Register new labels, backfilling their columns with NaN
+            labels = meta["labels"]
+            index = {label: i for i, label in enumerate(labels)}
+            new_labels = []
+            for row in rows:
+                for label in [row["dominant_emotion"], *row["emotion_percentages"]]:
+                    if label not in index:
+                        index[label] = len(labels) + len(new_labels)
+                        new_labels.append(label)
+            if new_labels:
+                for label in new_labels:
+                    column = np.full(count, np.nan, dtype=PERCENT_DTYPE)
+                    self._write_column(directory, self._percent_column(index[label]), column, "wb")
+                meta = {**meta, "labels": labels + new_labels}
+
+            # Register new cameras; every row names one, so no backfill
+            cameras = {camera: i for i, camera in enumerate(meta["cameras"])}
+            new_cameras = []
+            for row in rows:
+                camera = row.get("camera_id", DEFAULT_CAMERA_ID)
+                if camera not in cameras:
+                    cameras[camera] = len(cameras)
+                    new_cameras.append(camera)
+            if new_cameras:
+                meta = {**meta, "cameras": meta["cameras"] + new_cameras}
+            if new_labels or new_cameras:
+                self._write_meta(meta)
+
+            # Build every column for the batch in memory
+            n = len(rows)
+            timestamps = np.fromiter((row["timestamp"] for row in rows), TIMESTAMP_COLUMN[1], n)
+            durations = np.fromiter((row["duration_seconds"] for row in rows), DURATION_COLUMN[1], n)
+            dominant = np.fromiter((index[row["dominant_emotion"]] for row in rows), DOMINANT_COLUMN[1], n)
+            camera = np.fromiter((cameras[row.get("camera_id", DEFAULT_CAMERA_ID)] for row in rows),
+                                 CAMERA_COLUMN[1], n)
+            percentages = np.full((len(meta["labels"]), n), np.nan, dtype=PERCENT_DTYPE)
+            for j, row in enumerate(rows):
+                for label, value in row["emotion_percentages"].items():
+                    percentages[index[label], j] = value
+
+            self._write_column(directory, TIMESTAMP_COLUMN[0], timestamps, "ab")
+            self._write_column(directory, DURATION_COLUMN[0], durations, "ab")
+            self._write_column(directory, DOMINANT_COLUMN[0], dominant, "ab")
+            self._write_column(directory, CAMERA_COLUMN[0], camera, "ab")
+            for i, column in enumerate(percentages):
+                self._write_column(directory, self._percent_column(i), column, "ab")
+
+    def _segment_due(self, meta, count):
+        """Whether the newest segment, holding count rows, should be sealed."""
+        row_bytes = sum(dtype.itemsize for _, dtype in self._columns(meta))
+        age = time.time() - meta["segments"][-1]["created"]
+        return count * row_bytes >= self.segment_bytes or age >= self.segment_seconds
+
+    def _seal(self, meta, count):
+        """
+        Seal the newest segment and open an empty one after it (lock must be held).
+
+        Args:
+            meta: Current metadata
+            count: Committed rows of the newest segment
+
+        Returns:
+            The updated metadata
+        """
+        active = meta["segments"][-1]
+        timestamps = np.asarray(self._read_column(self._segment_dir(active), *TIMESTAMP_COLUMN, 0, count))
+        sealed = {
+            **active,
+            "rows": count,
+            "min_ts": int(timestamps.min()),
+            "max_ts": int(timestamps.max()),
+            "sorted": bool(np.all(timestamps[1:] >= timestamps[:-1]))
+        }
+        opened = {"id": active["id"] + 1, "start_row": active["start_row"] + count, "created": time.time()}
+        os.makedirs(self._segment_dir(opened), exist_ok=True)
+        meta = {**meta, "segments": meta["segments"][:-1] + [sealed, opened]}
+        self._write_meta(meta)
+        return meta
+
+    def _compact(self, meta):
+        """
+        Add the sealed segments not yet in rollups.json to it (lock must be held).
+        The file is replaced after every segment, so the rows it covers
+        always end at a segment boundary.
+
+        Returns:
+            The up-to-date rollups
+        """
+        rollups = self.read_rollups(meta)
+        for segment in meta["segments"]:
+            if "rows" not in segment or segment["start_row"] + segment["rows"] <= rollups["rows"]:
+                continue
+            columns = self._read_segment(segment, 0, segment["rows"], meta)
+            for day, cameras in summarize_days(columns, meta["labels"], meta["cameras"]).items():
+                totals = rollups["days"].setdefault(day, {})
+                for camera, values in cameras.items():
+                    if camera in totals:
+                        merge_totals(totals[camera], values)
+                    else:
+                        totals[camera] = values
+            rollups["rows"] = segment["start_row"] + segment["rows"]
+            self._write_json(self._rollups_path(), rollups)
+        return rollups
+
+    def _expire(self, meta, compacted_rows):
+        """
+        Delete the oldest segments whose rows are all older than the
+        retention period and already compacted (lock must be held).
+
+        Args:
+            meta: Current metadata
+            compacted_rows: Leading rows covered by rollups.json
+
+        Returns:
+            The updated metadata
+        """
+        if not self.retention_days:
+            return meta
+        cutoff = to_epoch_us(datetime.now()) - int(self.retention_days * DAY_US)
+        segments = list(meta["segments"])
+        expired = []
+        # Only whole leading segments go, so the remaining rows stay contiguous
+        while len(segments) > 1 and segments[0]["max_ts"] < cutoff and \
+                segments[0]["start_row"] + segments[0]["rows"] <= compacted_rows:
+            expired.append(segments.pop(0))
+        if not expired:
+            return meta
+        meta = {**meta, "segments": segments, "retained_from": self._oldest_timestamp(segments, meta, cutoff)}
+        self._write_meta(meta)
+        for segment in expired:
+            shutil.rmtree(self._segment_dir(segment), ignore_errors=True)
+        return meta
+
+    def _oldest_timestamp(self, segments, meta, default):
+        """
+        Return the oldest timestamp of the rows in segments, which can be
+        older than the retention cutoff: a segment is only deleted once
+        all of its rows have expired (lock must be held).
+
+        Args:
+            segments: Segments that are kept
+            meta: Current metadata
+            default: Value returned if the segments hold no rows
+
+        Returns:
+            Timestamp in microseconds
+        """
+        oldest = [segment["min_ts"] for segment in segments if "rows" in segment]
+        active = segments[-1]
+        if "rows" not in active:
+            directory = self._segment_dir(active)
+            count = self._segment_length(directory, meta)
+            if count:
+                oldest.append(int(np.min(self._read_column(directory, *TIMESTAMP_COLUMN, 0, count))))
+        return min(oldest, default=default)
+
+    def _remove_orphans(self, meta):
+        """Delete segment directories left behind by an interrupted clear or expiry (lock must be held)."""
+        known = {str(segment["id"]) for segment in meta["segments"]}
+        root = os.path.join(self.path, "segments")
+        if not os.path.isdir(root):
+            return
+        for name in os.listdir(root):
+            if name not in known:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def _upgrade(self, meta):
+        """
+        Bring a store written by an older version up to date (lock must be held):
+        add the camera column to a store written before cameras were
+        recorded, assigning existing rows to DEFAULT_CAMERA_ID, and move
+        the columns of an unsegmented store into its first segment.
+
+        Returns:
+            The up-to-date metadata
+        """
+        if "cameras" not in meta:
+            count = self._repair(self.path, meta)
+            self._write_column(self.path, CAMERA_COLUMN[0], np.zeros(count, dtype=CAMERA_COLUMN[1]), "wb")
+            meta = {**meta, "cameras": [DEFAULT_CAMERA_ID] if count else []}
+            self._write_meta(meta)
+        if "segments" not in meta:
+            self._repair(self.path, meta)
+            first = {"id": 0, "start_row": 0, "created": time.time()}
+            os.makedirs(self._segment_dir(first), exist_ok=True)
+            meta = {**meta, "segments": [first]}
+            self._write_meta(meta)
+        if os.path.exists(os.path.join(self.path, TIMESTAMP_COLUMN[0])):
+            # Finish moving the columns even if an earlier upgrade was interrupted
+            directory = self._segment_dir(meta["segments"][0])
+            for name, _ in self._columns(meta):
+                if os.path.exists(os.path.join(self.path, name)):
+                    os.replace(os.path.join(self.path, name), os.path.join(directory, name))
+        return meta
+
+    def _repair(self, directory, meta):
+        """
+        Truncate columns of a segment left longer than the others by an
+        interrupted write (lock must be held).
+
+        Returns:
+            The committed row count of the segment
+        """
+        count = self._segment_length(directory, meta)
+        for name, dtype in self._columns(meta):
+            path = os.path.join(directory, name)
+            if os.path.exists(path) and os.path.getsize(path) > count * dtype.itemsize:
+                os.truncate(path, count * dtype.itemsize)
+        return count
+
+    def _segment_length(self, directory, meta):
+        """Committed rows of the segment in directory."""
+        return min(self._column_length(directory, name, dtype) for name, dtype in self._columns(meta))
+
+    def _spans(self, start, stop, meta):
+        """
+        Split a global row range by segment.
+
+        Yields:
+            Tuples of (segment, first row, row after the last) with row
+            numbers relative to the segment
+        """
+        for segment in meta["segments"]:
+            first = segment["start_row"]
+            end = first + segment["rows"] if "rows" in segment else stop
+            lo, hi = max(start, first), min(stop, end)
+            if lo < hi:
+                yield segment, lo - first, hi - first
+
+    def _read_segment(self, segment, start, stop, meta):
+        """Read a row range of one segment, shaped like read_columns()."""
+        directory = self._segment_dir(segment)
+        return {
+            "timestamp": self._read_column(directory, *TIMESTAMP_COLUMN, start, stop),
+            "duration_seconds": self._read_column(directory, *DURATION_COLUMN, start, stop),
+            "dominant_emotion": self._read_column(directory, *DOMINANT_COLUMN, start, stop),
+            "camera": self._read_column(directory, *CAMERA_COLUMN, start, stop),
+            # Segments sealed before a label appeared have no column for it
+            "percentages": [
+                self._read_column(directory, self._percent_column(i), PERCENT_DTYPE, start, stop, fill=np.nan)
+                for i in range(len(meta["labels"]))
+            ]
+        }
+
+    @staticmethod
+    def _concat(blocks, meta):
+        """Join blocks returned by _read_segment() into one."""
+        if len(blocks) == 1:
+            return blocks[0]
+        if not blocks:
+            return {
+                "timestamp": np.empty(0, dtype=TIMESTAMP_COLUMN[1]),
+                "duration_seconds": np.empty(0, dtype=DURATION_COLUMN[1]),
+                "dominant_emotion": np.empty(0, dtype=DOMINANT_COLUMN[1]),
+                "camera": np.empty(0, dtype=CAMERA_COLUMN[1]),
+                "percentages": [np.empty(0, dtype=PERCENT_DTYPE) for _ in meta["labels"]]
+            }
+        return {
+            "timestamp": np.concatenate([block["timestamp"] for block in blocks]),
+            "duration_seconds": np.concatenate([block["duration_seconds"] for block in blocks]),
+            "dominant_emotion": np.concatenate([block["dominant_emotion"] for block in blocks]),
+            "camera": np.concatenate([block["camera"] for block in blocks]),
+            "percentages": [
+                np.concatenate([block["percentages"][i] for block in blocks])
+                for i in range(len(meta["labels"]))
+            ]
+        }
+
+    def _columns(self, meta):
+        """List (file name, dtype) for every column described by meta."""
+        columns = [TIMESTAMP_COLUMN, DURATION_COLUMN, DOMINANT_COLUMN]
+        if "cameras" in meta:
+            columns.append(CAMERA_COLUMN)
+        columns += [(self._percent_column(i), PERCENT_DTYPE) for i in range(len(meta["labels"]))]
+        return columns
+
+    @staticmethod
+    def _percent_column(i):
+        """File name of the percentage column for label index i."""
+        return f"pct_{i}.f8"
+
+    def _segment_dir(self, segment):
+        """Directory holding the column files of a segment."""
+        return os.path.join(self.path, "segments", str(segment["id"]))
+
+    @staticmethod
+    def _empty_meta(segment_id=0):
+        """Metadata of a new, empty generation."""
+        return {
+            "generation": uuid.uuid4().hex,
+            "labels": [],
+            "cameras": [],
+            "segments": [{"id": segment_id, "start_row": 0, "created": time.time()}]
+        }
+
+    @staticmethod
+    def _column_length(directory, name, dtype):
+        """Number of complete values in a column file."""
+        try:
+            return os.path.getsize(os.path.join(directory, name)) // dtype.itemsize
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _read_column(directory, name, dtype, start, stop, fill=None):
+        """
+        Memory-map a row range of a column file.
+
+        Args:
+            fill: Value of every row if the file doesn't exist; a missing
+                file is an error if omitted
+        """
+        if stop <= start:
+            return np.empty(0, dtype=dtype)
+        path = os.path.join(directory, name)
+        if fill is not None and not os.path.exists(path):
+            return np.full(stop - start, fill, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", offset=start * dtype.itemsize, shape=(stop - start,))
+
+    def _write_column(self, directory, name, values, mode):
+        """Write values to a column file, syncing if durable."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, name), mode) as f:
+            f.write(values.tobytes())
+            f.flush()
+            if self.durable:
+                os.fsync(f.fileno())
+
+    def _meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    def _rollups_path(self):
+        return os.path.join(self.path, "rollups.json")
+
+    def _write_meta(self, meta):
+        """Atomically replace meta.json (lock must be held)."""
+        self._write_json(self._meta_path(), meta)
+
+    def _write_json(self, path, data):
+        """Atomically replace a JSON file (lock must be held)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            if self.durable:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
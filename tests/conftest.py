@@ -0,0 +1,24 @@
+import atexit
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """The server.app module, storing its data in a scratch directory."""
+    os.environ["AFFECTRA_STORAGE_DIR"] = str(tmp_path_factory.mktemp("storage"))
+    import server.app
+    # The snapshot would be written after the directory is gone
+    atexit.unregister(server.app.stats_cache.save_snapshot)
+    return server.app
+
+
+@pytest.fixture
+def client(app_module):
+    """Test client of an app with an empty session store."""
+    # Same steps as /api/clear_data, so live dashboards see the empty store too
+    app_module.session_log.clear()
+    app_module.stats_cache.refresh()
+    app_module.publish_stats()
+    return app_module.app.test_client()
@@ -0,0 +1,142 @@
+import json
+
+import pandas as pd
+import pytest
+
+
+SESSIONS = [
+    {"timestamp": "2025-04-01T10:00:00", "duration_seconds": 12.5, "dominant_emotion": "happy",
+     "emotion_percentages": {"happy": 75.0, "neutral": 25.0}},
+    {"timestamp": "2025-04-01T10:05:00", "duration_seconds": 3.2, "dominant_emotion": "neutral",
+     "emotion_percentages": {"neutral": 60.0, "sad": 40.0}},
+    {"timestamp": "2025-04-01T10:07:30", "duration_seconds": 8.0, "dominant_emotion": "happy",
+     "emotion_percentages": {"happy": 55.55, "surprise": 33.33, "neutral": 11.12}},
+    {"timestamp": "2025-04-02T09:00:00", "duration_seconds": 20.1, "dominant_emotion": "happy",
+     "emotion_percentages": {"happy": 100.0}},
+    {"timestamp": "2025-04-02T09:01:00", "duration_seconds": 1.0, "dominant_emotion": "sad",
+     "emotion_percentages": {"sad": 50.0, "fear": 50.0}},
+]
+
+
+def baseline_stats(sessions):
+    """
+    Statistics as the original CSV-backed /api/emotion_stats computed them,
+    from rows formatted the way the original /log stored them.
+    """
+    df = pd.DataFrame([{
+        "timestamp": session["timestamp"],
+        "duration_seconds": session["duration_seconds"],
+        "dominant_emotion": session["dominant_emotion"],
+        "emotion_percentages": ", ".join(f"{k}: {v}%" for k, v in session["emotion_percentages"].items())
+    } for session in sessions])
+
+    emotion_totals = {}
+    for percentages_str in df["emotion_percentages"]:
+        for item in percentages_str.split(","):
+            emotion, value = item.strip().split(":")
+            emotion_totals.setdefault(emotion.strip(), []).append(float(value.strip(" %")))
+    return {
+        "status": "ok",
+        "avg_duration": round(df["duration_seconds"].mean(), 2),
+        "overall_dominant_emotion": df["dominant_emotion"].value_counts().idxmax(),
+        "avg_emotion_percentages": {emotion: sum(values) / len(values) for emotion, values in emotion_totals.items()},
+        "visitor_count": len(df),
+        "is_empty": False
+    }
+
+
+def test_empty_stats(client):
+    assert client.get("/api/emotion_stats").get_json() == {
+        "status": "ok",
+        "avg_duration": 0,
+        "overall_dominant_emotion": "none",
+        "avg_emotion_percentages": {},
+        "visitor_count": 0,
+        "is_empty": True
+    }
+
+
+def test_stats_match_baseline(client):
+    for session in SESSIONS:
+        assert client.post("/log", json=session).status_code == 200
+
+    stats = client.get("/api/emotion_stats").get_json()
+    expected = baseline_stats(SESSIONS)
+    assert stats.keys() == expected.keys()
+    assert stats["avg_emotion_percentages"] == pytest.approx(expected.pop("avg_emotion_percentages"))
+    for key, value in expected.items():
+        assert stats[key] == value, key
+
+
+def test_stats_follow_new_sessions(client):
+    client.post("/log", json=SESSIONS[:2])
+    assert client.get("/api/emotion_stats").get_json()["visitor_count"] == 2
+
+    for session in SESSIONS[2:]:
+        client.post("/log", json=session)
+    stats = client.get("/api/emotion_stats").get_json()
+    assert stats["visitor_count"] == len(SESSIONS)
+    assert stats["avg_duration"] == baseline_stats(SESSIONS)["avg_duration"]
+
+
+def test_clear_data_needs_csrf_token(client):
+    client.post("/log", json=SESSIONS[0])
+    assert client.post("/api/clear_data").status_code == 403
+
+    client.get("/")
+    with client.session_transaction() as session:
+        token = session["csrf_token"]
+    assert client.post("/api/clear_data", headers={"X-CSRF-Token": token}).status_code == 200
+    assert client.get("/api/emotion_stats").get_json()["is_empty"] is True
+
+
+def test_bulk_upload_matches_single_uploads(client):
+    response = client.post("/log/bulk", json=SESSIONS)
+    assert response.get_json()["accepted"] == len(SESSIONS)
+
+    stats = client.get("/api/emotion_stats").get_json()
+    assert stats["visitor_count"] == len(SESSIONS)
+    assert stats["avg_emotion_percentages"] == pytest.approx(baseline_stats(SESSIONS)["avg_emotion_percentages"])
+
+
+def test_bulk_upload_validates_every_item(client):
+    valid = SESSIONS[0]
+    missing = {k: v for k, v in valid.items() if k != "duration_seconds"}
+    items = [
+        valid,
+        missing,
+        "not an object",
+        dict(valid, timestamp=1700000000),
+        dict(valid, timestamp="yesterday"),
+        dict(valid, duration_seconds="Infinity"),
+        dict(valid, emotion_percentages={"happy": "nan"}),
+        SESSIONS[1]
+    ]
+    response = client.post("/log/bulk", json=items)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["accepted"] == 2
+    assert body["rejected"] == 6
+    assert [result["status"] for result in body["results"]] == ["ok"] + ["error"] * 6 + ["ok"]
+    assert body["results"][1]["message"] == "Missing required field: duration_seconds"
+    assert client.get("/api/emotion_stats").get_json()["visitor_count"] == 2
+
+
+def test_bulk_upload_accepts_ndjson(client):
+    lines = [json.dumps(SESSIONS[0]), "{broken", "", json.dumps(SESSIONS[1])]
+    response = client.post("/log/bulk", data="\n".join(lines), content_type="application/x-ndjson")
+    body = response.get_json()
+    assert body["accepted"] == 2
+    assert [result["status"] for result in body["results"]] == ["ok", "error", "ok"]
+    assert body["results"][1]["message"].startswith("Invalid JSON")
+
+
+def test_bulk_upload_rejects_non_array(client):
+    response = client.post("/log/bulk", json={"timestamp": "2025-04-01T10:00:00"})
+    assert response.status_code == 400
+
+
+def test_log_rejects_whole_array_with_an_invalid_item(client):
+    response = client.post("/log", json=[SESSIONS[0], dict(SESSIONS[1], duration_seconds="nan")])
+    assert response.status_code == 400
+    assert client.get("/api/emotion_stats").get_json()["visitor_count"] == 0
@@ -0,0 +1,54 @@
+import os
+import time
+
+from benchmarks.synthetic import SceneFaceDetector, StubEmotionAnalyzer, SyntheticScene
+from client.batch import SummaryCollector
+from client.camera_tracker import CameraTracker
+from client.config import get_storage_dir
+
+
+class TimedEmotionAnalyzer(StubEmotionAnalyzer):
+    """Stub analyzer taking delay seconds per call, counting the faces it scores."""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.scored = 0
+
+    def predict(self, images):
+        time.sleep(self.delay)
+        self.scored += len(images)
+        return super().predict(images)
+
+
+def analyze_video(analyzer, cpu_budget, frames=90, fps=30.0):
+    """Run a tracker over synthetic frames on video time, like a batch worker."""
+    scene = SyntheticScene(320, 240, faces=2, face_size=60)
+    tracker = CameraTracker(analyzer=analyzer, uploader=SummaryCollector(), latency_target=0,
+                            cpu_budget=cpu_budget)
+    tracker.face_detector = SceneFaceDetector(scene)
+    for index in range(frames):
+        tracker.process_frame(scene.render(index, fps), timestamp=index / fps)
+    tracker.end_all_sessions(frames / fps)
+    return tracker
+
+
+def test_offline_results_do_not_depend_on_machine_speed():
+    fast = analyze_video(TimedEmotionAnalyzer(), cpu_budget=None)
+    slow = analyze_video(TimedEmotionAnalyzer(delay=0.05), cpu_budget=None)
+    assert fast.uploader.summaries
+    assert slow.uploader.summaries == fast.uploader.summaries
+
+
+def test_budget_charges_model_time():
+    # The live budget skips samples when the model is slow
+    fast = analyze_video(TimedEmotionAnalyzer(), cpu_budget=None)
+    slow = analyze_video(TimedEmotionAnalyzer(delay=0.05), cpu_budget=0.1)
+    assert slow.analyzer.scored < fast.analyzer.scored
+
+
+def test_storage_dir_follows_the_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("AFFECTRA_STORAGE_DIR", str(tmp_path))
+    assert get_storage_dir() == str(tmp_path)
+    monkeypatch.delenv("AFFECTRA_STORAGE_DIR")
+    assert get_storage_dir().endswith(os.path.join("server", "storage"))
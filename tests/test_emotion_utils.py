@@ -0,0 +1,79 @@
+from collections import Counter
+
+import pytest
+
+from client.emotion_utils import EMOTION_LABELS, EmotionSession
+
+
+def make_session(emotions, probabilities=None, **kwargs):
+    """Build an ended session from a list of emotions (and probability dicts)."""
+    session = EmotionSession(**kwargs)
+    session.start(timestamp=1000.0)
+    for i, emotion in enumerate(emotions):
+        session.add_emotion(emotion, probabilities[i] if probabilities else None)
+    session.end(timestamp=1012.5)
+    return session
+
+
+def test_empty_session_has_no_summary():
+    session = EmotionSession()
+    session.start()
+    session.end()
+    assert session.get_summary() == {}
+
+
+def test_summary_matches_counter_reference():
+    emotions = ["neutral", "happy", "happy", "sad", "neutral", "happy", "fear"]
+    summary = make_session(emotions).get_summary()
+
+    counter = Counter(emotions)
+    assert summary["duration_seconds"] == 12.5
+    assert summary["dominant_emotion"] == counter.most_common(1)[0][0]
+    assert summary["emotion_percentages"] == {
+        emotion: round(count / len(emotions) * 100, 2) for emotion, count in counter.items()
+    }
+    # Emotions are listed in order of first sighting, like Counter
+    assert list(summary["emotion_percentages"]) == list(counter)
+
+
+def test_ties_go_to_the_emotion_seen_first():
+    summary = make_session(["sad", "happy", "happy", "sad"]).get_summary()
+    assert summary["dominant_emotion"] == "sad"
+
+
+def test_add_emotion_starts_the_session():
+    session = EmotionSession()
+    session.add_emotion("happy")
+    assert session.start_time is not None
+
+
+def test_unknown_dominant_emotion_is_registered():
+    session = make_session(["contempt", "happy", "contempt"])
+    summary = session.get_summary()
+    assert summary["dominant_emotion"] == "contempt"
+    assert summary["emotion_percentages"] == {"contempt": 66.67, "happy": 33.33}
+    assert session.labels == EMOTION_LABELS + ["contempt"]
+
+
+def test_unknown_probability_label_is_registered():
+    probabilities = [{"happy": 90, "contempt": 10}, {"happy": 20, "contempt": 70, "awe": 10}]
+    session = make_session(["happy", "contempt"], probabilities, ewma_alpha=0.5)
+    summary = session.get_summary()
+
+    assert summary["emotion_percentages"] == {"happy": 50.0, "contempt": 50.0}
+    mean = summary["mean_emotion_probabilities"]
+    assert mean["happy"] == 55.0
+    assert mean["contempt"] == 40.0
+    assert mean["awe"] == 5.0
+    assert mean["angry"] == 0.0
+    ewma = summary["ewma_emotion_probabilities"]
+    assert ewma["happy"] == pytest.approx(0.5 * 20 + 0.5 * 90)
+    assert ewma["awe"] == pytest.approx(5.0)
+
+
+def test_probabilities_count_as_one_sample():
+    session = EmotionSession()
+    session.add_emotion("happy", {"happy": 80, "sad": 20})
+    assert session.samples == 1
+    assert session.probability_samples == 1
+    assert int(session.counts[EMOTION_LABELS.index("happy")]) == 1
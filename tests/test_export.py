@@ -0,0 +1,163 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from server.export import CSV_COLUMNS, export_stream, iter_records
+from server.migrate_csv import migrate_csv
+from server.storage import RowsDeletedError, SessionLog, normalize_summary
+
+SESSIONS = [
+    {"timestamp": "2025-04-01T10:00:00", "duration_seconds": 12.5, "dominant_emotion": "happy",
+     "emotion_percentages": {"happy": 75.0, "neutral": 25.0}, "camera_id": "lobby"},
+    {"timestamp": "2025-04-01T10:05:00", "duration_seconds": 3.2, "dominant_emotion": "neutral",
+     "emotion_percentages": {"neutral": 60.0, "sad": 40.0}},
+    {"timestamp": "2025-04-02T09:00:00", "duration_seconds": 20.1, "dominant_emotion": "happy",
+     "emotion_percentages": {"happy": 100.0}, "camera_id": "door"},
+    {"timestamp": "2025-04-03T09:01:00", "duration_seconds": 1.0, "dominant_emotion": "sad",
+     "emotion_percentages": {"sad": 50.0, "fear": 50.0}, "camera_id": "lobby"},
+]
+
+
+def expected(session, row_id):
+    """A session as the export returns it."""
+    return {"id": row_id, "camera_id": "default", **session}
+
+
+@pytest.fixture
+def stored(app_module, client):
+    app_module.session_log.append([normalize_summary(session) for session in SESSIONS])
+    return client
+
+
+def read_csv(response):
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_csv_export(stored):
+    response = stored.get("/api/export")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.get_data(as_text=True).splitlines()[0] == ",".join(CSV_COLUMNS)
+
+    rows = read_csv(response)
+    assert [row["id"] for row in rows] == ["0", "1", "2", "3"]
+    assert rows[0] == {
+        "id": "0", "timestamp": "2025-04-01T10:00:00.000000", "duration_seconds": "12.5",
+        "dominant_emotion": "happy", "emotion_percentages": "happy: 75.0%, neutral: 25.0%",
+        "camera_id": "lobby"
+    }
+    assert rows[1]["camera_id"] == "default"
+
+
+def test_ndjson_export(stored):
+    response = stored.get("/api/export?format=ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    records = read_ndjson(response)
+    for i, (record, session) in enumerate(zip(records, SESSIONS)):
+        assert record == {**expected(session, i), "timestamp": session["timestamp"] + ".000000"}
+    assert len(records) == len(SESSIONS)
+
+
+def test_export_filters(stored):
+    records = read_ndjson(stored.get("/api/export?format=ndjson&camera=lobby&from=2025-04-01T10:00:01"))
+    assert [record["id"] for record in records] == [3]
+    assert read_ndjson(stored.get("/api/export?format=ndjson&camera=nowhere")) == []
+
+
+@pytest.mark.parametrize("query", ["format=xml", "limit=0", "after=-1", "from=yesterday"])
+def test_export_rejects_bad_parameters(stored, query):
+    response = stored.get(f"/api/export?{query}")
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+
+def test_export_pages_with_after_and_limit(stored):
+    first = stored.get("/api/export?format=ndjson&limit=2")
+    generation = first.headers["X-Export-Generation"]
+    ids = [record["id"] for record in read_ndjson(first)]
+    assert ids == [0, 1]
+
+    while True:
+        page = read_ndjson(stored.get(
+            f"/api/export?format=ndjson&limit=2&after={ids[-1]}&generation={generation}"))
+        if not page:
+            break
+        ids.extend(record["id"] for record in page)
+    assert ids == [0, 1, 2, 3]
+
+
+def test_export_of_a_cleared_store_is_refused(app_module, stored):
+    generation = stored.get("/api/export?limit=1").headers["X-Export-Generation"]
+    app_module.session_log.clear()
+    response = stored.get(f"/api/export?after=0&generation={generation}")
+    assert response.status_code == 409
+    assert response.get_json()["status"] == "error"
+
+
+def test_export_is_gzipped_when_accepted(stored):
+    plain = stored.get("/api/export")
+    compressed = stored.get("/api/export", headers={"Accept-Encoding": "gzip, deflate"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert "Content-Encoding" not in plain.headers
+
+
+def test_csv_export_reimports_with_cameras(stored, tmp_path):
+    export_path = tmp_path / "export.csv"
+    export_path.write_bytes(stored.get("/api/export").get_data())
+
+    log = SessionLog(str(tmp_path / "sessions"), durable=False)
+    log.ensure_exists()
+    assert migrate_csv(str(export_path), log) == (len(SESSIONS), 0)
+
+    records = [record for chunk in iter_records(log, log.read_meta()) for record in chunk]
+    assert records == [{**expected(session, i), "timestamp": session["timestamp"] + ".000000"}
+                       for i, session in enumerate(SESSIONS)]
+
+
+def test_legacy_csv_imports_to_the_default_camera(tmp_path):
+    legacy = tmp_path / "affectra_log.csv"
+    legacy.write_text("timestamp,duration_seconds,dominant_emotion,emotion_percentages\n"
+                      '2025-04-01T10:00:00,2.5,happy,"happy: 100.0%"\n')
+    log = SessionLog(str(tmp_path / "sessions"), durable=False)
+    log.ensure_exists()
+    assert migrate_csv(str(legacy), log) == (1, 0)
+    assert log.read_meta()["cameras"] == ["default"]
+
+
+def open_segmented_log(path, rows):
+    """Store with one sealed segment of old rows and one of recent rows."""
+    log = SessionLog(str(path), durable=False, segment_bytes=1)
+    log.ensure_exists()
+    now = datetime.now().replace(microsecond=0)
+    for timestamp in (now - timedelta(days=40), now):
+        log.append([normalize_summary({
+            "timestamp": timestamp.isoformat(), "duration_seconds": 1.0,
+            "dominant_emotion": "happy", "emotion_percentages": {"happy": 100.0}
+        }) for _ in range(rows)])
+    return log
+
+
+@pytest.mark.parametrize("delete", ["clear", "expire"])
+def test_export_breaks_off_when_rows_are_deleted_mid_stream(tmp_path, delete):
+    log = open_segmented_log(tmp_path, rows=4)
+    stream = export_stream(iter_records(log, log.read_meta(), chunk_rows=2), "ndjson")
+    assert len(next(stream).splitlines()) == 2
+
+    if delete == "clear":
+        log.clear()
+    else:
+        # Retention removes the segment being read
+        expiring = SessionLog(str(tmp_path), durable=False, segment_bytes=1, retention_days=30)
+        assert expiring.first_row(expiring.maintain()) == 4
+    with pytest.raises(RowsDeletedError):
+        list(stream)
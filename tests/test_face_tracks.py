@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from client.face_tracks import center_distance_matrix, iou_matrix, match_regions, regions_to_boxes
+
+
+def box(x, y, w=100, h=100):
+    return {"x": x, "y": y, "w": w, "h": h}
+
+
+def test_iou_matrix():
+    ious = iou_matrix(regions_to_boxes([box(0, 0)]), regions_to_boxes([box(0, 0), box(50, 0), box(200, 0)]))
+    assert ious[0] == pytest.approx([1.0, 50 * 100 / (2 * 100 * 100 - 50 * 100), 0.0])
+
+
+def test_center_distance_is_relative_to_the_track_size():
+    distances = center_distance_matrix(regions_to_boxes([box(0, 0)]), regions_to_boxes([box(30, 40)]))
+    assert distances[0, 0] == pytest.approx(0.5)
+
+
+def test_faces_keep_their_tracks():
+    tracks = [box(0, 0), box(300, 0)]
+    detections = [box(310, 5), box(5, 10)]
+    assert match_regions(tracks, detections) == ([(0, 1), (1, 0)], [], [])
+
+
+def test_iou_tie_goes_to_the_first_track():
+    # Both tracks overlap the detection by exactly the same amount
+    tracks = [box(0, 0), box(100, 0)]
+    detections = [box(50, 0)]
+    for _ in range(5):
+        assert match_regions(tracks, detections) == ([(0, 0)], [1], [])
+
+
+def test_iou_tie_goes_to_the_first_detection():
+    tracks = [box(50, 0)]
+    detections = [box(0, 0), box(100, 0)]
+    assert match_regions(tracks, detections) == ([(0, 0)], [], [1])
+
+
+def test_best_overlap_wins_over_detection_order():
+    tracks = [box(0, 0)]
+    detections = [box(60, 0), box(10, 0)]
+    assert match_regions(tracks, detections) == ([(0, 1)], [], [0])
+
+
+def test_occluded_face_leaves_its_track_unmatched():
+    # The right-hand face is hidden; the left one moved towards its old spot
+    tracks = [box(0, 0), box(120, 0)]
+    detections = [box(40, 0)]
+    matches, unmatched_tracks, unmatched_detections = match_regions(tracks, detections)
+    assert matches == [(0, 0)]
+    assert unmatched_tracks == [1]
+    assert unmatched_detections == []
+
+
+def test_reappearing_face_far_away_starts_a_new_track():
+    tracks = [box(0, 0)]
+    detections = [box(5, 0), box(400, 300)]
+    assert match_regions(tracks, detections) == ([(0, 0)], [], [1])
+
+
+def test_fast_movement_falls_back_to_center_distance():
+    # The detection shrank, so the overlap is too small, but the center moved
+    # less than half a face width
+    tracks = [box(0, 0, 20, 20)]
+    detections = [box(8, 0, 8, 8)]
+    assert iou_matrix(regions_to_boxes(tracks), regions_to_boxes(detections))[0, 0] < 0.3
+    assert match_regions(tracks, detections) == ([(0, 0)], [], [])
+    assert match_regions([box(0, 0, 20, 20)], [box(40, 0, 20, 20)]) == ([], [0], [0])
+
+
+def test_no_tracks_or_no_detections():
+    assert match_regions([], [box(0, 0)]) == ([], [], [0])
+    assert match_regions([box(0, 0)], []) == ([], [0], [])
+    assert np.asarray(regions_to_boxes([])).shape == (0, 4)
@@ -0,0 +1,145 @@
+import json
+import socket
+import struct
+import threading
+
+import numpy as np
+import pytest
+
+from client.analyzers import INPUT_SIZE, MAX_HEADER_BYTES, RemoteAnalyzer, recv_message, send_message
+from client.emotion_utils import EMOTION_LABELS
+from client.inference_server import InferenceServer, MicroBatcher
+
+
+class RecordingModel:
+    """Model scoring each face by its first pixel, recording batch sizes."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, images):
+        self.batch_sizes.append(len(images))
+        return images[:, 0, :2].astype(np.float32)
+
+
+def faces(*values):
+    """Uint8 faces filled with the given values."""
+    return np.stack([np.full(INPUT_SIZE, value, dtype=np.uint8) for value in values])
+
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch=4, max_wait=5)
+    batcher.start()
+
+    results = {}
+
+    def request(value):
+        results[value] = batcher.predict(faces(value))
+
+    threads = [threading.Thread(target=request, args=(value,)) for value in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    # The batch ran as soon as it was full rather than after max_wait
+    assert model.batch_sizes == [4]
+    assert batcher.stats() == {"batches": 1, "faces": 4, "avg_batch_size": 4.0}
+    # Every caller got the rows of its own faces
+    for value, predictions in results.items():
+        assert predictions.tolist() == [[value, value]]
+
+
+def test_micro_batcher_reports_model_errors_to_every_caller():
+    class FailingModel:
+        def predict(self, images):
+            raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(FailingModel(), max_wait=0)
+    batcher.start()
+    with pytest.raises(RuntimeError, match="model failed"):
+        batcher.predict(faces(1))
+
+
+def test_message_round_trip():
+    left, right = socket.socketpair()
+    with left, right:
+        images = faces(1, 2)
+        send_message(left, {"shape": images.shape, "dtype": "uint8"}, images.tobytes())
+        header, payload = recv_message(right, max_size=images.nbytes)
+        assert header == {"shape": [2, 48, 48], "dtype": "uint8", "size": images.nbytes}
+        assert np.array_equal(np.frombuffer(payload, dtype=np.uint8).reshape(header["shape"]), images)
+
+        left.shutdown(socket.SHUT_WR)
+        assert recv_message(right) == (None, None)
+
+
+def test_message_truncated_in_the_middle():
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(struct.pack(">I", 10) + b'{"si')
+        left.shutdown(socket.SHUT_WR)
+        with pytest.raises(ValueError, match="middle of a message"):
+            recv_message(right)
+
+
+@pytest.mark.parametrize("prefix, header", [
+    (struct.pack(">I", MAX_HEADER_BYTES + 1), b""),
+    (None, {"size": 10 ** 9}),
+    (None, {"size": -1}),
+    (None, [1, 2]),
+])
+def test_oversized_or_malformed_messages_are_rejected(prefix, header):
+    left, right = socket.socketpair()
+    with left, right:
+        if prefix is None:
+            header = json.dumps(header).encode()
+            prefix = struct.pack(">I", len(header))
+        left.sendall(prefix + header)
+        with pytest.raises(ValueError):
+            recv_message(right, max_size=1000)
+
+
+@pytest.fixture
+def inference_server(tmp_path):
+    batcher = MicroBatcher(RecordingModel(), max_batch=2, max_wait=0)
+    batcher.start()
+    server = InferenceServer(str(tmp_path / "inference.sock"), batcher)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def send_faces(socket_path, images):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(10)
+        sock.connect(socket_path)
+        send_message(sock, {"shape": images.shape, "dtype": "uint8"}, images.tobytes())
+        return recv_message(sock)
+
+
+def test_server_answers_requests(inference_server):
+    header, payload = send_faces(inference_server.server_address, faces(3, 4))
+    assert header["status"] == "ok"
+    predictions = np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+    assert predictions.tolist() == [[3, 3], [4, 4]]
+
+
+def test_server_rejects_requests_larger_than_a_batch(inference_server):
+    header, payload = send_faces(inference_server.server_address, faces(1, 2, 3))
+    assert header["status"] == "error"
+    assert "exceeds" in header["message"]
+    assert inference_server.batcher.stats()["faces"] == 0
+
+
+def test_remote_analyzer_uses_the_server(inference_server):
+    analyzer = RemoteAnalyzer(inference_server.server_address)
+    try:
+        results = analyzer.analyze([np.full((60, 60, 3), 200, dtype=np.uint8)] * 2)
+    finally:
+        analyzer.close()
+    assert [result["dominant_emotion"] for result in results] == [EMOTION_LABELS[0]] * 2
+    assert results[0]["emotion"][EMOTION_LABELS[0]] == 50.0
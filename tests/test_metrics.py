@@ -0,0 +1,162 @@
+import re
+from collections import Counter as Tally
+
+import pytest
+
+from client.metrics import Counter, Gauge, Histogram, MetricsRegistry, Stopwatch, merge_exposition
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text):
+    """
+    Parse Prometheus text into families.
+
+    Returns:
+        Tuple of (list of (family, HELP/TYPE lines, samples)) and every
+        HELP/TYPE line in order; samples are (name, labels, value)
+    """
+    families = []
+    headers = []
+    for line in text.splitlines():
+        if line.startswith("# "):
+            kind, name, rest = line[2:].split(" ", 2)
+            headers.append((kind, name))
+            if not families or families[-1][0] != name:
+                families.append((name, {}, []))
+            families[-1][1][kind] = rest
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"Malformed sample line: {line!r}"
+        name, labels, value = match.groups()
+        assert name.startswith(families[-1][0]), f"{name} is outside its family"
+        families[-1][2].append((name, dict(LABEL.findall(labels or "")), float(value)))
+    return families, headers
+
+
+def make_registry(requests=2):
+    """Registry with one metric of each kind, like a server process."""
+    registry = MetricsRegistry()
+    counter = Counter("app_requests", "Requests served", ("status",), registry=registry)
+    counter.labels(status=200).inc(requests)
+    counter.labels(status=500).inc()
+    Gauge("app_viewers", "Open streams", registry=registry).set(3)
+    histogram = Histogram("app_seconds", "Request time", buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    Counter("app_unused", "Never incremented", registry=registry)
+    return registry
+
+
+def test_render_is_valid_exposition():
+    families, _ = parse(make_registry().render())
+    by_name = {name: (header, samples) for name, header, samples in families}
+
+    # Metrics without series are left out
+    assert list(by_name) == ["app_requests", "app_viewers", "app_seconds"]
+    assert by_name["app_requests"][0] == {"HELP": "Requests served", "TYPE": "counter"}
+    assert by_name["app_requests"][1] == [
+        ("app_requests_total", {"status": "200"}, 2.0),
+        ("app_requests_total", {"status": "500"}, 1.0),
+    ]
+    assert by_name["app_viewers"][1] == [("app_viewers", {}, 3.0)]
+
+    header, samples = by_name["app_seconds"]
+    assert header["TYPE"] == "histogram"
+    buckets = [(labels["le"], value) for name, labels, value in samples if name == "app_seconds_bucket"]
+    assert buckets == [("0.1", 1.0), ("1.0", 2.0), ("+Inf", 3.0)]
+    assert ("app_seconds_count", {}, 3.0) in samples
+    assert ("app_seconds_sum", {}, 5.55) in samples
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    Counter("app_paths", "Paths", ("path",), registry=registry).labels(path='a"b\\c\nd').inc()
+    assert 'app_paths_total{path="a\\"b\\\\c\\nd"} 1' in registry.render()
+    families, _ = parse(registry.render())
+    assert len(families[0][2]) == 1
+
+
+def test_duplicate_metric_names_are_rejected():
+    registry = MetricsRegistry()
+    Gauge("app_viewers", "Open streams", registry=registry)
+    with pytest.raises(ValueError):
+        Counter("app_viewers", "Again", registry=registry)
+
+
+def test_merge_keeps_one_header_per_family():
+    texts = [
+        (make_registry(requests=2).render(), None),
+        (make_registry(requests=5).render(), {"camera_service": "lobby"}),
+        (make_registry(requests=7).render(), {"camera_service": "door"}),
+    ]
+    families, headers = parse(merge_exposition(texts))
+
+    # Every HELP and TYPE line appears once, and each family's samples follow it
+    assert all(count == 1 for count in Tally(headers).values())
+    assert [name for name, _, _ in families] == ["app_requests", "app_viewers", "app_seconds"]
+
+    requests = {(labels.get("camera_service"), labels["status"]): value
+                for name, labels, value in families[0][2]}
+    assert requests == {
+        (None, "200"): 2.0, (None, "500"): 1.0,
+        ("lobby", "200"): 5.0, ("lobby", "500"): 1.0,
+        ("door", "200"): 7.0, ("door", "500"): 1.0,
+    }
+    viewers = families[1][2]
+    assert viewers == [("app_viewers", {}, 3.0),
+                       ("app_viewers", {"camera_service": "lobby"}, 3.0),
+                       ("app_viewers", {"camera_service": "door"}, 3.0)]
+    # Added labels come before the existing ones, so "le" stays last
+    assert sum(1 for name, labels, _ in families[2][2] if list(labels) == ["camera_service", "le"]) == 6
+
+
+def test_merge_adds_families_missing_from_the_first_text():
+    other = MetricsRegistry()
+    Counter("camera_frames", "Frames read", registry=other).inc(4)
+    families, _ = parse(merge_exposition([(make_registry().render(), None),
+                                          (other.render(), {"camera_service": "lobby"})]))
+    assert families[-1] == ("camera_frames", {"HELP": "Frames read", "TYPE": "counter"},
+                            [("camera_frames_total", {"camera_service": "lobby"}, 4.0)])
+    assert merge_exposition([("", None)]) == ""
+
+
+def test_stopwatch_records_each_stage():
+    registry = MetricsRegistry()
+    histogram = Histogram("app_stage_seconds", "Stage time", ("stage",), registry=registry)
+    series = {stage: histogram.labels(stage=stage) for stage in ("read", "parse")}
+    stopwatch = Stopwatch(series)
+    stopwatch.lap("read")
+    stopwatch.skip()
+    stopwatch.lap("parse")
+    stopwatch.lap("parse")
+    families, _ = parse(registry.render())
+    counts = {labels["stage"]: value for name, labels, value in families[0][2] if name.endswith("_count")}
+    assert counts == {"read": 1.0, "parse": 2.0}
+
+
+def test_metrics_endpoint_merges_camera_services(app_module, client, monkeypatch):
+    camera = MetricsRegistry()
+    # A family the server process exports as well
+    Counter("affectra_http_requests", "Responses by endpoint and status code", ("endpoint", "status"),
+            registry=camera).labels(endpoint="video_feed", status=200).inc()
+
+    class FakeResponse:
+        text = camera.render()
+
+        def raise_for_status(self):
+            pass
+
+    monkeypatch.setattr(app_module, "CAMERA_SERVICES", {"lobby": "http://lobby:5001"})
+    monkeypatch.setattr("requests.get", lambda url, timeout: FakeResponse())
+    client.get("/api/emotion_stats")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+
+    families, headers = parse(response.get_data(as_text=True))
+    assert all(count == 1 for count in Tally(headers).values())
+    samples = next(samples for name, _, samples in families if name == "affectra_http_requests")
+    assert ("affectra_http_requests_total",
+            {"camera_service": "lobby", "endpoint": "video_feed", "status": "200"}, 1.0) in samples
+    assert any("camera_service" not in labels for _, labels, _ in samples)
@@ -0,0 +1,151 @@
+import threading
+import time
+
+import numpy as np
+
+from client.pipeline import FrameBroadcaster, FramePipeline, FramePool, LatestQueue
+
+
+def test_latest_queue_drops_stale_items():
+    dropped = []
+    queue = LatestQueue(maxsize=1, on_drop=dropped.append)
+    for item in ("a", "b", "c"):
+        queue.put(item)
+
+    assert queue.get(timeout=0) == "c"
+    assert dropped == ["a", "b"]
+    assert queue.stats() == {"depth": 0, "maxsize": 1, "put": 3, "dropped": 2}
+    assert queue.get(timeout=0.01) is None
+
+
+def test_latest_queue_get_waits_for_a_put():
+    queue = LatestQueue()
+    threading.Timer(0.05, queue.put, ("frame",)).start()
+    assert queue.get(timeout=2) == "frame"
+
+
+def test_frame_pool_reuses_only_released_buffers():
+    pool = FramePool(size=2)
+    first = pool.acquire((4, 4, 3))
+    first.retain(2)  # Handed to inference and encode
+    first.release()  # The capture stage is done with it
+
+    # Still referenced by two stages, so it must not be handed out again
+    second = pool.acquire((4, 4, 3))
+    assert second is not first
+    assert second.array is not first.array
+
+    first.release()
+    third = pool.acquire((4, 4, 3))
+    assert third is not first
+    first.release()
+    assert pool.acquire((4, 4, 3)) is first
+    assert pool.stats()["reused"] == 1
+
+
+def test_frame_pool_drops_buffers_of_an_old_size():
+    pool = FramePool()
+    frame = pool.acquire((4, 4, 3))
+    pool.acquire((8, 8, 3))
+    frame.release()
+    assert pool.stats()["free"] == 0
+    assert pool.acquire((8, 8, 3)) is not frame
+
+
+def test_slow_subscriber_skips_to_the_latest_frame():
+    broadcaster = FrameBroadcaster()
+    fast = broadcaster.subscribe()
+    slow = broadcaster.subscribe()
+
+    received = []
+    for i in range(1, 4):
+        broadcaster.publish(f"frame {i}".encode())
+        received.append(fast.get(timeout=0))
+
+    assert received == [b"frame 1", b"frame 2", b"frame 3"]
+    # Publishing never waited for the slow subscriber; it gets the newest frame
+    assert slow.get(timeout=0) == b"frame 3"
+    assert slow.last_seq == 3
+    assert slow.skipped == 2
+    assert fast.skipped == 0
+    assert slow.get(timeout=0.01) is None
+
+
+def test_new_subscriber_waits_for_the_next_frame():
+    broadcaster = FrameBroadcaster()
+    broadcaster.publish(b"old")
+    subscriber = broadcaster.subscribe()
+    assert subscriber.get(timeout=0.01) is None
+    broadcaster.publish(b"new")
+    assert subscriber.get(timeout=0) == b"new"
+
+
+def test_close_wakes_waiting_subscribers():
+    broadcaster = FrameBroadcaster()
+    subscriber = broadcaster.subscribe()
+    threading.Timer(0.05, broadcaster.close).start()
+    started = time.perf_counter()
+    assert subscriber.get(timeout=5) is None
+    assert time.perf_counter() - started < 2
+    subscriber.close()
+    assert broadcaster.subscriber_count() == 0
+
+
+class FakeCamera:
+    """Camera producing numbered frames, filling the buffer it is given."""
+
+    def __init__(self, frames=None):
+        self.frames = frames
+        self.count = 0
+
+    def read(self, out=None):
+        if self.frames is not None and self.count >= self.frames:
+            return False, None
+        self.count += 1
+        time.sleep(0.001)
+        if out is None:
+            out = np.empty((48, 64, 3), dtype=np.uint8)
+        out[:] = self.count % 256
+        return True, out
+
+
+class FakeTracker:
+    def __init__(self):
+        self.analyzed = 0
+
+    def analyze_frame(self, frame):
+        self.analyzed += 1
+
+    def draw_overlay(self, frame):
+        return frame
+
+
+def test_pipeline_publishes_frames_and_joins_its_threads():
+    tracker = FakeTracker()
+    pipeline = FramePipeline(FakeCamera(), tracker, camera_id="test")
+    subscriber = pipeline.subscribe()
+    pipeline.start()
+    threads = list(pipeline._threads)
+    try:
+        frame = subscriber.get(timeout=5)
+        assert frame is not None and frame[:2] == b"\xff\xd8"  # JPEG start marker
+    finally:
+        pipeline.stop()
+
+    assert len(threads) == 3
+    assert not any(thread.is_alive() for thread in threads)
+    assert pipeline.stats()["running"] is False
+    assert tracker.analyzed > 0
+
+
+def test_pipeline_stops_when_the_camera_fails():
+    pipeline = FramePipeline(FakeCamera(frames=3), FakeTracker(), camera_id="test")
+    subscriber = pipeline.subscribe()
+    pipeline.start()
+    threads = list(pipeline._threads)
+    threads[0].join(timeout=5)
+    assert not pipeline.running
+    assert pipeline.broadcaster.closed
+    pipeline.stop()
+    assert not any(thread.is_alive() for thread in threads)
+    subscriber.close()
@@ -0,0 +1,71 @@
+import numpy as np
+
+from client.resolution import ResolutionTuner, downscale_frame, scale_region
+
+
+def run_tuner(tuner, latency_of, windows, seed=0):
+    """Feed the tuner simulated latencies; return the width after every window."""
+    rng = np.random.default_rng(seed)
+    widths = []
+    for _ in range(windows):
+        for _ in range(tuner.window):
+            tuner.record(latency_of(tuner.width) * rng.uniform(0.95, 1.0))
+        widths.append(tuner.width)
+    return widths
+
+
+def quadratic_cost(seconds_at_960):
+    """Latency growing with the pixel count, as model preprocessing does."""
+    return lambda width: seconds_at_960 * (width / 960) ** 2
+
+
+def test_steps_up_to_the_largest_width_that_fits():
+    tuner = ResolutionTuner(0.05, initial_width=320, window=10)
+    # 1280 takes 0.036 s (fits), 1920 takes 0.08 s
+    widths = run_tuner(tuner, quadratic_cost(0.02), 40)
+    assert set(widths[-20:]) <= {1280, 1920}
+    assert widths[-1] == 1280
+
+
+def test_steps_down_until_the_target_is_met():
+    tuner = ResolutionTuner(0.05, initial_width=1920, window=10)
+    widths = run_tuner(tuner, quadratic_cost(0.09), 10)
+    # 640 takes 0.04 s, 960 takes 0.09 s
+    assert widths[:3] == [1280, 960, 640]
+    assert widths[-1] == 640
+
+
+def test_does_not_oscillate_between_two_widths():
+    # 640 leaves more than the headroom (0.025 s < 0.6 x 0.05 s), but 960 misses the target
+    tuner = ResolutionTuner(0.05, initial_width=640, window=10, retry_windows=10)
+    widths = run_tuner(tuner, quadratic_cost(0.056), 300)
+
+    changes = sum(1 for a, b in zip(widths, widths[1:]) if a != b)
+    # Failed retries back off exponentially: 10, 20, 40, 80 windows...
+    assert changes <= 10
+    assert widths.count(640) > 0.95 * len(widths)
+
+
+def test_retries_a_width_once_it_fits_again():
+    tuner = ResolutionTuner(0.05, initial_width=640, window=10, retry_windows=5)
+    cost = {"seconds_at_960": 0.056}
+
+    def latency_of(width):
+        return quadratic_cost(cost["seconds_at_960"])(width)
+
+    run_tuner(tuner, latency_of, 20)
+    assert tuner.width == 640
+
+    # The load drops, so 960 and then 1280 fit
+    cost["seconds_at_960"] = 0.02
+    widths = run_tuner(tuner, latency_of, 40)
+    assert widths[-1] == 1280
+
+
+def test_downscale_frame_keeps_aspect_ratio():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    small, scale = downscale_frame(frame, 320)
+    assert small.shape == (240, 320, 3)
+    assert scale == 2.0
+    assert downscale_frame(frame, 1280)[1] == 1.0
+    assert scale_region({"x": 10, "y": 20, "w": 30, "h": 40}, scale) == {"x": 20, "y": 40, "w": 60, "h": 80}
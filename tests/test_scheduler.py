@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import SceneFaceDetector, StubEmotionAnalyzer, SyntheticScene
+from client.batch import SummaryCollector
+from client.camera_tracker import CameraTracker
+from client.scheduler import InferenceBudget, MotionScheduler, motion_score, roi_signature
+
+REGION = {"x": 0, "y": 0, "w": 32, "h": 32}
+
+
+def frame(value):
+    """Uniform 32x32 frame; the change between two values is their difference / 255."""
+    return np.full((32, 32, 3), value, dtype=np.uint8)
+
+
+def sample(scheduler, image, now, emotion="neutral"):
+    """Observe a frame and, if the face is due, record a sample."""
+    due = scheduler.observe(image, REGION, now)
+    if due:
+        scheduler.sampled(now, emotion)
+    return due
+
+
+def test_motion_score_scale():
+    still = roi_signature(frame(100), REGION)
+    assert motion_score(still, still) == 0.0
+    assert motion_score(roi_signature(frame(151), REGION), still) == pytest.approx(0.2)
+    assert motion_score(still, None) == 1.0
+    assert roi_signature(frame(100), {"x": 40, "y": 0, "w": 10, "h": 10}) is None
+
+
+def test_new_face_is_due_immediately():
+    assert MotionScheduler().observe(frame(100), REGION, 0.0)
+
+
+def test_still_face_backs_off_to_max_interval():
+    scheduler = MotionScheduler(min_interval=0.25, max_interval=2.0)
+    times = [now / 100 for now in range(0, 1000, 5) if sample(scheduler, frame(100), now / 100)]
+    # The first emotion counts as a change; after that the interval doubles
+    # with every sample that found nothing new
+    assert times == [0.0, 0.25, 0.75, 1.75, 3.75, 5.75, 7.75, 9.75]
+    assert scheduler.interval == 2.0
+    assert scheduler.skipped == 200 - len(times)
+
+
+def test_motion_makes_the_face_due_after_min_interval():
+    scheduler = MotionScheduler(min_interval=0.25, max_interval=5.0, motion_threshold=0.04)
+    for now in (0.0, 0.25, 0.75):
+        sample(scheduler, frame(100), now)
+    assert scheduler.interval == 1.0
+
+    # Below the threshold the face waits for its interval
+    assert not scheduler.observe(frame(105), REGION, 1.0)
+    # Above it the face is due, but never sooner than min_interval
+    assert not scheduler.observe(frame(120), REGION, 0.9)
+    assert scheduler.observe(frame(120), REGION, 1.0)
+    scheduler.sampled(1.0, "neutral")
+    assert scheduler.interval == 0.25
+
+
+def test_emotion_change_resets_the_interval():
+    scheduler = MotionScheduler(min_interval=0.25, max_interval=5.0)
+    for now in (0.0, 0.25, 0.75, 1.75):
+        sample(scheduler, frame(100), now)
+    assert scheduler.interval == 2.0
+
+    assert sample(scheduler, frame(100), 3.75, emotion="happy")
+    assert scheduler.interval == 0.25
+    assert sample(scheduler, frame(100), 4.0, emotion="happy")
+    assert scheduler.interval == 0.5
+
+
+def test_inference_budget():
+    budget = InferenceBudget(cpu_budget=0.5)
+    assert budget.allows(0.0)
+    budget.record(1.0, 0.2)
+    assert not budget.allows(1.3)
+    assert budget.allows(1.4)
+
+
+class RecordingDetector(SceneFaceDetector):
+    """Scene detector remembering the frame times it was called at."""
+
+    def __init__(self, scene):
+        super().__init__(scene)
+        self.now = 0.0
+        self.calls = []
+
+    def detect(self, frame):
+        self.calls.append(self.now)
+        return super().detect(frame)
+
+
+def test_tracked_faces_are_redetected_at_the_detection_interval():
+    scene = SyntheticScene(320, 240, faces=1, face_size=60)
+    tracker = CameraTracker(analyzer=StubEmotionAnalyzer(), uploader=SummaryCollector(),
+                            latency_target=0, cpu_budget=None)
+    detector = tracker.face_detector = RecordingDetector(scene)
+    for index in range(50):
+        detector.now = index / 10
+        tracker.process_frame(scene.render(index, 10.0), timestamp=detector.now)
+
+    # Between detections the face is followed by its tracker
+    assert detector.calls == [0.0, 2.0, 4.0]
+    assert len(tracker.tracks) == 1
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from server.stats import EmotionAggregates
+from server.storage import SessionLog, normalize_summary, to_epoch_us
+
+
+def summary(timestamp, dominant="happy"):
+    return normalize_summary({
+        "timestamp": timestamp.isoformat(),
+        "duration_seconds": 2.0,
+        "dominant_emotion": dominant,
+        "emotion_percentages": {dominant: 100.0}
+    })
+
+
+def open_log(path, **kwargs):
+    log = SessionLog(str(path / "sessions"), durable=False, segment_bytes=1, **kwargs)
+    log.ensure_exists()
+    return log
+
+
+def bucket_counts(aggregates, bucket):
+    return {item["start"]: item["visitor_count"] for item in aggregates.query_buckets(bucket)["buckets"]}
+
+
+def test_fine_buckets_keep_retained_rows_older_than_the_cutoff(tmp_path):
+    now = datetime.now().replace(second=0, microsecond=0)
+    log = open_log(tmp_path)
+    log.append([summary(now - timedelta(days=40))])
+    log.append([summary(now - timedelta(days=35), "sad"), summary(now)])
+    log.append([summary(now)])
+    aggregates = EmotionAggregates(log, str(tmp_path / "stats.json"))
+    aggregates.refresh()
+
+    # The first segment expires; the second is kept whole for its recent row
+    log = open_log(tmp_path, retention_days=30)
+    log.maintain()
+    aggregates.session_log = log
+    aggregates.refresh()
+
+    kept = now - timedelta(days=35)
+    for bucket, start in (("minute", lambda t: t), ("hour", lambda t: t.replace(minute=0))):
+        counts = bucket_counts(aggregates, bucket)
+        assert counts == {start(kept).isoformat(): 1, start(now).isoformat(): 2}
+        assert sum(counts.values()) == aggregates.query_range()["visitor_count"]
+    # Totals and day buckets still include the deleted session
+    assert aggregates.to_response()["visitor_count"] == 4
+    assert sum(bucket_counts(aggregates, "day").values()) == 4
+
+
+def test_late_rows_older_than_the_retained_rows_are_kept(tmp_path):
+    now = datetime.now().replace(second=0, microsecond=0)
+    log = open_log(tmp_path, retention_days=30)
+    log.append([summary(now - timedelta(days=40))])
+    log.append([summary(now)])
+    aggregates = EmotionAggregates(log, str(tmp_path / "stats.json"))
+    aggregates.refresh()
+    assert bucket_counts(aggregates, "minute") == {now.isoformat(): 1}
+
+    # A client uploads a session from before the oldest retained row
+    late = now - timedelta(days=33)
+    log.append([summary(late)])
+    aggregates.refresh()
+    assert bucket_counts(aggregates, "minute") == {late.isoformat(): 1, now.isoformat(): 1}
+    assert aggregates.query_range(to_epoch_us(late), to_epoch_us(now))["visitor_count"] == 1
@@ -0,0 +1,162 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from server.storage import SessionLog, from_epoch_us, normalize_summary
+
+
+def summary(timestamp, dominant="happy", duration=3.0, camera_id=None, **percentages):
+    """Store record for one session."""
+    data = {
+        "timestamp": timestamp.isoformat(),
+        "duration_seconds": duration,
+        "dominant_emotion": dominant,
+        "emotion_percentages": percentages or {dominant: 100.0}
+    }
+    if camera_id:
+        data["camera_id"] = camera_id
+    return normalize_summary(data)
+
+
+@pytest.fixture
+def now():
+    return datetime.now().replace(microsecond=0)
+
+
+def open_log(path, **kwargs):
+    log = SessionLog(str(path), durable=False, **kwargs)
+    log.ensure_exists()
+    return log
+
+
+def read_all(log):
+    meta = log.read_meta()
+    return log.read_columns(log.first_row(meta), log.row_count(meta), meta), meta
+
+
+def test_append_and_read_back(tmp_path, now):
+    log = open_log(tmp_path)
+    log.append([summary(now, "happy", 2.5, happy=80.0, sad=20.0)])
+    log.append([summary(now + timedelta(seconds=1), "sad", 4.0, camera_id="lobby", sad=100.0)])
+
+    columns, meta = read_all(log)
+    assert log.row_count(meta) == 2
+    assert meta["labels"] == ["happy", "sad"]
+    assert meta["cameras"] == ["default", "lobby"]
+    assert columns["duration_seconds"].tolist() == [2.5, 4.0]
+    assert [meta["labels"][i] for i in columns["dominant_emotion"]] == ["happy", "sad"]
+    assert [meta["cameras"][i] for i in columns["camera"]] == ["default", "lobby"]
+    assert from_epoch_us(int(columns["timestamp"][0])) == now
+    # Emotions missing from a session are stored as NaN
+    assert columns["percentages"][1].tolist() == [20.0, 100.0]
+    assert np.isnan(columns["percentages"][0][1])
+
+
+def test_new_labels_are_backfilled_with_nan(tmp_path, now):
+    log = open_log(tmp_path)
+    log.append([summary(now, happy=100.0)])
+    log.append([summary(now, "contempt", contempt=60.0, happy=40.0)])
+
+    columns, meta = read_all(log)
+    contempt = columns["percentages"][meta["labels"].index("contempt")]
+    assert np.isnan(contempt[0])
+    assert contempt[1] == 60.0
+
+
+def test_clear_starts_a_new_generation(tmp_path, now):
+    log = open_log(tmp_path)
+    log.append([summary(now) for _ in range(5)])
+    generation = log.read_meta()["generation"]
+
+    log.clear()
+    meta = log.read_meta()
+    assert meta["generation"] != generation
+    assert log.row_count(meta) == 0
+    assert log.read_rollups(meta)["days"] == {}
+
+    log.append([summary(now, "sad")])
+    columns, meta = read_all(log)
+    assert meta["labels"] == ["sad"]
+    assert len(columns["timestamp"]) == 1
+
+
+def test_full_segments_are_sealed_and_compacted(tmp_path, now):
+    # Every batch after the first seals the segment it would be written to
+    log = open_log(tmp_path, segment_bytes=1)
+    for i in range(3):
+        log.append([summary(now + timedelta(minutes=i)) for _ in range(4)])
+
+    columns, meta = read_all(log)
+    assert len(meta["segments"]) == 3
+    assert [segment["start_row"] for segment in meta["segments"]] == [0, 4, 8]
+    assert all(segment["rows"] == 4 for segment in meta["segments"][:2])
+    assert len(columns["timestamp"]) == 12
+    # Sealed segments are summed into rollups, the active one isn't yet
+    rollups = log.read_rollups(meta)
+    assert rollups["rows"] == 8
+    assert rollups["days"][now.date().isoformat()]["default"]["count"] == 8
+
+
+def test_old_segments_expire_into_rollups(tmp_path, now):
+    old = now - timedelta(days=40)
+    log = open_log(tmp_path, segment_bytes=1, retention_days=30)
+    log.append([summary(old, "sad", 5.0) for _ in range(3)])
+    log.append([summary(now, "happy", 1.0) for _ in range(2)])
+
+    columns, meta = read_all(log)
+    # The old rows are gone, but keep their row numbers and their totals
+    assert log.first_row(meta) == 3
+    assert log.row_count(meta) == 5
+    assert [meta["labels"][i] for i in columns["dominant_emotion"]] == ["happy", "happy"]
+    assert not os.path.exists(os.path.join(str(tmp_path), "segments", "0"))
+    day = log.read_rollups(meta)["days"][old.date().isoformat()]["default"]
+    assert day["count"] == 3
+    assert day["duration_sum"] == 15.0
+
+
+def test_reopening_keeps_rows(tmp_path, now):
+    open_log(tmp_path, segment_bytes=1).append([summary(now) for _ in range(2)])
+    log = open_log(tmp_path, segment_bytes=1)
+    log.append([summary(now, "sad")])
+
+    columns, meta = read_all(log)
+    assert len(columns["timestamp"]) == 3
+    assert len(meta["segments"]) == 2
+
+
+
+
+def test_expiry_records_the_oldest_retained_row(tmp_path, now):
+    log = open_log(tmp_path, segment_bytes=1)
+    log.append([summary(now - timedelta(days=40))])
+    log.append([summary(now - timedelta(days=35)), summary(now)])
+    log.append([summary(now)])
+
+    # The second segment is kept for its recent row, with its old row
+    log = open_log(tmp_path, segment_bytes=1, retention_days=30)
+    meta = log.maintain()
+    assert log.first_row(meta) == 1
+    assert from_epoch_us(meta["retained_from"]) == now - timedelta(days=35)
+
+
+@pytest.mark.parametrize("field, value", [
+    ("timestamp", 1700000000),
+    ("timestamp", [1]),
+    ("timestamp", "yesterday"),
+    ("duration_seconds", "Infinity"),
+    ("duration_seconds", "1e400"),
+    ("emotion_percentages", {"happy": "nan"}),
+    ("emotion_percentages", ["happy"]),
+])
+def test_normalize_summary_rejects_bad_values(field, value):
+    data = {
+        "timestamp": "2025-04-01T10:00:00",
+        "duration_seconds": 3,
+        "dominant_emotion": "happy",
+        "emotion_percentages": {"happy": 100}
+    }
+    data[field] = value
+    with pytest.raises(ValueError):
+        normalize_summary(data)
@@ -0,0 +1,70 @@
+import json
+import threading
+
+SESSION = {"timestamp": "2025-04-01T10:00:00", "duration_seconds": 4.0, "dominant_emotion": "happy",
+           "emotion_percentages": {"happy": 80.0, "sad": 20.0}}
+
+
+def parse_event(chunk):
+    """Split one Server-Sent Event into its event name and decoded data."""
+    fields = dict(line.split(": ", 1) for line in chunk.decode("utf-8").strip().split("\n"))
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_stream_sends_stats_events(client):
+    response = client.get("/api/stream", buffered=False)
+    try:
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        assert response.headers["Cache-Control"] == "no-cache"
+        chunks = iter(response.response)
+        assert next(chunks) == b"retry: 3000\n\n"
+
+        initial = next(chunks)
+        assert initial.endswith(b"\n\n")
+        event, data = parse_event(initial)
+        assert event == "stats"
+        assert data["visitor_count"] == 0
+        assert data["new_sessions"] == 0
+
+        client.post("/log", json=[SESSION, SESSION])
+        event, data = parse_event(next(chunks))
+        assert event == "stats"
+        # Every event carries the full statistics, like /api/emotion_stats
+        assert data == {**client.get("/api/emotion_stats").get_json(), "new_sessions": 2}
+    finally:
+        response.close()
+
+
+def test_stream_sends_heartbeats(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "STREAM_HEARTBEAT_SECONDS", 0.01)
+    response = client.get("/api/stream", buffered=False)
+    try:
+        chunks = iter(response.response)
+        next(chunks)
+        next(chunks)
+        assert next(chunks) == b": heartbeat\n\n"
+    finally:
+        response.close()
+
+
+def test_streams_over_the_cap_are_refused(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "MAX_STATS_STREAMS", 2)
+    monkeypatch.setattr(app_module, "stats_stream_slots", threading.BoundedSemaphore(2))
+
+    open_streams = [client.get("/api/stream", buffered=False) for _ in range(2)]
+    assert [response.status_code for response in open_streams] == [200, 200]
+
+    refused = client.get("/api/stream")
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"] == "60"
+    assert refused.get_json()["status"] == "error"
+
+    # Closing a stream frees its slot
+    open_streams.pop().close()
+    response = client.get("/api/stream", buffered=False)
+    assert response.status_code == 200
+    response.close()
+    for response in open_streams:
+        response.close()
+    assert app_module.stats_stream_slots._value == 2
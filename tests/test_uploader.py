@@ -0,0 +1,149 @@
+import json
+import os
+
+import pytest
+import requests
+
+from client.uploader import SessionUploader
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, text=None):
+        self.status_code = status_code
+        self._body = body
+        self._text = text
+
+    def json(self):
+        if self._text is not None:
+            return json.loads(self._text)
+        return self._body
+
+
+class FakeHttp:
+    """Stands in for requests.Session, replying from a list of responses."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posted = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posted.append(json)
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def ok(batch):
+    return FakeResponse(200, {"status": "ok", "accepted": len(batch), "rejected": 0,
+                              "results": [{"index": i, "status": "ok"} for i in range(len(batch))]})
+
+
+def summary(i):
+    return {"timestamp": f"2025-04-01T10:00:{i:02d}", "duration_seconds": i, "dominant_emotion": "happy",
+            "emotion_percentages": {"happy": 100.0}}
+
+
+@pytest.fixture
+def uploader(tmp_path):
+    return SessionUploader(url="http://test/log/bulk", spool_dir=str(tmp_path / "spool"))
+
+
+def spool_files(uploader, suffix=".ndjson"):
+    if not os.path.isdir(uploader.spool_dir):
+        return []
+    return sorted(name for name in os.listdir(uploader.spool_dir) if name.endswith(suffix))
+
+
+def test_delivered_batch_is_counted(uploader):
+    batch = [summary(1), summary(2)]
+    uploader.http = FakeHttp(ok(batch))
+    assert uploader._send(batch) is True
+    assert uploader.sent == 2
+
+
+@pytest.mark.parametrize("status", [400, 422])
+def test_invalid_batches_are_dropped(uploader, status):
+    uploader.http = FakeHttp(FakeResponse(status, {"status": "error"}))
+    assert uploader._send([summary(1)]) is True
+    assert uploader._server_down_since is None
+
+
+@pytest.mark.parametrize("status", [404, 408, 413, 429, 500, 503])
+def test_other_failures_are_kept_for_retry(uploader, status):
+    uploader.http = FakeHttp(FakeResponse(status, {"status": "error"}))
+    assert uploader._send([summary(1)]) is False
+    assert uploader._server_down_since is not None
+
+
+@pytest.mark.parametrize("response", [
+    FakeResponse(200, text="<html>Bad gateway</html>"),
+    FakeResponse(200, text='{"accepted": 1, "results": [{"status": "error"}]}'),
+    FakeResponse(200, text="[1, 2]"),
+])
+def test_unreadable_success_replies_are_kept_for_retry(uploader, response):
+    uploader.http = FakeHttp(response)
+    assert uploader._send([summary(1)]) is False
+    assert uploader.sent == 0
+
+
+def test_connection_errors_are_kept_for_retry(uploader):
+    uploader.http = FakeHttp(requests.ConnectionError("refused"))
+    assert uploader._send([summary(1)]) is False
+
+
+def test_failed_batches_are_spooled_by_the_upload_thread(uploader):
+    uploader.http = FakeHttp(FakeResponse(200, text="<html>proxy error</html>"))
+    uploader.batch_delay = 0
+    uploader.submit(summary(1))
+    uploader.submit(summary(2))
+    uploader.stop()
+
+    names = spool_files(uploader)
+    assert names
+    spooled = []
+    for name in names:
+        with open(os.path.join(uploader.spool_dir, name), encoding="utf-8") as f:
+            spooled.extend(json.loads(line) for line in f)
+    assert spooled == [summary(1), summary(2)]
+    # The thread survived the bad reply and kept going until stopped
+    assert uploader.pending() == 0
+
+
+def test_spool_is_replayed_oldest_first(uploader):
+    batches = [[summary(i)] for i in range(3)]
+    for batch in batches:
+        uploader._spool(batch)
+    assert len(spool_files(uploader)) == 3
+
+    uploader.http = FakeHttp(ok([None]))
+    uploader._replay_spool()
+    assert uploader.http.posted == batches
+    assert spool_files(uploader) == []
+
+
+def test_replay_stops_at_the_first_failure(uploader):
+    for i in range(3):
+        uploader._spool([summary(i)])
+    names = spool_files(uploader)
+
+    uploader.http = FakeHttp(ok([None]), FakeResponse(503), ok([None]))
+    uploader._replay_spool()
+    assert uploader.http.posted == [[summary(0)], [summary(1)]]
+    # The failed batch and everything after it stay for the next attempt
+    assert spool_files(uploader) == names[1:]
+
+
+def test_unreadable_spool_files_are_quarantined(uploader):
+    uploader._spool([summary(1)])
+    good = spool_files(uploader)[0]
+    bad = os.path.join(uploader.spool_dir, "0-corrupt.ndjson")
+    with open(bad, "w", encoding="utf-8") as f:
+        f.write("{not json\n")
+
+    uploader.http = FakeHttp(ok([None]))
+    uploader._replay_spool()
+    assert spool_files(uploader) == []
+    assert spool_files(uploader, ".bad") == ["0-corrupt.ndjson.bad"]
+    assert uploader.http.posted == [[summary(1)]]
+    assert not os.path.exists(os.path.join(uploader.spool_dir, good))